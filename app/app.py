@@ -1,14 +1,33 @@
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.db.log_writer import LogWriter
 from app.router.app_router import app_router
+from app.service.agent_registry import AgentRegistry
+from app.service.orchestrator_service import agent_router
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.http_client import HttpClientRegistry
 from app.utils.logger import Logger
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    AgentRegistry.start()
+    agent_router.start()
+    yield
+    # Shutdown: flush queued log rows, then release pooled upstream connections
+    await AgentRegistry.close()
+    await agent_router.close()
+    await LogWriter.close()
+    await HttpClientRegistry.close()
+    CpuExecutor.close()
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="Orchestrator Agent", version="1.0.0")
+    app = FastAPI(title="Orchestrator Agent", version="1.0.0", lifespan=lifespan)
     logger = Logger()
 
     app.add_middleware(
@@ -0,0 +1,31 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from app.db.mongo import MongoDB
+from app.db.rollups import MetricsRollup
+
+BATCH = 5000
+
+async def backfill_rollups(days: int = 30):
+    """
+    Rebuild metrics_rollups from raw access_logs/service_logs of the last `days`.
+    Run once after deploying rollups (on an empty metrics_rollups collection).
+    """
+    db = MongoDB.get_db()
+    start = datetime.utcnow() - timedelta(days=days)
+
+    for collection in ("access_logs", "service_logs"):
+        rows = 0
+        cursor = getattr(db, collection).find({"ts": {"$gte": start}}).batch_size(BATCH)
+        async for doc in cursor:
+            MetricsRollup.record(collection, doc)
+            rows += 1
+            if rows % BATCH == 0:
+                await MetricsRollup.flush()
+        await MetricsRollup.flush()
+        print(f"[Backfill] {collection}: {rows} rows rolled up")
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    asyncio.run(backfill_rollups(int(sys.argv[1]) if len(sys.argv) > 1 else 30))
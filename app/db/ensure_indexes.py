@@ -1,5 +1,6 @@
 import asyncio
 from app.db.mongo import MongoDB
+from app.db.rollups import MINUTE_RETENTION_SECONDS
 
 async def ensure_indexes():
     db = MongoDB.get_db()
@@ -22,6 +23,16 @@ async def ensure_indexes():
     # { status_code: 1, ts: -1 }
     await db.service_logs.create_index([("status_code", 1), ("ts", -1)])
 
+    # 3. Metrics Rollups Indexes
+    # { kind: 1, granularity: 1, bucket_start: -1 } (window reads)
+    await db.metrics_rollups.create_index([("kind", 1), ("granularity", 1), ("bucket_start", -1)])
+    # Minute buckets expire; hour buckets are kept
+    await db.metrics_rollups.create_index(
+        [("bucket_start", 1)],
+        expireAfterSeconds=MINUTE_RETENTION_SECONDS,
+        partialFilterExpression={"granularity": "minute"},
+    )
+
     print("Indexes created successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.db.mongo import MongoDB
+from app.db.rollups import MetricsRollup
+from app.utils.logger import Logger
+
+load_dotenv()
+
+QUEUE_MAX_SIZE = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "1.0"))
+# drop_newest | drop_oldest | block
+QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop_oldest")
+ENQUEUE_TIMEOUT = float(os.getenv("LOG_ENQUEUE_TIMEOUT_SECONDS", "0.05"))
+
+logger = Logger()
+
+
+class LogWriter:
+    """
+    Background pipeline for 'service_logs' / 'access_logs' rows.
+    Rows are queued in memory and persisted with `insert_many`, either when a
+    batch fills up or every FLUSH_INTERVAL seconds, so request handlers never
+    wait on Mongo. When the queue is full, QUEUE_POLICY decides what gives way.
+    Every row also feeds the metrics rollups, even if the row itself is dropped.
+    """
+    queue: Optional[asyncio.Queue] = None
+    task: Optional[asyncio.Task] = None
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    stats: Dict[str, int] = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0}
+
+    @classmethod
+    def _ensure_started(cls):
+        loop = asyncio.get_running_loop()
+        if cls.task is None or cls.task.done() or cls.loop is not loop:
+            cls.loop = loop
+            cls.queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
+            cls.task = loop.create_task(cls._run())
+
+    @classmethod
+    async def write(cls, collection: str, doc: Dict) -> bool:
+        """
+        Queue a document for `collection`. Returns False if it was dropped.
+        Only the 'block' policy ever waits, and at most ENQUEUE_TIMEOUT seconds.
+        """
+        cls._ensure_started()
+        MetricsRollup.record(collection, doc)
+        item = (collection, doc)
+
+        if QUEUE_POLICY == "block":
+            try:
+                await asyncio.wait_for(cls.queue.put(item), timeout=ENQUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                cls.stats["dropped"] += 1
+                return False
+        else:
+            if cls.queue.full():
+                if QUEUE_POLICY == "drop_newest":
+                    cls.stats["dropped"] += 1
+                    return False
+                cls.queue.get_nowait()
+                cls.stats["dropped"] += 1
+            cls.queue.put_nowait(item)
+
+        cls.stats["enqueued"] += 1
+        return True
+
+    @classmethod
+    async def write_many(cls, collection: str, docs: List[Dict]) -> int:
+        """Queue several documents back to back (e.g. one batch request). Returns how many were queued."""
+        written = 0
+        for doc in docs:
+            if await cls.write(collection, doc):
+                written += 1
+        return written
+
+    @classmethod
+    async def _run(cls):
+        queue = cls.queue
+        batch: List[Tuple[str, Dict]] = []
+        try:
+            while True:
+                await cls._collect_batch(queue, batch)
+                to_write, batch = batch, []
+                await cls._persist(to_write)
+        except asyncio.CancelledError:
+            # Rows already pulled off the queue must not be lost on shutdown
+            if batch:
+                await cls._persist(batch)
+            raise
+
+    @staticmethod
+    async def _collect_batch(queue: asyncio.Queue, batch: List[Tuple[str, Dict]]):
+        batch.append(await queue.get())
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # asyncio.timeout, not wait_for: on 3.11 wait_for can swallow the
+            # shutdown cancel when a row arrives at the same moment
+            try:
+                async with asyncio.timeout(remaining):
+                    batch.append(await queue.get())
+            except TimeoutError:
+                break
+
+    @classmethod
+    async def _persist(cls, batch: List[Tuple[str, Dict]]):
+        grouped: Dict[str, List[Dict]] = {}
+        for collection, doc in batch:
+            grouped.setdefault(collection, []).append(doc)
+
+        db = MongoDB.get_db()
+        for collection, docs in grouped.items():
+            try:
+                await getattr(db, collection).insert_many(docs, ordered=False)
+                cls.stats["written"] += len(docs)
+            except Exception as e:
+                cls.stats["failed"] += len(docs)
+                logger.error(f"[LogWriter] Failed to write {len(docs)} rows to {collection}: {str(e)}")
+
+        await MetricsRollup.flush()
+
+    @classmethod
+    async def flush(cls):
+        """Persist everything currently queued."""
+        if cls.queue is None:
+            return
+        batch = []
+        while not cls.queue.empty():
+            batch.append(cls.queue.get_nowait())
+        if batch:
+            await cls._persist(batch)
+
+    @classmethod
+    async def close(cls):
+        """Stop the background task and flush pending rows. Called on shutdown."""
+        if cls.task is not None and cls.loop is asyncio.get_running_loop():
+            cls.task.cancel()
+            try:
+                await cls.task
+            except asyncio.CancelledError:
+                pass
+        await cls.flush()
+        await MetricsRollup.flush()
+        cls.task = None
+        cls.queue = None
+        cls.loop = None
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.db.mongo import MongoDB
+from app.utils.latency_sketch import LatencySketch, bin_key
+from app.utils.logger import Logger
+
+COLLECTION = "metrics_rollups"
+GRANULARITIES = {
+    "minute": lambda ts: ts.replace(second=0, microsecond=0),
+    "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+}
+# Minute buckets only serve the partial hour at the start of a window
+MINUTE_RETENTION_SECONDS = 2 * 24 * 3600
+
+logger = Logger()
+
+
+def _floor_hour(ts: datetime) -> datetime:
+    return GRANULARITIES["hour"](ts)
+
+
+def _dimensions(collection: str, doc: Dict) -> Optional[Tuple[str, Dict[str, Any], Optional[float], int, int]]:
+    """(kind, dims, latency_ms, timeouts, errors) of a log row, or None if not rolled up."""
+    if collection == "access_logs":
+        user = doc.get("user") or {}
+        dims = {"route": doc.get("route"), "user_type": user.get("type"), "decision": doc.get("decision")}
+        timeouts = (doc.get("pp2_summary") or {}).get("timeouts", 0) or 0
+        errors = 1 if (doc.get("status_code") or 200) >= 500 else 0
+        return "access", dims, doc.get("timing_ms"), timeouts, errors
+    if collection == "service_logs":
+        dims = {"service_type": doc.get("service_type"), "service_name": doc.get("service_name")}
+        return "service", dims, doc.get("latency_ms"), 1 if doc.get("timeout") else 0, 1 if doc.get("error") else 0
+    return None
+
+
+class MetricsRollup:
+    """
+    Per-minute and per-hour aggregates of access_logs and service_logs rows.
+    Each bucket (granularity, bucket_start, kind, dimensions) holds count,
+    latency sum, timeouts, errors and a mergeable LatencySketch. Rows are
+    accumulated in memory and flushed as `$inc` upserts, so buckets from all
+    workers merge in Mongo and /metrics reads scale with buckets, not rows.
+    """
+    pending: Dict[Tuple, Dict[str, Any]] = {}
+
+    @classmethod
+    def record(cls, collection: str, doc: Dict):
+        derived = _dimensions(collection, doc)
+        if derived is None:
+            return
+        kind, dims, latency_ms, timeouts, errors = derived
+        ts = doc.get("ts") or datetime.utcnow()
+
+        for granularity, floor in GRANULARITIES.items():
+            key = (granularity, floor(ts), kind, tuple(sorted(dims.items())))
+            acc = cls.pending.get(key)
+            if acc is None:
+                acc = cls.pending[key] = {"count": 0, "latency_count": 0, "sum_ms": 0.0, "timeouts": 0, "errors": 0, "hist": {}}
+            acc["count"] += 1
+            acc["timeouts"] += timeouts
+            acc["errors"] += errors
+            if latency_ms is not None:
+                acc["latency_count"] += 1
+                acc["sum_ms"] += latency_ms
+                b = bin_key(latency_ms)
+                acc["hist"][b] = acc["hist"].get(b, 0) + 1
+
+    @classmethod
+    async def flush(cls):
+        """Upsert the accumulated increments; on failure they are kept for the next flush."""
+        if not cls.pending:
+            return
+        pending, cls.pending = cls.pending, {}
+
+        ops = []
+        for (granularity, bucket_start, kind, dims), acc in pending.items():
+            inc = {
+                "count": acc["count"],
+                "latency_count": acc["latency_count"],
+                "sum_ms": acc["sum_ms"],
+                "timeouts": acc["timeouts"],
+                "errors": acc["errors"],
+            }
+            for b, n in acc["hist"].items():
+                inc[f"hist.{b}"] = n
+            ops.append(UpdateOne(
+                {"granularity": granularity, "bucket_start": bucket_start, "kind": kind, **dict(dims)},
+                {"$inc": inc},
+                upsert=True,
+            ))
+
+        try:
+            db = MongoDB.get_db()
+            await getattr(db, COLLECTION).bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.error(f"[MetricsRollup] Failed to flush {len(ops)} buckets: {str(e)}")
+            for key, acc in pending.items():
+                cls._merge_back(key, acc)
+
+    @classmethod
+    def _merge_back(cls, key: Tuple, acc: Dict[str, Any]):
+        current = cls.pending.get(key)
+        if current is None:
+            cls.pending[key] = acc
+            return
+        for field in ("count", "latency_count", "sum_ms", "timeouts", "errors"):
+            current[field] += acc[field]
+        for b, n in acc["hist"].items():
+            current["hist"][b] = current["hist"].get(b, 0) + n
+
+    @staticmethod
+    async def load(kind: Optional[str], start: datetime, match: Optional[Dict] = None) -> List[Dict]:
+        """
+        Buckets covering [start, now): minute buckets up to the first full hour,
+        hour buckets from there on. `kind=None` loads access and service buckets
+        in one query.
+        """
+        first_full_hour = _floor_hour(start)
+        if first_full_hour < start:
+            first_full_hour += timedelta(hours=1)
+
+        query = {
+            **({"kind": kind} if kind else {}),
+            **(match or {}),
+            "$or": [
+                {"granularity": "minute", "bucket_start": {"$gte": start, "$lt": first_full_hour}},
+                {"granularity": "hour", "bucket_start": {"$gte": first_full_hour}},
+            ],
+        }
+        db = MongoDB.get_db()
+        cursor = getattr(db, COLLECTION).find(query, {"_id": 0})
+        return await cursor.to_list(length=None)
+
+
+def merge_buckets(buckets: List[Dict], group_by: Optional[str]) -> Dict[Any, Dict[str, Any]]:
+    """Merge bucket docs per value of `group_by` (or all together when None)."""
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for bucket in buckets:
+        key = bucket.get(group_by) if group_by else None
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"count": 0, "latency_count": 0, "sum_ms": 0.0, "timeouts": 0, "errors": 0, "sketch": LatencySketch()}
+        group["count"] += bucket.get("count", 0)
+        group["latency_count"] += bucket.get("latency_count", 0)
+        group["sum_ms"] += bucket.get("sum_ms", 0.0)
+        group["timeouts"] += bucket.get("timeouts", 0)
+        group["errors"] += bucket.get("errors", 0)
+        group["sketch"].merge(bucket.get("hist") or {})
+    return groups
+
+
+def avg_latency(group: Dict[str, Any]) -> Optional[float]:
+    return group["sum_ms"] / group["latency_count"] if group["latency_count"] else None
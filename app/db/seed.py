@@ -17,13 +17,15 @@ async def seed_db():
             "name": "Eduardo Arévalo",
             "endpoint_verify": "http://localhost:33210/verify",
             "threshold": 0.75,
-            "active": True
+            "active": True,
+            "max_in_flight": 16
         },
         {
             "name": "Cedric Kirmayr",
             "endpoint_verify": "http://localhost:33211/verify",
             "threshold": 0.75,
-            "active": True
+            "active": True,
+            "max_in_flight": 16
         },
     ]
     
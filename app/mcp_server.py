@@ -3,28 +3,28 @@ from app.service.pp2_service import PP2Service
 from app.service.fusion_service import FusionService
 from app.service.pp1_service import PP1Service
 from app.db.mongo import MongoDB
+from app.db.log_writer import LogWriter
+from app.service.agent_registry import AgentRegistry
+from app.service.image_preprocessor import ImagePreprocessor
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.http_client import HttpClientRegistry
+from contextlib import asynccontextmanager
 from uuid import uuid4
 import base64
-import io
 from datetime import datetime
 
-# Initialize FastMCP Server
-mcp = FastMCP("Orchestrator Agent")
-
-class MockUploadFile:
-    def __init__(self, data: bytes, filename: str = "image.jpg", content_type: str = "image/jpeg"):
-        self.file = io.BytesIO(data)
-        self.filename = filename
-        self.content_type = content_type
-
-    async def read(self, size: int = -1) -> bytes:
-        return self.file.read(size)
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    AgentRegistry.start()
+    yield
+    # Flush queued log rows and release pooled upstream connections on shutdown
+    await AgentRegistry.close()
+    await LogWriter.close()
+    await HttpClientRegistry.close()
+    CpuExecutor.close()
 
-    async def seek(self, offset: int) -> None:
-        self.file.seek(offset)
-
-    async def close(self) -> None:
-        self.file.close()
+# Initialize FastMCP Server
+mcp = FastMCP("Orchestrator Agent", lifespan=lifespan)
 
 def detect_image_info(data: bytes) -> tuple[str, str]:
     if data.startswith(b'\xff\xd8\xff'):
@@ -54,17 +54,17 @@ async def identify_person(image_b64: str, timeout_s: float = 3.0) -> str:
         image_b64 = image_b64.split(",")[1]
 
     try:
-        image_bytes = base64.b64decode(image_b64)
+        image_bytes = await CpuExecutor.run("base64_decode", base64.b64decode, image_b64, size=len(image_b64))
         if not image_bytes:
             return "Error: Decoded image is empty."
             
         filename, content_type = detect_image_info(image_bytes)
-        mock_file = MockUploadFile(image_bytes, filename=filename, content_type=content_type)
     except Exception as e:
         return f"Error decoding image: {str(e)}"
     
     # 1. Verify
-    pp2_results = await pp2.verify_parallel(request_id, mock_file)
+    image = await ImagePreprocessor.process(image_bytes, filename, content_type)
+    pp2_results = await pp2.verify_parallel(request_id, image.data, image.filename, image.content_type)
     
     # 2. Fuse
     fusion_result = fusion.process_results(pp2_results)
@@ -84,9 +84,7 @@ async def identify_person(image_b64: str, timeout_s: float = 3.0) -> str:
          "status_code": 200,
          "pp1_used": False
     }
-    db = mongo.get_db()
-    # Ensure logs collection exists or is written
-    await db.access_logs.insert_one(log_entry)
+    await LogWriter.write("access_logs", log_entry)
     
     if decision == "identified":
         return f"Identified as {identity_data['name']} (Score: {identity_data['score']:.2f})"
@@ -13,3 +13,17 @@ class IdentifyResponse(BaseModel):
     normativa_answer: Optional[NormativaAnswer] = None
     timing_ms: float
     request_id: str
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: str
+
+class BatchItemResult(BaseModel):
+    index: int
+    result: Optional[IdentifyResponse] = None
+    error: Optional[BatchItemError] = None
+
+class BatchIdentifyResponse(BaseModel):
+    batch_id: str
+    results: List[BatchItemResult]
+    timing_ms: float
@@ -1,8 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class AgentConfig(BaseModel):
+    # Shared read-only across requests by the agent registry
+    model_config = ConfigDict(frozen=True)
+
     name: str
     endpoint_verify: str
     threshold: float
     active: bool
+    # Concurrent calls this agent accepts across all workers (None: PP2_AGENT_MAX_IN_FLIGHT)
+    max_in_flight: Optional[int] = None
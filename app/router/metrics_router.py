@@ -1,168 +1,118 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime, timedelta
-from app.db.mongo import MongoDB
+from fastapi import APIRouter, HTTPException, Response
+from app.db.log_writer import LogWriter
+from app.service.admission_controller import admission_controller
+from app.service.bulkhead import bulkhead_stats
+from app.service.circuit_breaker import breaker_stats
+from app.service.latency_tracker import latency_stats
+from app.service.metrics_service import CACHE_STALE, CACHE_TTL, MetricsService
+from app.service.orchestrator_service import agent_router, coalesce_stats, speculation_policy
+from app.utils.cache import cache_stats
+from app.utils.cpu_executor import cpu_executor_stats
+from app.utils.prometheus import PROMETHEUS_AVAILABLE, render_latest
+from app.utils.singleflight import singleflight_stats
 from app.utils.logger import Logger
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 logger = Logger()
 
-# Helper to parse "days"
-def get_start_date(days: int = 7) -> datetime:
-    return datetime.utcnow() - timedelta(days=days)
+metrics_service = MetricsService()
+
+async def _cached_dashboard(response: Response, days: int) -> dict:
+    """Dashboard for `days` from the shared cache, with cache-age headers set on `response`."""
+    dashboard, age, state = await metrics_service.get_dashboard(days)
+    response.headers["Age"] = str(int(age))
+    response.headers["Cache-Control"] = f"max-age={int(CACHE_TTL)}, stale-while-revalidate={int(CACHE_STALE)}"
+    response.headers["X-Cache"] = state.upper()
+    return dashboard
+
+@router.get("/dashboard")
+async def get_dashboard(response: Response, days: int = 7):
+    """
+    Get summary, by-user-type, decisions and services in one response (single rollup query).
+    """
+    try:
+        logger.info(f"[MetricsRouter] Fetching dashboard for last {days} days")
+        return await _cached_dashboard(response, days)
+    except Exception as e:
+        logger.error(f"[MetricsRouter] Error fetching dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/summary")
-async def get_summary(days: int = 7):
+async def get_summary(response: Response, days: int = 7):
     """
     Get summary metrics (volume, latency, timeouts) + per-route stats.
     """
     try:
         logger.info(f"[MetricsRouter] Fetching summary for last {days} days")
-        db = MongoDB.get_db()
-        start_date = get_start_date(days)
-        
-        # Faceted Aggregation: Overall Summary + Per Route
-        # We need latencies array to calc p95 securely in Python
-        pipeline = [
-            {"$match": {"ts": {"$gte": start_date}}},
-            {"$facet": {
-                "overall": [
-                    {"$group": {
-                        "_id": None,
-                        "total_requests": {"$sum": 1},
-                        "avg_latency": {"$avg": "$timing_ms"},
-                        "timeouts": {"$sum": "$pp2_summary.timeouts"}
-                    }}
-                ],
-                "routes": [
-                    {"$group": {
-                        "_id": "$route",
-                        "count": {"$sum": 1},
-                        "latencies": {"$push": "$timing_ms"},
-                        "avg_latency": {"$avg": "$timing_ms"}
-                    }}
-                ]
-            }}
-        ]
-        
-        cursor = db.access_logs.aggregate(pipeline)
-        data = await cursor.to_list(length=1)
-        
-        if not data:
-             return {"period_days": days, "total_requests": 0, "routes": []}
-             
-        facet_result = data[0]
-        overall = facet_result["overall"][0] if facet_result["overall"] else {"total_requests": 0, "avg_latency": 0.0, "timeouts": 0}
-        routes_raw = facet_result["routes"]
-        
-        # Calculate Percentiles per route
-        routes_processed = []
-        import statistics
-        
-        for r in routes_raw:
-            latencies = sorted(r["latencies"])
-            count = len(latencies)
-            # Simple percentile calculation
-            def get_percentile(data, p):
-                 if not data: return 0
-                 k = (len(data)-1) * p
-                 f = int(k)
-                 c = int(k) + 1
-                 if c >= len(data): return data[-1]
-                 return data[f] * (c-k) + data[c] * (k-f)
-
-            p50 = get_percentile(latencies, 0.50)
-            p95 = get_percentile(latencies, 0.95)
-            
-            routes_processed.append({
-                "route": r["_id"],
-                "count": r["count"],
-                "avg_latency": round(r["avg_latency"], 3) if r["avg_latency"] is not None else 0.0,
-                "p50": round(p50, 3) if p50 is not None else 0.0,
-                "p95": round(p95, 3) if p95 is not None else 0.0
-            })
-
-        return {
-            "period_days": days,
-            "total_requests": overall["total_requests"],
-            "avg_latency": round(overall["avg_latency"], 3) if overall["avg_latency"] is not None else 0.0,
-            "timeouts": overall["timeouts"],
-            "routes": routes_processed
-        }
-
+        return (await _cached_dashboard(response, days))["summary"]
     except Exception as e:
         logger.error(f"[MetricsRouter] Error fetching summary: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/by-user-type")
-async def get_by_user_type(days: int = 7):
+async def get_by_user_type(response: Response, days: int = 7):
     """
     Get traffic distribution by user type.
     """
     try:
         logger.info(f"[MetricsRouter] Fetching user stats for last {days} days")
-        db = MongoDB.get_db()
-        start_date = get_start_date(days)
-        
-        pipeline = [
-            {"$match": {"ts": {"$gte": start_date}}},
-            {"$group": {
-                "_id": "$user.type",
-                "count": {"$sum": 1},
-                "avg_latency": {"$avg": "$timing_ms"}
-            }},
-             {"$sort": {"count": -1}}
-        ]
-        cursor = db.access_logs.aggregate(pipeline)
-        return await cursor.to_list(length=100)
+        return (await _cached_dashboard(response, days))["by_user_type"]
     except Exception as e:
         logger.error(f"[MetricsRouter] Error fetching user stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/decisions")
-async def get_decisions(days: int = 7):
+async def get_decisions(response: Response, days: int = 7):
     """
     Get decision distribution (identified/ambiguous/unknown).
     """
     try:
         logger.info(f"[MetricsRouter] Fetching decisions for last {days} days")
-        db = MongoDB.get_db()
-        start_date = get_start_date(days)
-        
-        pipeline = [
-            {"$match": {"ts": {"$gte": start_date}}},
-            {"$group": {
-                "_id": "$decision",
-                "count": {"$sum": 1}
-            }}
-        ]
-        cursor = db.access_logs.aggregate(pipeline)
-        return await cursor.to_list(length=100)
+        return (await _cached_dashboard(response, days))["decisions"]
     except Exception as e:
         logger.error(f"[MetricsRouter] Error fetching decisions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/services")
-async def get_services(days: int = 7):
+async def get_services(response: Response, days: int = 7):
     """
     Get PP2 service performance stats.
     """
     try:
         logger.info(f"[MetricsRouter] Fetching service stats for last {days} days")
-        db = MongoDB.get_db()
-        start_date = get_start_date(days)
-        
-        pipeline = [
-            {"$match": {"ts": {"$gte": start_date}, "service_type": "pp2"}},
-            {"$group": {
-                "_id": "$service_name",
-                "queries": {"$sum": 1},
-                "timeouts": {"$sum": {"$cond": ["$timeout", 1, 0]}},
-                "avg_latency": {"$avg": "$latency_ms"}
-            }},
-            {"$sort": {"timeouts": -1}}
-        ]
-        cursor = db.service_logs.aggregate(pipeline)
-        return await cursor.to_list(length=100)
+        return (await _cached_dashboard(response, days))["services"]
     except Exception as e:
         logger.error(f"[MetricsRouter] Error fetching service services: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/runtime")
+async def get_runtime():
+    """
+    Get in-process counters of this worker (caches, log pipeline, agents). No database access.
+    """
+    return {
+        "caches": cache_stats(),
+        "singleflight": singleflight_stats(),
+        "identify_coalescing": dict(coalesce_stats),
+        "log_writer": dict(LogWriter.stats),
+        "agents": latency_stats(),
+        "circuit_breakers": breaker_stats(),
+        "bulkheads": bulkhead_stats(),
+        "pp1_speculation": speculation_policy.stats(),
+        "routing": agent_router.stats(),
+        "admission": admission_controller.stats(),
+        "cpu_executor": cpu_executor_stats(),
+    }
+
+
+@router.get("/prom")
+async def get_prometheus():
+    """
+    Prometheus scrape endpoint (latency histograms, per-agent counters, cache
+    lookups, in-flight gauges). Served from memory, aggregated across gunicorn
+    workers when PROMETHEUS_MULTIPROC_DIR is set. No database access.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
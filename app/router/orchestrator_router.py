@@ -1,8 +1,22 @@
-from typing import Annotated, Optional
-from fastapi import APIRouter, File, Form, UploadFile, Header, Request, HTTPException, Depends
-from app.model.api_models import IdentifyResponse
-from app.service.orchestrator_service import OrchestratorService
+import base64
+import binascii
+import json
+import time
+from contextlib import AsyncExitStack
+from functools import partial
+from typing import Annotated, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Header, Request, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.formparsers import MultiPartException, MultiPartParser
+from app.model.api_models import BatchIdentifyResponse, IdentifyResponse
+from app.service.admission_controller import admission_controller
+from app.service.upload_ingest import MAX_FORM_OVERHEAD_BYTES, ingest_image_upload
+from app.service.orchestrator_service import BATCH_MAX_IMAGES, BatchImage, OrchestratorService
+from app.utils import fast_json
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.fast_json import model_response
 from app.utils.logger import Logger
+from app.utils.prometheus import IN_FLIGHT, REQUEST_LATENCY
 from app.utils.security import verify_token, hash_data
 
 from app.service.validation_service import ValidationService
@@ -14,11 +28,33 @@ logger = Logger()
 orchestrator_service = OrchestratorService()
 validation_service = ValidationService()
 
-@router.post("/identify-and-answer", response_model=IdentifyResponse, dependencies=[Depends(verify_token)])
+# Largest batch body accepted: every image at the size limit, base64-inflated
+# (NDJSON) plus per-image framing and fields
+NDJSON_MAX_LINE_BYTES = (ValidationService.MAX_FILE_SIZE_BYTES * 4 + 2) // 3 + MAX_FORM_OVERHEAD_BYTES
+BATCH_MAX_BODY_BYTES = BATCH_MAX_IMAGES * NDJSON_MAX_LINE_BYTES
+
+# The body is parsed by the streaming ingest, not by FastAPI; keep it documented
+IDENTIFY_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["image"],
+                    "properties": {
+                        "image": {"type": "string", "format": "binary"},
+                        "question": {"type": "string"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+@router.post("/identify-and-answer", response_model=IdentifyResponse, dependencies=[Depends(verify_token)], openapi_extra=IDENTIFY_REQUEST_BODY)
 async def identify_and_answer(
     request: Request,
-    image: Annotated[UploadFile, File(...)],
-    question: Annotated[Optional[str], Form()] = None,
     x_user_id: Annotated[Optional[str], Header()] = None,
     x_user_type: Annotated[Optional[str], Header()] = None,
 ):
@@ -26,39 +62,288 @@ async def identify_and_answer(
     Process an identification request and optionally answer a question.
     Requires Bearer Token authentication.
     """
+    start_time = time.time()
+    decision = "error"
+    IN_FLIGHT.labels("identify").inc()
     try:
         logger.info(f"[OrchestratorRouter] Received identify request from user_id={x_user_id} type={x_user_type}")
         
-        image_bytes = await image.read()
+        # Admission control (cap in-flight, shed by priority) before the upload is read
+        async with admission_controller.admit(x_user_type):
+            # 1 + 2. Validation and hashing in the same pass that reads the upload
+            image, fields = await ingest_image_upload(request, "image", validation_service)
+            image_bytes = image.data
+            image_hash = image.sha256
+            question = fields.get("question") or None
+
+            # Construct Context
+            user_context = {
+                "id": x_user_id,
+                "type": x_user_type,
+                "role": "basic"
+            }
+
+            # Delegate to Service
+            response = await orchestrator_service.handle_identify_request(
+                image=image,
+                image_bytes=image_bytes,
+                question=question,
+                user_context=user_context,
+                request_obj=request,
+                image_hash=image_hash
+            )
+        decision = response.decision.value
+
+        if fast_json.ENABLED:
+            return model_response(response)
+        return response
+
+    except HTTPException as e:
+        logger.error(f"[OrchestratorRouter] HTTP Exception: {str(e)}")
+        raise e
+    except Exception as e:
+        logger.error(f"[OrchestratorRouter] Error processing request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        IN_FLIGHT.labels("identify").dec()
+        REQUEST_LATENCY.labels("/identify-and-answer", decision).observe(time.time() - start_time)
+
+
+def _encode_event(event: Dict, sse: bool) -> bytes:
+    data = fast_json.dumps(event)
+    if sse:
+        return b"event: " + event["event"].encode() + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+async def _stream_events(events: AsyncIterator[Dict], sse: bool, start_time: float) -> AsyncIterator[bytes]:
+    """Encodes identify events for the wire."""
+    decision = "error"
+    IN_FLIGHT.labels("identify").inc()
+    try:
+        async for event in events:
+            if event["event"] == "result":
+                decision = event["decision"]
+            yield _encode_event(event, sse)
+    except Exception as e:
+        # Headers are already sent: report the failure in-band
+        logger.error(f"[OrchestratorRouter] Error while streaming: {str(e)}")
+        yield _encode_event({"event": "error", "status_code": 500, "detail": str(e)}, sse)
+    finally:
+        await events.aclose()
+        IN_FLIGHT.labels("identify").dec()
+        REQUEST_LATENCY.labels("/identify-and-answer/stream", decision).observe(time.time() - start_time)
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that owns an admission slot. The slot is released when
+    the response finishes, fails or is abandoned, even if the body iterator
+    never started (client gone before the response start was sent).
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], admission: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.admission.aclose()
+
+@router.post("/identify-and-answer/stream", dependencies=[Depends(verify_token)], openapi_extra=IDENTIFY_REQUEST_BODY)
+async def identify_and_answer_stream(
+    request: Request,
+    x_user_id: Annotated[Optional[str], Header()] = None,
+    x_user_type: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Streaming variant of /identify-and-answer: NDJSON events (or SSE with
+    `Accept: text/event-stream`) for each agent score, the fusion decision,
+    the PP1 answer chunks and a final IdentifyResponse-shaped "result".
+    Requires Bearer Token authentication.
+    """
+    start_time = time.time()
+    try:
+        logger.info(f"[OrchestratorRouter] Received streaming identify request from user_id={x_user_id} type={x_user_type}")
+        # Admitted (or shed with 503) before the upload is read; released by the response
+        admission = AsyncExitStack()
+        await admission.enter_async_context(admission_controller.admit(x_user_type))
+        try:
+            image, fields = await ingest_image_upload(request, "image", validation_service)
+            user_context = {
+                "id": x_user_id,
+                "type": x_user_type,
+                "role": "basic"
+            }
+
+            events = orchestrator_service.stream_identify(
+                image_bytes=image.data,
+                filename=image.filename,
+                content_type=image.content_type,
+                question=fields.get("question") or None,
+                user_context=user_context,
+                request_obj=request,
+                image_hash=image.sha256
+            )
+            sse = "text/event-stream" in request.headers.get("accept", "")
+            return AdmittedStreamingResponse(
+                _stream_events(events, sse, start_time),
+                admission,
+                media_type="text/event-stream" if sse else "application/x-ndjson",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        except BaseException:
+            await admission.aclose()
+            raise
+    except HTTPException as e:
+        logger.error(f"[OrchestratorRouter] HTTP Exception: {str(e)}")
+        raise e
+    except Exception as e:
+        logger.error(f"[OrchestratorRouter] Error processing request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _validated(filename: Optional[str], content_type: Optional[str], data: bytes, question: Optional[str]) -> BatchImage:
+    item = BatchImage(filename=filename, content_type=content_type, data=data, question=question or None)
+    try:
+        validation_service.validate_image(item, data)
+    except HTTPException as e:
+        return item._replace(error=e)
+    return item._replace(image_hash=await CpuExecutor.run("hash", hash_data, data, size=len(data)))
+
+def _check_batch_length(request: Request):
+    """Refuses a declared body that can never fit, before any of it is read."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > BATCH_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Payload too large. Max batch size is {BATCH_MAX_BODY_BYTES} bytes.")
+
+async def _limited_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """The request body, failing with 413 as soon as more than `limit` bytes arrive."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(status_code=413, detail=f"Payload too large. Max batch size is {limit} bytes.")
+        yield chunk
+
+async def _read_multipart_batch(request: Request) -> List[BatchImage]:
+    """Files in repeated `images` fields; optional `questions` fields aligned by position."""
+    try:
+        form = await MultiPartParser(request.headers, _limited_stream(request, BATCH_MAX_BODY_BYTES), max_files=BATCH_MAX_IMAGES, max_fields=BATCH_MAX_IMAGES * 2).parse()
+    except MultiPartException as e:
+        # Starlette's own HTTPException would escape our handlers as a 500
+        status_code = 413 if e.message.startswith("Too many") else 400
+        raise HTTPException(status_code=status_code, detail=e.message)
+    try:
+        images = form.getlist("images")
+        questions = form.getlist("questions")
+        items = []
+        for i, image in enumerate(images):
+            if isinstance(image, str):
+                raise HTTPException(status_code=400, detail=f"Field 'images' #{i} is not a file")
+            question = questions[i] if i < len(questions) else None
+            try:
+                # Checked on the spooled size, before the file is loaded into memory
+                validation_service.check_size(image.size or 0)
+            except HTTPException as e:
+                items.append(BatchImage(filename=image.filename, content_type=image.content_type, data=b"", question=question, error=e))
+                continue
+            items.append(await _validated(image.filename, image.content_type, await image.read(), question))
+        return items
+    finally:
+        await form.close()
+
+async def _parse_ndjson_line(i: int, line: bytes) -> BatchImage:
+    try:
+        record = await CpuExecutor.run("json_parse", json.loads, line, size=len(line))
+        image_b64 = record["image_b64"]
+        data = await CpuExecutor.run("base64_decode", partial(base64.b64decode, validate=True), image_b64, size=len(image_b64))
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        return BatchImage(filename=None, content_type=None, data=b"", error=HTTPException(status_code=400, detail=f"Invalid NDJSON line {i}: {str(e)}"))
+    return await _validated(record.get("filename"), record.get("content_type"), data, record.get("question"))
 
-        # 1. Validation
-        validation_service.validate_image(image, image_bytes)
+async def _read_ndjson_batch(request: Request) -> List[BatchImage]:
+    """One JSON object per line: {"image_b64", "filename", "content_type", "question"}."""
+    items = []
+    buffer = bytearray()
+    line_number = 0
 
-        # 2. Metadata (Hashing)
-        image_hash = hash_data(image_bytes)
+    def too_large() -> HTTPException:
+        return HTTPException(status_code=413, detail=f"NDJSON line {line_number} is too large. Max image size is {ValidationService.MAX_FILE_SIZE_MB}MB.")
 
-        # Construct Context
+    async def take(line: bytes):
+        nonlocal line_number
+        if len(line) > NDJSON_MAX_LINE_BYTES:
+            raise too_large()
+        if line.strip():
+            if len(items) == BATCH_MAX_IMAGES:
+                raise HTTPException(status_code=413, detail=f"Too many images. Max is {BATCH_MAX_IMAGES} per batch.")
+            items.append(await _parse_ndjson_line(line_number, line))
+        line_number += 1
+
+    # Lines are decoded as they arrive; an oversized line is refused before it is complete
+    async for chunk in _limited_stream(request, BATCH_MAX_BODY_BYTES):
+        buffer += chunk
+        while (end := buffer.find(b"\n")) >= 0:
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            await take(line)
+        if len(buffer) > NDJSON_MAX_LINE_BYTES:
+            raise too_large()
+    await take(bytes(buffer))
+    return items
+
+@router.post("/identify-and-answer/batch", response_model=BatchIdentifyResponse, dependencies=[Depends(verify_token)])
+async def identify_and_answer_batch(
+    request: Request,
+    x_user_id: Annotated[Optional[str], Header()] = None,
+    x_user_type: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Identify several images in one request (multipart `images`/`questions`
+    fields, or application/x-ndjson). Returns one result per image, in order.
+    Requires Bearer Token authentication.
+    """
+    start_time = time.time()
+    decision = "error"
+    IN_FLIGHT.labels("batch").inc()
+    try:
+        _check_batch_length(request)
+        content_type = request.headers.get("content-type", "")
+        if not content_type.startswith(("multipart/form-data", "application/x-ndjson", "application/ndjson")):
+            raise HTTPException(status_code=415, detail="Use multipart/form-data or application/x-ndjson")
+
+        # Shed before the upload is read; the read itself occupies a slot
+        async with admission_controller.admit(x_user_type):
+            if content_type.startswith("multipart/form-data"):
+                items = await _read_multipart_batch(request)
+            else:
+                items = await _read_ndjson_batch(request)
+
+        if not items:
+            raise HTTPException(status_code=400, detail="No images in batch")
+        if len(items) > BATCH_MAX_IMAGES:
+            raise HTTPException(status_code=413, detail=f"Too many images. Max is {BATCH_MAX_IMAGES} per batch.")
+
+        logger.info(f"[OrchestratorRouter] Received identify batch of {len(items)} images from user_id={x_user_id} type={x_user_type}")
         user_context = {
             "id": x_user_id,
             "type": x_user_type,
             "role": "basic"
         }
-
-        # Delegate to Service
-        response = await orchestrator_service.handle_identify_request(
-            image=image,
-            image_bytes=image_bytes,
-            question=question,
-            user_context=user_context,
-            request_obj=request,
-            image_hash=image_hash
-        )
-        
+        # Each image is admitted on its own, so a batch counts like len(items) requests
+        response = await orchestrator_service.handle_identify_batch(items, user_context, request_obj=request, admission=admission_controller)
+        decision = "completed"
+        if fast_json.ENABLED:
+            return model_response(response)
         return response
 
     except HTTPException as e:
         logger.error(f"[OrchestratorRouter] HTTP Exception: {str(e)}")
         raise e
     except Exception as e:
-        logger.error(f"[OrchestratorRouter] Error processing request: {str(e)}")
+        logger.error(f"[OrchestratorRouter] Error processing batch: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        IN_FLIGHT.labels("batch").dec()
+        REQUEST_LATENCY.labels("/identify-and-answer/batch", decision).observe(time.time() - start_time)
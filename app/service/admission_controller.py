@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.utils.logger import Logger
+from app.utils.prometheus import ADMISSION_QUEUE_DEPTH, ADMISSION_SHED
+
+load_dotenv()
+
+ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# Requests expected to wait longer than this are shed instead of queued
+QUEUE_TARGET_MS = float(os.getenv("ADMISSION_QUEUE_TARGET_MS", "2000"))
+# Highest priority first; any other x_user_type (or none) ranks below all of them
+PRIORITIES = [p.strip().lower() for p in os.getenv("ADMISSION_PRIORITIES", "staff,student").split(",") if p.strip()]
+EWMA_ALPHA = 0.2
+
+logger = Logger()
+
+
+def user_type_label(user_type: Optional[str], known=PRIORITIES) -> str:
+    """Bounded key for a client-supplied x_user_type: a configured priority, "other" or "anonymous"."""
+    if not user_type:
+        return "anonymous"
+    return user_type.lower() if user_type.lower() in known else "other"
+
+
+class AdmissionController:
+    """
+    Caps in-flight identifications. Requests beyond the cap wait in a bounded
+    queue ordered by x_user_type priority (FIFO within a priority). A request
+    is shed with 503 + Retry-After when its estimated wait exceeds the queue
+    target, when it has actually waited that long, or when the queue is full
+    and it is (or is displaced by) a higher-priority request.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_queue: int = MAX_QUEUE,
+        queue_target_ms: float = QUEUE_TARGET_MS,
+        priorities: List[str] = PRIORITIES,
+        enabled: bool = ENABLED,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_target_ms = queue_target_ms
+        self.priorities = {user_type: rank for rank, user_type in enumerate(priorities)}
+        self.enabled = enabled
+        self.in_flight = 0
+        # (priority, seq, future, user_type); seq keeps FIFO order and avoids comparing futures
+        self._waiters: List[Tuple[int, int, asyncio.Future, Optional[str]]] = []
+        self._seq = itertools.count()
+        self._service_ms: Optional[float] = None
+        self.admitted = 0
+        self.queued = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "wait_estimate": 0, "wait_timeout": 0, "preempted": 0}
+
+    def priority(self, user_type: Optional[str]) -> int:
+        return self.priorities.get((user_type or "").lower(), len(self.priorities))
+
+    def _label(self, user_type: Optional[str]) -> str:
+        """Bounded label for metrics; x_user_type is client-supplied."""
+        return user_type_label(user_type, self.priorities)
+
+    def estimated_wait_ms(self, priority: int) -> float:
+        """Expected queue wait for a new request of `priority`, from the service time EWMA."""
+        if self._service_ms is None:
+            return 0.0
+        ahead = sum(1 for p, _, future, _ in self._waiters if p <= priority and not future.done())
+        return (ahead + 1) / self.max_in_flight * self._service_ms
+
+    @asynccontextmanager
+    async def admit(self, user_type: Optional[str]) -> AsyncIterator[None]:
+        """Holds an in-flight slot for the duration of the block, or raises 503."""
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(user_type)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._observe((time.monotonic() - start) * 1000)
+            self.release()
+
+    async def acquire(self, user_type: Optional[str]):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        priority = self.priority(user_type)
+        estimate = self.estimated_wait_ms(priority)
+        if estimate > self.queue_target_ms:
+            raise self._shed("wait_estimate", user_type, estimate)
+
+        if len(self._waiters) >= self.max_queue:
+            lowest = max(self._waiters)
+            if lowest[0] <= priority:
+                raise self._shed("queue_full", user_type, estimate)
+            # Make room by displacing the newest request of the lowest priority
+            self._waiters.remove(lowest)
+            heapq.heapify(self._waiters)
+            lowest[2].set_exception(self._shed("preempted", lowest[3], estimate))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future, user_type)
+        heapq.heappush(self._waiters, entry)
+        self.queued += 1
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_target_ms / 1000)
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            if not (future.done() and not future.cancelled() and future.exception() is None):
+                raise self._shed("wait_timeout", user_type, self.queue_target_ms)
+        except asyncio.CancelledError:
+            # Client went away; hand back a slot granted in the meantime
+            self._remove(entry)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        self.admitted += 1
+
+    def release(self):
+        """Frees a slot, handing it directly to the highest-priority waiter if any."""
+        while self._waiters:
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if not future.done():
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+                future.set_result(True)
+                return
+        ADMISSION_QUEUE_DEPTH.set(0)
+        self.in_flight -= 1
+
+    def _remove(self, entry: Tuple):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+    def _observe(self, service_ms: float):
+        if self._service_ms is None:
+            self._service_ms = service_ms
+        else:
+            self._service_ms = EWMA_ALPHA * service_ms + (1 - EWMA_ALPHA) * self._service_ms
+
+    def _shed(self, reason: str, user_type: Optional[str], wait_ms: float) -> HTTPException:
+        self.shed[reason] += 1
+        ADMISSION_SHED.labels(reason, self._label(user_type)).inc()
+        logger.info(f"[AdmissionController] Shedding request ({reason}) user_type={user_type}")
+        retry_after = max(1, math.ceil(max(wait_ms, self.queue_target_ms) / 1000))
+        return HTTPException(
+            status_code=503,
+            detail="Server overloaded, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "service_ms_ewma": round(self._service_ms, 3) if self._service_ms is not None else None,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+        }
+
+
+# Shared by the identify routes of this worker
+admission_controller = AdmissionController()
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.db.mongo import MongoDB
+from app.model.db_models import AgentConfig
+from app.utils.logger import Logger
+
+load_dotenv()
+
+REFRESH_TTL = float(os.getenv("AGENT_REGISTRY_TTL_SECONDS", "5.0"))
+WATCH_ENABLED = os.getenv("AGENT_REGISTRY_WATCH", "false").lower() == "true"
+
+logger = Logger()
+
+
+class AgentSnapshot(NamedTuple):
+    version: str
+    agents: Tuple[AgentConfig, ...]
+    loaded_at: float
+
+
+class AgentRegistry:
+    """
+    In-memory copy of the active agents in the 'config' collection.
+    Reads return the current immutable snapshot without locking or I/O; a
+    stale snapshot (older than REFRESH_TTL) triggers one background reload.
+    With AGENT_REGISTRY_WATCH a change stream forces a reload on every write
+    (needs a replica set). A failed reload keeps serving the last good snapshot.
+    """
+    snapshot: Optional[AgentSnapshot] = None
+    refresh_task: Optional[asyncio.Task] = None
+    watch_task: Optional[asyncio.Task] = None
+    _initial_load: Optional[asyncio.Lock] = None
+
+    @classmethod
+    async def get_snapshot(cls) -> AgentSnapshot:
+        snapshot = cls.snapshot
+        if snapshot is None:
+            return await cls._load_first()
+
+        if time.monotonic() - snapshot.loaded_at > REFRESH_TTL:
+            cls._schedule_refresh()
+        return snapshot
+
+    @classmethod
+    async def get_agents(cls) -> List[AgentConfig]:
+        return list((await cls.get_snapshot()).agents)
+
+    @classmethod
+    async def _load_first(cls) -> AgentSnapshot:
+        if cls._initial_load is None:
+            cls._initial_load = asyncio.Lock()
+        async with cls._initial_load:
+            # Concurrent first requests share one load
+            if cls.snapshot is None:
+                await cls.refresh(raise_on_error=True)
+        return cls.snapshot
+
+    @classmethod
+    def _schedule_refresh(cls):
+        if cls.refresh_task is None or cls.refresh_task.done():
+            cls.refresh_task = asyncio.get_running_loop().create_task(cls.refresh())
+
+    @classmethod
+    async def refresh(cls, raise_on_error: bool = False):
+        """Reload active agents from Mongo and swap the snapshot in one assignment."""
+        try:
+            db = MongoDB.get_db()
+            cursor = db.config.find({"active": True})
+            # No cap: a silent cut-off at 100 would drop agents from every fan-out
+            docs = await cursor.to_list(length=None)
+        except Exception as e:
+            logger.error(f"[AgentRegistry] Refresh failed, keeping last snapshot: {str(e)}")
+            if raise_on_error:
+                raise
+            # Retry on the next stale read rather than on every request
+            if cls.snapshot is not None:
+                cls.snapshot = cls.snapshot._replace(loaded_at=time.monotonic())
+            return
+
+        agents = []
+        for doc in docs:
+            try:
+                agents.append(AgentConfig.model_validate(doc))
+            except Exception as e:
+                logger.warning(f"[AgentRegistry] Skipping invalid agent config {doc.get('name')}: {str(e)}")
+
+        version = cls._fingerprint(agents)
+        if cls.snapshot is None or cls.snapshot.version != version:
+            logger.info(f"[AgentRegistry] Loaded {len(agents)} active agents (version {version[:12]})")
+        cls.snapshot = AgentSnapshot(version=version, agents=tuple(agents), loaded_at=time.monotonic())
+
+    @staticmethod
+    def _fingerprint(agents: List[AgentConfig]) -> str:
+        entries = sorted(a.model_dump_json() for a in agents)
+        return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
+    @classmethod
+    async def _watch(cls):
+        try:
+            db = MongoDB.get_db()
+            async with db.config.watch() as stream:
+                async for _ in stream:
+                    await cls.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[AgentRegistry] Change stream unavailable, using TTL polling only: {str(e)}")
+
+    @classmethod
+    def start(cls):
+        """Start the optional change-stream watcher. Called on startup."""
+        if WATCH_ENABLED and (cls.watch_task is None or cls.watch_task.done()):
+            cls.watch_task = asyncio.get_running_loop().create_task(cls._watch())
+
+    @classmethod
+    async def close(cls):
+        """Stop background tasks and drop the snapshot. Called on shutdown."""
+        for task in (cls.watch_task, cls.refresh_task):
+            if task is not None and not task.done():
+                try:
+                    task.cancel()
+                    await task
+                except (asyncio.CancelledError, RuntimeError):
+                    # RuntimeError: task belongs to a loop that is already gone
+                    pass
+        cls.watch_task = None
+        cls.refresh_task = None
+        cls.snapshot = None
+        cls._initial_load = None
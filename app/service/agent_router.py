@@ -0,0 +1,223 @@
+import asyncio
+import os
+import random
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.db.mongo import MongoDB
+from app.model.db_models import AgentConfig
+from app.service.admission_controller import user_type_label
+from app.utils.logger import Logger
+from app.utils.prometheus import PP2_CALLS_SAVED
+
+load_dotenv()
+
+ENABLED = os.getenv("ROUTING_ENABLED", "false").lower() == "true"
+# Agents queried in the first stage of a cascaded fan-out
+TOP_K = int(os.getenv("ROUTING_TOP_K", "3"))
+# Share of cascaded requests that also query the rest, to measure agreement
+AUDIT_RATE = float(os.getenv("ROUTING_AUDIT_RATE", "0.05"))
+# Identifications remembered per user id / user type
+WINDOW_SIZE = int(os.getenv("ROUTING_WINDOW", "50"))
+# User ids and image hashes tracked before the least recently used are dropped
+MAX_KEYS = int(os.getenv("ROUTING_MAX_KEYS", "10000"))
+WARM_START_DAYS = int(os.getenv("ROUTING_WARM_START_DAYS", "7"))
+WARM_START_LIMIT = int(os.getenv("ROUTING_WARM_START_LIMIT", "5000"))
+
+# Signal weights: an image seen before outranks the user's history, which outranks their type
+WEIGHT_IMAGE = 100.0
+WEIGHT_USER = 10.0
+WEIGHT_USER_TYPE = 1.0
+WEIGHT_GLOBAL = 0.1
+
+logger = Logger()
+
+
+class RoutePlan:
+    """Agents to query first and the ones held back for escalation."""
+
+    def __init__(self, first: List[AgentConfig], rest: List[AgentConfig], audit: bool = False):
+        self.first = first
+        self.rest = rest
+        self.audit = audit
+
+    @property
+    def cascaded(self) -> bool:
+        return bool(self.rest)
+
+
+class AgentRouter:
+    """
+    Ranks agents by how likely they are to match a request, from past
+    identifications for the same image hash, user id and user type (warm-started
+    from access_logs, then kept in process). A cascaded fan-out queries the TOP_K
+    best-ranked agents first and escalates to the rest only when fusion is not
+    "identified". A sample of AUDIT_RATE cascaded requests queries everyone
+    anyway and records whether the first-stage decision agreed.
+    """
+
+    def __init__(self, enabled: bool = ENABLED, top_k: int = TOP_K, audit_rate: float = AUDIT_RATE):
+        self.enabled = enabled
+        self.top_k = top_k
+        self.audit_rate = audit_rate
+        self.by_image: "OrderedDict[str, str]" = OrderedDict()
+        self.by_user: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self.by_user_type: Dict[str, Deque[str]] = {}
+        self.overall: Counter = Counter()
+        self.warm_task: Optional[asyncio.Task] = None
+        self.counters = {
+            "routed": 0,
+            "full_fanout": 0,
+            "first_stage_settled": 0,
+            "escalated_unknown": 0,
+            "escalated_ambiguous": 0,
+            "escalated_errors": 0,
+            "audited": 0,
+            "audit_agreed": 0,
+            "audit_disagreed": 0,
+            "calls_made": 0,
+            "calls_saved": 0,
+        }
+
+    @staticmethod
+    def _touch(store: "OrderedDict[str, Any]", key: str, value: Any):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > MAX_KEYS:
+            store.popitem(last=False)
+
+    def record(self, user_context: Optional[Dict], image_hash: Optional[str], identity: Optional[str]):
+        """Remembers who an identified request matched."""
+        if not self.enabled or not identity:
+            return
+        user_context = user_context or {}
+        if image_hash:
+            self._touch(self.by_image, image_hash, identity)
+        user_id = user_context.get("id")
+        if user_id:
+            window = self.by_user.get(user_id) or deque(maxlen=WINDOW_SIZE)
+            window.append(identity)
+            self._touch(self.by_user, user_id, window)
+        user_type = user_context.get("type")
+        if user_type:
+            self.by_user_type.setdefault(user_type_label(user_type), deque(maxlen=WINDOW_SIZE)).append(identity)
+        self.overall[identity] += 1
+
+    def rank(self, agents: List[AgentConfig], user_context: Optional[Dict], image_hash: Optional[str]) -> List[Tuple[AgentConfig, float]]:
+        """Agents with their routing score, best first; ties keep roster order."""
+        user_context = user_context or {}
+        scores: Counter = Counter()
+        if image_hash and image_hash in self.by_image:
+            scores[self.by_image[image_hash]] += WEIGHT_IMAGE
+        for weight, window in (
+            (WEIGHT_USER, self.by_user.get(user_context.get("id") or "")),
+            (WEIGHT_USER_TYPE, self.by_user_type.get(user_type_label(user_context.get("type")))),
+        ):
+            if window:
+                for name, count in Counter(window).items():
+                    scores[name] += weight * count / len(window)
+        total = sum(self.overall.values())
+        if total:
+            for name, count in self.overall.items():
+                scores[name] += WEIGHT_GLOBAL * count / total
+        ranked = [(agent, scores.get(agent.name, 0.0)) for agent in agents]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    def plan(self, agents: List[AgentConfig], user_context: Optional[Dict], image_hash: Optional[str]) -> RoutePlan:
+        """
+        Splits the roster into a first stage and an escalation stage. Falls back
+        to one full fan-out when routing is off, the roster is small, or there is
+        no history that favours any agent.
+        """
+        if not self.enabled or len(agents) <= self.top_k:
+            return RoutePlan(list(agents), [])
+        ranked = self.rank(agents, user_context, image_hash)
+        if ranked[0][1] <= 0:
+            self.counters["full_fanout"] += 1
+            return RoutePlan(list(agents), [])
+        self.counters["routed"] += 1
+        first = [agent for agent, _ in ranked[:self.top_k]]
+        rest = [agent for agent, _ in ranked[self.top_k:]]
+        return RoutePlan(first, rest, audit=random.random() < self.audit_rate)
+
+    def record_outcome(self, plan: RoutePlan, escalation: Optional[str], queried: int):
+        """`escalation` is why the rest were queried (None if the first stage settled)."""
+        if not plan.cascaded:
+            return
+        saved = len(plan.first) + len(plan.rest) - queried
+        self.counters["calls_made"] += queried
+        self.counters["calls_saved"] += saved
+        PP2_CALLS_SAVED.labels("routing").inc(saved)
+        if escalation is None:
+            self.counters["first_stage_settled"] += 1
+        else:
+            self.counters[f"escalated_{escalation}"] += 1
+
+    def record_audit(self, first_stage: Dict, full: Dict):
+        """Compares the first-stage decision with the one from every agent."""
+        self.counters["audited"] += 1
+        agreed = first_stage["decision"] == full["decision"] and first_stage["identity"]["name"] == full["identity"]["name"]
+        self.counters["audit_agreed" if agreed else "audit_disagreed"] += 1
+        if not agreed:
+            logger.warning(
+                "[AgentRouter] Audit disagreement",
+                first_stage=first_stage["decision"], first_identity=first_stage["identity"]["name"],
+                full=full["decision"], full_identity=full["identity"]["name"],
+            )
+
+    async def warm_start(self):
+        """Replays recent identifications from access_logs into the in-process history."""
+        try:
+            db = MongoDB.get_db()
+            since = datetime.utcnow() - timedelta(days=WARM_START_DAYS)
+            cursor = db.access_logs.find(
+                {"decision": "identified", "ts": {"$gte": since}},
+                {"user": 1, "input_metadata.image_hash": 1, "identity.name": 1},
+            ).sort("ts", -1).limit(WARM_START_LIMIT)
+            docs = await cursor.to_list(length=WARM_START_LIMIT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[AgentRouter] Warm start failed, starting with no history: {str(e)}")
+            return
+
+        # Oldest first, so the newest identifications end up most recent
+        for doc in reversed(docs):
+            self.record(
+                doc.get("user"),
+                (doc.get("input_metadata") or {}).get("image_hash"),
+                (doc.get("identity") or {}).get("name"),
+            )
+        logger.info(f"[AgentRouter] Warm start loaded {len(docs)} identifications")
+
+    def start(self):
+        """Warm-start in the background so startup does not wait on Mongo. Called on startup."""
+        if self.enabled and (self.warm_task is None or self.warm_task.done()):
+            self.warm_task = asyncio.get_running_loop().create_task(self.warm_start())
+
+    async def close(self):
+        if self.warm_task is not None and not self.warm_task.done():
+            try:
+                self.warm_task.cancel()
+                await self.warm_task
+            except (asyncio.CancelledError, RuntimeError):
+                pass
+        self.warm_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.counters["calls_made"] + self.counters["calls_saved"]
+        audited = self.counters["audited"]
+        return {
+            "enabled": self.enabled,
+            "top_k": self.top_k,
+            "audit_rate": self.audit_rate,
+            **self.counters,
+            "calls_saved_ratio": round(self.counters["calls_saved"] / calls, 4) if calls else 0.0,
+            "audit_agreement": round(self.counters["audit_agreed"] / audited, 4) if audited else None,
+            "tracked_images": len(self.by_image),
+            "tracked_users": len(self.by_user),
+        }
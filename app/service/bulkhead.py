@@ -0,0 +1,109 @@
+import asyncio
+import math
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Per-agent limit when the agent's config document has no `max_in_flight`
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("PP2_AGENT_MAX_IN_FLIGHT", "16"))
+# Configured limits are per agent across the deployment; each worker takes its share
+WORKERS = max(1, int(os.getenv("PP2_BULKHEAD_WORKERS", "1")))
+
+
+class Bulkhead:
+    """
+    Per-agent cap on concurrent outbound calls. Callers beyond the limit wait
+    in strict FIFO order (a freed slot is handed to the oldest waiter, never
+    grabbed by a newcomer), so overload turns into measurable queueing.
+    """
+    bulkheads: Dict[str, "Bulkhead"] = {}
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.acquired = 0
+        self.queued = 0
+        self.queue_timeouts = 0
+        self.max_queue_depth = 0
+
+    @classmethod
+    def for_agent(cls, name: str, max_in_flight: Optional[int] = None) -> "Bulkhead":
+        total = max_in_flight or DEFAULT_MAX_IN_FLIGHT
+        # Calls beyond the worker's share queue, and surface as QueueTimeout if they wait too long
+        limit = max(1, math.ceil(total / WORKERS))
+        bulkhead = cls.bulkheads.get(name)
+        if bulkhead is None:
+            bulkhead = cls.bulkheads[name] = Bulkhead(name, limit)
+        elif bulkhead.limit != limit:
+            # Config changed: a raised limit admits waiters right away
+            bulkhead.limit = limit
+            bulkhead._wake()
+        return bulkhead
+
+    def try_acquire(self) -> bool:
+        """Takes a free slot without waiting. Returns False if none is free."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.acquired += 1
+            return True
+        return False
+
+    async def acquire(self, timeout: float) -> bool:
+        """Takes a slot, waiting at most `timeout` seconds. Returns False on timeout."""
+        if self.try_acquire():
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self._waiters.remove(future)
+                self.queue_timeouts += 1
+                return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            raise
+        self.acquired += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "queue_timeouts": self.queue_timeouts,
+        }
+
+
+def bulkhead_stats() -> Dict[str, Dict[str, Any]]:
+    """Bulkhead state of every agent seen by this worker."""
+    return {name: bulkhead.stats() for name, bulkhead in Bulkhead.bulkheads.items()}
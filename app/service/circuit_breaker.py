@@ -0,0 +1,130 @@
+import os
+import time
+from collections import deque
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+from app.utils.logger import Logger
+
+load_dotenv()
+
+ENABLED = os.getenv("PP2_CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CONSECUTIVE_FAILURES = int(os.getenv("PP2_CB_CONSECUTIVE_FAILURES", "5"))
+FAILURE_RATE = float(os.getenv("PP2_CB_FAILURE_RATE", "0.5"))
+WINDOW_SIZE = int(os.getenv("PP2_CB_WINDOW", "20"))
+MIN_CALLS = int(os.getenv("PP2_CB_MIN_CALLS", "10"))
+OPEN_SECONDS = float(os.getenv("PP2_CB_OPEN_SECONDS", "30.0"))
+HALF_OPEN_TRIALS = int(os.getenv("PP2_CB_HALF_OPEN_TRIALS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = Logger()
+
+
+class CircuitBreaker:
+    """
+    Per-agent circuit breaker fed by timeouts, 5xx and connection errors.
+    closed: calls flow; trips to open after CONSECUTIVE_FAILURES in a row or a
+    failure rate above FAILURE_RATE over the last WINDOW_SIZE calls.
+    open: calls are skipped without touching the network for OPEN_SECONDS.
+    half_open: up to HALF_OPEN_TRIALS probe calls; one success closes the
+    breaker, one failure re-opens it.
+    """
+    breakers: Dict[str, "CircuitBreaker"] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=WINDOW_SIZE)
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trials_in_flight = 0
+        self.skipped = 0
+        self.times_opened = 0
+
+    @classmethod
+    def for_agent(cls, name: str) -> "CircuitBreaker":
+        breaker = cls.breakers.get(name)
+        if breaker is None:
+            breaker = cls.breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now. Every allowed call must be followed by one
+        of `record_success`, `record_failure` or `release`."""
+        if not ENABLED:
+            return True
+
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < OPEN_SECONDS:
+                self.skipped += 1
+                return False
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.trials_in_flight >= HALF_OPEN_TRIALS:
+                self.skipped += 1
+                return False
+            self.trials_in_flight += 1
+
+        return True
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            self.trials_in_flight = max(0, self.trials_in_flight - 1)
+            self._transition(CLOSED)
+            return
+        self.consecutive_failures = 0
+        self.outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self.trials_in_flight = max(0, self.trials_in_flight - 1)
+            self._transition(OPEN)
+            return
+
+        self.consecutive_failures += 1
+        self.outcomes.append(False)
+        failures = self.outcomes.count(False)
+        if (
+            self.consecutive_failures >= CONSECUTIVE_FAILURES
+            or (len(self.outcomes) >= MIN_CALLS and failures / len(self.outcomes) > FAILURE_RATE)
+        ):
+            self._transition(OPEN)
+
+    def release(self):
+        """Call finished without a verdict (e.g. cancelled)."""
+        if self.state == HALF_OPEN:
+            self.trials_in_flight = max(0, self.trials_in_flight - 1)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"[CircuitBreaker] Agent {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            self.trials_in_flight = 0
+        elif state == CLOSED:
+            self.outcomes.clear()
+            self.consecutive_failures = 0
+            self.trials_in_flight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "window_failures": self.outcomes.count(False),
+            "window_calls": len(self.outcomes),
+            "skipped": self.skipped,
+            "times_opened": self.times_opened,
+        }
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Breaker state of every agent seen by this worker."""
+    return {name: breaker.stats() for name, breaker in CircuitBreaker.breakers.items()}
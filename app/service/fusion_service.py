@@ -1,5 +1,7 @@
+import heapq
+import operator
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,53 +9,97 @@ load_dotenv()
 # Defaults
 THRESHOLD = float(os.getenv("FUSION_SCORE_THRESHOLD", "0.75"))
 MARGIN = float(os.getenv("FUSION_SCORE_MARGIN", "0.10"))
+# Highest score an agent can return; bounds what outstanding agents can still change
+SCORE_CEILING = float(os.getenv("FUSION_SCORE_CEILING", "1.0"))
+EARLY_EXIT = os.getenv("FUSION_EARLY_EXIT", "false").lower() == "true"
+# Candidates returned with every decision
+CANDIDATES = 5
+_SCORE = operator.itemgetter("score")
 
 class FusionService:
     def __init__(self):
         self.threshold = THRESHOLD
         self.margin = MARGIN
+        self.score_ceiling = SCORE_CEILING
+
+    def _threshold_of(self, result: Dict) -> float:
+        """Per-agent calibrated threshold carried by the result, else the global one."""
+        threshold = result.get("threshold")
+        return self.threshold if threshold is None else threshold
 
     def process_results(self, results: List[Dict]) -> Dict[str, Any]:
         """
         Analyzes a list of result dictionaries from PP2 agents.
+        A result is accepted when its score reaches its agent's own threshold;
+        the best accepted result must beat every other score by the margin.
+        Runs in O(n log k): only the top CANDIDATES are ever ordered.
         """
         valid_results = [r for r in results if r.get("score", 0.0) > 0]
-        sorted_results = sorted(valid_results, key=lambda x: x.get("score", 0.0), reverse=True)
-        
+        top = heapq.nlargest(CANDIDATES, valid_results, key=_SCORE)
+
         candidates = []
-        for r in sorted_results[:5]:
+        for r in top:
             candidates.append({
                 "name": r.get("agent_name"),
                 "score": r.get("score")
             })
 
-        if not sorted_results:
+        if not top:
             return {
                 "decision": "unknown",
                 "identity": {"name": None, "score": 0.0},
                 "candidates": []
             }
 
-        top_match = sorted_results[0]
-        max_score = top_match.get("score", 0.0)
-        
-        runner_up_score = 0.0
-        if len(sorted_results) > 1:
-            runner_up_score = sorted_results[1].get("score", 0.0)
+        max_score = top[0].get("score", 0.0)
+        if max_score >= self._threshold_of(top[0]):
+            best = top[0]
+        else:
+            # Only when the top scorer misses its own threshold is a full scan needed
+            best = max((r for r in valid_results if r["score"] >= self._threshold_of(r)), key=_SCORE, default=None)
 
-        if max_score < self.threshold:
+        if best is None:
             decision = "unknown"
             identity_data = {"name": None, "score": max_score}
         else:
-            if (max_score - runner_up_score) > self.margin:
+            # Highest score of any other agent, accepted or not
+            runner_up_score = next((r.get("score", 0.0) for r in top[:2] if r is not best), 0.0)
+            best_score = best.get("score", 0.0)
+            if (best_score - runner_up_score) > self.margin:
                 decision = "identified"
-                identity_data = {"name": top_match.get("agent_name"), "score": max_score}
             else:
                 decision = "ambiguous"
-                identity_data = {"name": top_match.get("agent_name"), "score": max_score}
+            identity_data = {"name": best.get("agent_name"), "score": best_score}
 
         return {
             "decision": decision,
             "identity": identity_data,
             "candidates": candidates
         }
+
+    def settled_result(self, results: List[Dict], outstanding: int, threshold_floor: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fuses the results received so far and returns them only if no outstanding
+        agent, scoring anywhere up to `score_ceiling`, could change the decision
+        or the top identity. Returns None while the outcome is still open.
+        `threshold_floor` is the lowest threshold among the queried agents.
+        """
+        fused = self.process_results(results)
+        if outstanding <= 0:
+            return fused
+
+        ceiling = self.score_ceiling
+        top_score = fused["identity"]["score"]
+        decision = fused["decision"]
+
+        if decision == "unknown":
+            # Any late score at or above the threshold would lift the decision
+            settled = ceiling < (self.threshold if threshold_floor is None else threshold_floor)
+        elif decision == "identified":
+            # A late score must stay outside the margin of the winner
+            settled = ceiling < top_score - self.margin
+        else:
+            # Ambiguous stays ambiguous unless a late score overtakes the leader
+            settled = ceiling < top_score
+
+        return fused if settled else None
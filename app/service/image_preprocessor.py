@@ -0,0 +1,105 @@
+import io
+import os
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from app.utils.cache import TTLCache
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.logger import Logger
+from app.utils.security import hash_data
+
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:  # optional dependency: images are forwarded untouched
+    PILLOW_AVAILABLE = False
+
+load_dotenv()
+
+ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "false").lower() == "true"
+MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "512"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+CACHE_TTL = float(os.getenv("IMAGE_PREPROCESS_CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_PREPROCESS_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_PREPROCESS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+logger = Logger()
+
+
+class ProcessedImage(NamedTuple):
+    data: bytes
+    filename: str
+    content_type: str
+    original_size: int
+    processed: bool
+
+
+processed_cache = TTLCache(
+    "image_preprocess",
+    max_entries=CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_TTL,
+    max_bytes=CACHE_MAX_BYTES,
+    sizeof=lambda image: len(image.data),
+)
+
+
+def _jpeg_filename(filename: Optional[str]) -> str:
+    stem = os.path.splitext(filename or "image")[0] or "image"
+    return f"{stem}.jpg"
+
+
+def downscale_to_jpeg(image_bytes: bytes, max_dimension: int = MAX_DIMENSION, quality: int = JPEG_QUALITY) -> bytes:
+    """
+    Decodes once, applies the EXIF orientation, shrinks so that neither side
+    exceeds `max_dimension` and re-encodes as baseline JPEG without metadata.
+    CPU-bound: run it off the event loop.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # JPEG sources can decode directly at a reduced scale
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        # No exif/icc_profile arguments: metadata is not carried over
+        image.save(out, format="JPEG", quality=quality)
+        return out.getvalue()
+
+
+class ImagePreprocessor:
+    """
+    Optional stage before the PP2 fan-out that shrinks uploads to what the
+    face-verification agents need. Runs on the shared CpuExecutor (Pillow
+    releases the GIL while decoding/resizing) and caches results by image hash.
+    Falls back to the original bytes when disabled, when Pillow is missing,
+    or when the image cannot be decoded.
+    """
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return ENABLED and PILLOW_AVAILABLE
+
+    @classmethod
+    async def process(cls, image_bytes: bytes, filename: Optional[str], content_type: Optional[str], image_hash: Optional[str] = None) -> ProcessedImage:
+        original = ProcessedImage(image_bytes, filename, content_type, len(image_bytes), False)
+        if not cls.enabled():
+            return original
+
+        key = (image_hash or await CpuExecutor.run("hash", hash_data, image_bytes, size=len(image_bytes)), MAX_DIMENSION, JPEG_QUALITY)
+        cached = processed_cache.get(key)
+        if cached is not None:
+            return cached._replace(filename=_jpeg_filename(filename))
+
+        try:
+            # Decoding costs far more than the compressed size suggests: always off the loop
+            data = await CpuExecutor.run("image_preprocess", downscale_to_jpeg, image_bytes, size=len(image_bytes), offload=True)
+        except Exception as e:
+            logger.warning(f"[ImagePreprocessor] Could not preprocess image, sending original: {str(e)}")
+            return original
+
+        processed = ProcessedImage(data, _jpeg_filename(filename), "image/jpeg", len(image_bytes), True)
+        processed_cache.set(key, processed)
+        logger.info(f"[ImagePreprocessor] Image preprocessed: {len(image_bytes)} -> {len(data)} bytes")
+        return processed
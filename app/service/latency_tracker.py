@@ -0,0 +1,88 @@
+import math
+import os
+from collections import deque
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STATIC_TIMEOUT = float(os.getenv("PP2_CLIENT_TIMEOUT_SECONDS", "3.0"))
+WINDOW_SIZE = int(os.getenv("PP2_LATENCY_WINDOW", "200"))
+MIN_SAMPLES = int(os.getenv("PP2_LATENCY_MIN_SAMPLES", "20"))
+EWMA_ALPHA = float(os.getenv("PP2_LATENCY_EWMA_ALPHA", "0.2"))
+TIMEOUT_MULTIPLIER = float(os.getenv("PP2_ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0"))
+MIN_TIMEOUT = float(os.getenv("PP2_ADAPTIVE_TIMEOUT_MIN_SECONDS", "0.5"))
+
+
+class LatencyTracker:
+    """
+    Per-agent latency estimator over a sliding window of recent calls.
+    Derives the agent's timeout (p95 * multiplier, capped by the static
+    PP2_CLIENT_TIMEOUT_SECONDS) and the delay after which a hedged duplicate
+    request is worth sending. Until MIN_SAMPLES calls are seen it falls back
+    to the static timeout and never hedges.
+    """
+    trackers: Dict[str, "LatencyTracker"] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = deque(maxlen=WINDOW_SIZE)
+        self.ewma_ms: Optional[float] = None
+        self._p95_ms: Optional[float] = None
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def for_agent(cls, name: str) -> "LatencyTracker":
+        tracker = cls.trackers.get(name)
+        if tracker is None:
+            tracker = cls.trackers[name] = LatencyTracker(name)
+        return tracker
+
+    def record(self, latency_ms: float):
+        self.samples.append(latency_ms)
+        self.ewma_ms = latency_ms if self.ewma_ms is None else EWMA_ALPHA * latency_ms + (1 - EWMA_ALPHA) * self.ewma_ms
+        self._p95_ms = None
+
+    def p95_ms(self) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        if self._p95_ms is None:
+            ordered = sorted(self.samples)
+            self._p95_ms = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+        return self._p95_ms
+
+    def timeout(self) -> float:
+        """Timeout in seconds for the next call to this agent."""
+        p95 = self.p95_ms()
+        if p95 is None:
+            return STATIC_TIMEOUT
+        return min(STATIC_TIMEOUT, max(MIN_TIMEOUT, p95 / 1000 * TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while the estimate is cold."""
+        p95 = self.p95_ms()
+        if p95 is None:
+            return None
+        return p95 / 1000
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95_ms()
+        return {
+            "samples": len(self.samples),
+            "p95_ms": round(p95, 3) if p95 is not None else None,
+            "ewma_ms": round(self.ewma_ms, 3) if self.ewma_ms is not None else None,
+            "timeout_s": round(self.timeout(), 3),
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            "hedge_win_rate": round(self.hedge_wins / self.hedges, 4) if self.hedges else 0.0,
+        }
+
+
+def latency_stats() -> Dict[str, Dict[str, Any]]:
+    """Latency/hedging stats of every agent seen by this worker."""
+    return {name: tracker.stats() for name, tracker in LatencyTracker.trackers.items()}
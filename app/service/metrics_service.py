@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+from app.db.rollups import MetricsRollup, merge_buckets, avg_latency
+from app.utils.cache import TTLCache
+from app.utils.logger import Logger
+from app.utils.singleflight import SingleFlight
+
+load_dotenv()
+
+# Served as-is while younger than TTL; until TTL + STALE it is served and refreshed in the background
+CACHE_TTL = float(os.getenv("METRICS_CACHE_TTL_SECONDS", "5"))
+CACHE_STALE = float(os.getenv("METRICS_CACHE_STALE_SECONDS", "60"))
+# Window start is snapped to this bucket so concurrent dashboards share one result
+WINDOW_BUCKET_SECONDS = int(os.getenv("METRICS_WINDOW_BUCKET_SECONDS", "60"))
+
+EPOCH = datetime(1970, 1, 1)
+
+dashboard_cache = TTLCache("metrics_dashboard", max_entries=64, ttl_seconds=CACHE_TTL + CACHE_STALE)
+dashboard_inflight = SingleFlight("metrics_dashboard")
+
+
+def window_start(days: int, now: Optional[datetime] = None) -> datetime:
+    """Start of the last `days` days, floored to WINDOW_BUCKET_SECONDS."""
+    start = (now or datetime.utcnow()) - timedelta(days=days)
+    seconds = int((start - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % WINDOW_BUCKET_SECONDS)
+
+
+def _summary(days: int, access: List[Dict]) -> Dict[str, Any]:
+    overall = merge_buckets(access, None).get(None)
+    if overall is None:
+        return {"period_days": days, "total_requests": 0, "routes": []}
+
+    routes_processed = []
+    for route, r in merge_buckets(access, "route").items():
+        avg = avg_latency(r)
+        routes_processed.append({
+            "route": route,
+            "count": r["count"],
+            "avg_latency": round(avg, 3) if avg is not None else 0.0,
+            "p50": round(r["sketch"].quantile(0.50), 3),
+            "p95": round(r["sketch"].quantile(0.95), 3)
+        })
+
+    avg = avg_latency(overall)
+    return {
+        "period_days": days,
+        "total_requests": overall["count"],
+        "avg_latency": round(avg, 3) if avg is not None else 0.0,
+        "timeouts": overall["timeouts"],
+        "routes": routes_processed
+    }
+
+
+def _by_user_type(access: List[Dict]) -> List[Dict[str, Any]]:
+    stats = [
+        {"_id": user_type, "count": g["count"], "avg_latency": avg_latency(g)}
+        for user_type, g in merge_buckets(access, "user_type").items()
+    ]
+    stats.sort(key=lambda item: item["count"], reverse=True)
+    return stats[:100]
+
+
+def _decisions(access: List[Dict]) -> List[Dict[str, Any]]:
+    return [
+        {"_id": decision, "count": g["count"]}
+        for decision, g in merge_buckets(access, "decision").items()
+    ]
+
+
+def _services(services: List[Dict]) -> List[Dict[str, Any]]:
+    stats = [
+        {
+            "_id": name,
+            "queries": g["count"],
+            "timeouts": g["timeouts"],
+            "avg_latency": avg_latency(g),
+            "p95_latency": round(g["sketch"].quantile(0.95), 3)
+        }
+        for name, g in merge_buckets(services, "service_name").items()
+    ]
+    stats.sort(key=lambda item: item["timeouts"], reverse=True)
+    return stats[:100]
+
+
+class MetricsService:
+    """
+    Dashboard metrics (summary, by-user-type, decisions, services) computed
+    together from a single rollup query, behind a stale-while-revalidate cache.
+    """
+
+    def __init__(self):
+        self.logger = Logger()
+        self._refreshes: Set[asyncio.Task] = set()
+
+    async def get_dashboard(self, days: int = 7) -> Tuple[Dict[str, Any], float, str]:
+        """
+        Returns (dashboard, age_seconds, cache_state) where cache_state is
+        "hit", "stale" (served while a background refresh runs) or "miss".
+        """
+        cached = dashboard_cache.get(days)
+        if cached is not None:
+            computed_at, dashboard = cached
+            age = time.monotonic() - computed_at
+            if age < CACHE_TTL:
+                return dashboard, age, "hit"
+            self._refresh_in_background(days)
+            return dashboard, age, "stale"
+
+        computed_at, dashboard = await dashboard_inflight.do(days, lambda: self._compute(days))
+        return dashboard, time.monotonic() - computed_at, "miss"
+
+    def _refresh_in_background(self, days: int):
+        if days in dashboard_inflight.calls:
+            return
+        task = asyncio.create_task(self._refresh(days))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _refresh(self, days: int):
+        try:
+            await dashboard_inflight.do(days, lambda: self._compute(days))
+        except Exception as e:
+            # Keep serving the stale entry; the next request retries
+            self.logger.error(f"[MetricsService] Background refresh failed for days={days}: {str(e)}")
+
+    async def _compute(self, days: int) -> Tuple[float, Dict[str, Any]]:
+        self.logger.info(f"[MetricsService] Computing dashboard for last {days} days")
+        start = window_start(days)
+        buckets = await MetricsRollup.load(None, start)
+
+        access = [b for b in buckets if b.get("kind") == "access"]
+        services = [b for b in buckets if b.get("kind") == "service" and b.get("service_type") == "pp2"]
+
+        dashboard = {
+            "period_days": days,
+            "window_start": start.isoformat(),
+            "summary": _summary(days, access),
+            "by_user_type": _by_user_type(access),
+            "decisions": _decisions(access),
+            "services": _services(services),
+        }
+        entry = (time.monotonic(), dashboard)
+        dashboard_cache.set(days, entry)
+        return entry
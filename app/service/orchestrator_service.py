@@ -1,18 +1,73 @@
 from datetime import datetime
 from uuid import uuid4
+import asyncio
 import base64
+import contextlib
+import functools
+import os
 import time
-from typing import Annotated, Optional, Dict
+from typing import Annotated, AsyncIterator, Callable, NamedTuple, Optional, Dict, List, Tuple
 
 from app.utils.logger import Logger
 from fastapi import HTTPException, UploadFile, File
+from dotenv import load_dotenv
 
 from app.db.mongo import MongoDB
+from app.db.log_writer import LogWriter
 from app.service.pp2_service import PP2Service
+from app.service.agent_registry import AgentRegistry
+from app.service.agent_router import AgentRouter
+from app.service.circuit_breaker import OPEN_SECONDS as CB_OPEN_SECONDS
+from app.service.image_preprocessor import ImagePreprocessor
+from app.service.speculation_policy import SpeculationPolicy
 from app.service.pp1_service import PP1Service
-from app.service.fusion_service import FusionService
-from app.model.api_models import IdentifyResponse, Identity, NormativaAnswer
+from app.service.fusion_service import FusionService, EARLY_EXIT
+from app.model.api_models import BatchIdentifyResponse, BatchItemError, BatchItemResult, IdentifyResponse, Identity, NormativaAnswer
 from app.model.common import DecisionEnum
+from app.utils import fast_json
+from app.utils.cache import TTLCache
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.prometheus import PP2_CALLS_SAVED
+from app.utils.security import hash_data
+from app.utils.singleflight import SingleFlight
+
+load_dotenv()
+
+# "send an error if more than one service pp2 fails to respond properly"
+MAX_PP2_ERRORS = 1
+
+IDENTIFY_CACHE_ENABLED = os.getenv("IDENTIFY_CACHE_ENABLED", "true").lower() == "true"
+IDENTIFY_CACHE_TTL = float(os.getenv("IDENTIFY_CACHE_TTL_SECONDS", "300"))
+IDENTIFY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTIFY_CACHE_MAX_ENTRIES", "10000"))
+IDENTIFY_CACHE_MAX_BYTES = int(os.getenv("IDENTIFY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Shared by every OrchestratorService in the worker
+identify_cache = TTLCache(
+    "identify",
+    max_entries=IDENTIFY_CACHE_MAX_ENTRIES,
+    ttl_seconds=IDENTIFY_CACHE_TTL,
+    max_bytes=IDENTIFY_CACHE_MAX_BYTES,
+)
+speculation_policy = SpeculationPolicy()
+agent_router = AgentRouter()
+
+IDENTIFY_COALESCE_ENABLED = os.getenv("IDENTIFY_COALESCE_ENABLED", "true").lower() == "true"
+identify_inflight = SingleFlight("identify")
+# Requests served by another request's fan-out, and the agent calls that spared
+coalesce_stats = {"requests": 0, "calls_saved": 0}
+
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "32"))
+# Agent calls in flight at once for one batch, across all its images
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+class BatchImage(NamedTuple):
+    """One image of a batch request; `error` is set when it failed validation."""
+    filename: Optional[str]
+    content_type: Optional[str]
+    data: bytes
+    question: Optional[str] = None
+    image_hash: Optional[str] = None
+    error: Optional[HTTPException] = None
 
 class OrchestratorService:
     def __init__(self):
@@ -32,34 +87,216 @@ class OrchestratorService:
         image_hash: str = None
     ) -> IdentifyResponse:
         self.logger.info("[OrchestratorService] Handling identify request")
+        request_id = str(uuid4())
+        response, log_entry = await self._process_identify(
+            request_id=request_id,
+            image_bytes=image_bytes,
+            filename=image.filename,
+            content_type=image.content_type,
+            question=question,
+            user_context=user_context,
+            ip=request_obj.client.host if request_obj and request_obj.client else "unknown",
+            image_hash=image_hash
+        )
+
+        # 4. Log to Access Logs
+        self.logger.info("[OrchestratorService] Logging access")
+        # Queued for the background writer; the response does not wait on Mongo
+        await LogWriter.write("access_logs", log_entry)
+        return response
+
+    async def handle_identify_batch(self, items: List[BatchImage], user_context: Dict, request_obj=None, admission=None) -> BatchIdentifyResponse:
+        """
+        Identifies several images in one request. All images are processed
+        concurrently, but at most BATCH_MAX_CONCURRENCY agent calls are in flight
+        across the whole images x agents matrix. With `admission` (an
+        AdmissionController) every image takes its own in-flight slot; a shed
+        image gets a 503 entry. Results keep the input order; a failing image
+        yields an error entry instead of failing the batch.
+        """
+        self.logger.info(f"[OrchestratorService] Handling identify batch of {len(items)} images")
         start_time = time.time()
+        batch_id = str(uuid4())
+        ip = request_obj.client.host if request_obj and request_obj.client else "unknown"
+        limiter = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+        async def process(index: int, item: BatchImage) -> Tuple[BatchItemResult, Optional[Dict]]:
+            if item.error is not None:
+                return BatchItemResult(index=index, error=BatchItemError(status_code=item.error.status_code, detail=str(item.error.detail))), None
+            try:
+                async with admission.admit(user_context.get("type")) if admission is not None else contextlib.nullcontext():
+                    response, log_entry = await self._process_identify(
+                        request_id=str(uuid4()),
+                        image_bytes=item.data,
+                        filename=item.filename,
+                        content_type=item.content_type,
+                        question=item.question,
+                        user_context=user_context,
+                        ip=ip,
+                        image_hash=item.image_hash,
+                        route="/identify-and-answer/batch",
+                        limiter=limiter
+                    )
+            except HTTPException as e:
+                return BatchItemResult(index=index, error=BatchItemError(status_code=e.status_code, detail=str(e.detail))), None
+            except Exception as e:
+                self.logger.error(f"[OrchestratorService] Batch item {index} failed: {str(e)}")
+                return BatchItemResult(index=index, error=BatchItemError(status_code=500, detail=str(e))), None
+            log_entry["batch_id"] = batch_id
+            return BatchItemResult(index=index, result=response), log_entry
+
+        outcomes = await asyncio.gather(*(process(i, item) for i, item in enumerate(items)))
+
+        # One enqueue pass for the whole batch, so its rows share an insert_many
+        await LogWriter.write_many("access_logs", [entry for _, entry in outcomes if entry is not None])
+
+        timing_ms = round((time.time() - start_time) * 1000, 3)
+        self.logger.info(f"[OrchestratorService] Batch {batch_id} processed in {timing_ms} ms")
+        return BatchIdentifyResponse(batch_id=batch_id, results=[result for result, _ in outcomes], timing_ms=timing_ms)
+
+    async def stream_identify(
+        self,
+        image_bytes: bytes,
+        filename: Optional[str],
+        content_type: Optional[str],
+        question: Optional[str],
+        user_context: Dict,
+        request_obj=None,
+        image_hash: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Identification as a sequence of events: one "agent" event per PP2 result
+        as it arrives, "decision" as soon as fusion is settled (stragglers are
+        cancelled), "answer" chunks from PP1, and a final "result" shaped like
+        IdentifyResponse. A failure ends the stream with an "error" event.
+        """
+        self.logger.info("[OrchestratorService] Handling streaming identify request")
         request_id = str(uuid4())
-        
+        start_time = time.time()
+        ip = request_obj.client.host if request_obj and request_obj.client else "unknown"
+        user_type = user_context.get("type")
+        pp1_task = self._start_speculation(request_id, question, user_type)
+        results: asyncio.Queue = asyncio.Queue()
+        identify_task = asyncio.create_task(self._identify(
+            request_id, image_bytes, filename, content_type, image_hash,
+            user_context=user_context, on_result=results.put_nowait, early_exit=True
+        ))
+        try:
+            while True:
+                getter = asyncio.create_task(results.get())
+                await asyncio.wait({getter, identify_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                yield self._agent_event(getter.result())
+            while not results.empty():
+                yield self._agent_event(results.get_nowait())
+
+            try:
+                fusion_result, pp2_summary = identify_task.result()
+            except HTTPException as e:
+                self._discard_speculation(pp1_task)
+                pp1_task = None
+                yield {"event": "error", "status_code": e.status_code, "detail": str(e.detail)}
+                return
+            decision = fusion_result["decision"]
+            speculation_policy.record_decision(user_type, decision)
+            yield {"event": "decision", "timing_ms": round((time.time() - start_time) * 1000, 3), **fusion_result}
+
+            normativa_answer = None
+            pp1_used = False
+            speculative = pp1_task is not None
+            if decision == "identified" and question:
+                pp1_used = True
+                if pp1_task is not None:
+                    speculation_policy.used += 1
+                    rag_result = await pp1_task
+                    pp1_task = None
+                    if rag_result:
+                        yield {"event": "answer", "delta": rag_result["text"]}
+                else:
+                    rag_result = None
+                    async for chunk in self.pp1.stream_normativa(request_id, question):
+                        if "delta" in chunk:
+                            yield {"event": "answer", "delta": chunk["delta"]}
+                        else:
+                            rag_result = chunk["answer"]
+                if rag_result:
+                    normativa_answer = NormativaAnswer(**rag_result)
+            else:
+                self._discard_speculation(pp1_task)
+                pp1_task = None
+
+            timing_ms = round((time.time() - start_time) * 1000, 3)
+            self.logger.info(f"[OrchestratorService] Total processing time: {timing_ms} ms")
+            log_entry = self._access_entry(
+                request_id=request_id,
+                route="/identify-and-answer/stream",
+                user_context=user_context,
+                input_meta={
+                    "has_image": True,
+                    "has_question": bool(question),
+                    "size_bytes": len(image_bytes),
+                    "image_hash": image_hash
+                },
+                decision=decision,
+                identity=fusion_result["identity"],
+                pp2_summary=pp2_summary,
+                pp1_used=pp1_used,
+                pp1_speculative=speculative,
+                timing_ms=timing_ms,
+                ip=ip
+            )
+            await LogWriter.write("access_logs", log_entry)
+            response = self._build_response(fusion_result, normativa_answer, timing_ms, request_id)
+            yield {"event": "result", **response.model_dump(mode="json")}
+        finally:
+            # Client gone or stream failed: stop upstream work nobody will read
+            if not identify_task.done():
+                identify_task.cancel()
+            self._discard_speculation(pp1_task)
+
+    @staticmethod
+    def _agent_event(result: Dict) -> Dict:
+        event = {"event": "agent", "agent_name": result.get("agent_name"), "score": result.get("score")}
+        for key in ("latency_ms", "error"):
+            if key in result:
+                event[key] = result[key]
+        return event
+
+    async def _process_identify(
+        self,
+        request_id: str,
+        image_bytes: bytes,
+        filename: str,
+        content_type: str,
+        question: Optional[str],
+        user_context: Dict,
+        ip: str,
+        image_hash: Optional[str] = None,
+        route: str = "/identify-and-answer",
+        limiter: Optional[asyncio.Semaphore] = None
+    ) -> Tuple[IdentifyResponse, Dict]:
+        """Identification and optional PP1 answer for one image. Returns the response and its access log row."""
+        start_time = time.time()
+
         # Image -> B64
         # self.logger.info("[OrchestratorService] Encoding image to base64")
         # image_b64 = base64.b64encode(image_bytes).decode('utf-8')
 
-        # 1. PP2 Fan-Out
-        self.logger.info("[OrchestratorService] Starting PP2 fan-out verification")
-        pp2_results = await self.pp2.verify_parallel(request_id, image)
+        # Speculative PP1: overlap the RAG call with the PP2 fan-out
+        user_type = user_context.get("type")
+        pp1_task = self._start_speculation(request_id, question, user_type)
 
-        # Check for Multiple Timeouts/Errors
-        # "send an error if more than one service pp2 fails to respond properly"
-        self.logger.info(f"[OrchestratorService] PP2 results received: {pp2_results}")
-        error_count = sum(1 for r in pp2_results if r.get("error"))
-        if error_count > 1:
-             # Log the failure before raising exception so we have a record
-             raise HTTPException(
-                 status_code=504, 
-                 detail=f"Multiple PP2 services failed. Errors: {error_count}/{len(pp2_results)}"
-             )
-
-        # 2. Fusion
-        self.logger.info("[OrchestratorService] Processing fusion results")
-        fusion_result = self.fusion.process_results(pp2_results)
+        # 1 + 2. PP2 Fan-Out and Fusion (served from cache for repeated images)
+        try:
+            fusion_result, pp2_summary = await self._identify(request_id, image_bytes, filename, content_type, image_hash, limiter, user_context)
+        except BaseException:
+            self._discard_speculation(pp1_task)
+            raise
         decision = fusion_result["decision"] # Str
         identity_data = fusion_result["identity"]
-        candidates = fusion_result["candidates"]
+        speculation_policy.record_decision(user_type, decision)
 
         # 3. PP1 (RAG)
         self.logger.info("[OrchestratorService] Starting PP1 RAG process")
@@ -67,17 +304,22 @@ class OrchestratorService:
         pp1_used = False
         if decision == "identified" and question:
             pp1_used = True
-            rag_result = await self.pp1.ask_normativa(request_id, question)
+            if pp1_task is not None:
+                speculation_policy.used += 1
+                rag_result = await pp1_task
+            else:
+                rag_result = await self.pp1.ask_normativa(request_id, question)
             if rag_result:
                 normativa_answer = NormativaAnswer(**rag_result)
+        else:
+            self._discard_speculation(pp1_task)
 
         timing_ms = round((time.time() - start_time) * 1000, 3)
         self.logger.info(f"[OrchestratorService] Total processing time: {timing_ms} ms")
 
-        # 4. Log to Access Logs
-        self.logger.info("[OrchestratorService] Logging access")
-        await self._log_access(
+        log_entry = self._access_entry(
             request_id=request_id,
+            route=route,
             user_context=user_context,
             input_meta={
                 "has_image": True, 
@@ -87,35 +329,251 @@ class OrchestratorService:
             },
             decision=decision,
             identity=identity_data,
-            pp2_summary={"queried": len(pp2_results), "timeouts": sum(1 for r in pp2_results if r.get("error") == "Timeout")},
+            pp2_summary=pp2_summary,
             pp1_used=pp1_used,
+            pp1_speculative=pp1_task is not None,
             timing_ms=timing_ms,
-            ip=request_obj.client.host if request_obj and request_obj.client else "unknown"
+            ip=ip
+        )
+
+        response = self._build_response(fusion_result, normativa_answer, timing_ms, request_id)
+        return response, log_entry
+
+    async def _identify(
+        self,
+        request_id: str,
+        image_bytes: bytes,
+        filename: str,
+        content_type: str,
+        image_hash: Optional[str],
+        limiter: Optional[asyncio.Semaphore] = None,
+        user_context: Optional[Dict] = None,
+        on_result: Optional[Callable[[Dict], None]] = None,
+        early_exit: bool = EARLY_EXIT
+    ) -> Tuple[Dict, Dict]:
+        """
+        Runs the PP2 fan-out and fusion, or returns the cached outcome for the
+        same image under the same agent roster and fusion thresholds. Identical
+        requests already in flight share one fan-out (singleflight). With
+        routing enabled the fan-out is cascaded: likely agents first, the rest
+        only if that does not identify anyone. `on_result` sees every agent
+        result as it arrives; `early_exit` stops the fan-out once fusion is settled.
+        """
+        snapshot = await AgentRegistry.get_snapshot()
+        agents = list(snapshot.agents)
+        if image_hash is None and (IDENTIFY_CACHE_ENABLED or IDENTIFY_COALESCE_ENABLED or agent_router.enabled):
+            image_hash = await CpuExecutor.run("hash", hash_data, image_bytes, size=len(image_bytes))
+        key = (
+            image_hash,
+            snapshot.version,
+            self.fusion.threshold,
+            self.fusion.margin,
         )
-        
+        cache_key = None
+        if IDENTIFY_CACHE_ENABLED:
+            cache_key = key
+            cached = identify_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("[OrchestratorService] Identify cache hit")
+                return cached, {"queried": 0, "timeouts": 0, "cache_hit": True}
+
+        verify = functools.partial(
+            self._verify_and_fuse, request_id, image_bytes, filename, content_type, image_hash, agents,
+            cache_key, limiter, user_context, on_result, early_exit
+        )
+        if not IDENTIFY_COALESCE_ENABLED:
+            return await verify()
+
+        # Concurrent duplicates (retries, double submits) await the first caller's fan-out
+        led = False
+
+        async def lead():
+            nonlocal led
+            led = True
+            return await verify()
+
+        fusion_result, pp2_summary = await identify_inflight.do(key, lead)
+        if led:
+            return fusion_result, pp2_summary
+        saved = pp2_summary.get("queried", 0) + pp2_summary.get("skipped", 0)
+        coalesce_stats["requests"] += 1
+        coalesce_stats["calls_saved"] += saved
+        PP2_CALLS_SAVED.labels("coalesced").inc(saved)
+        self.logger.info("[OrchestratorService] Identify coalesced with an in-flight request", calls_saved=saved)
+        if fusion_result["decision"] == "identified":
+            agent_router.record(user_context, image_hash, fusion_result["identity"]["name"])
+        # Counted once, on the leader's row
+        return fusion_result, {"queried": 0, "timeouts": 0, "cache_hit": False, "coalesced": True, "calls_saved": saved}
+
+    async def _verify_and_fuse(
+        self,
+        request_id: str,
+        image_bytes: bytes,
+        filename: str,
+        content_type: str,
+        image_hash: Optional[str],
+        agents: List,
+        cache_key: Optional[Tuple],
+        limiter: Optional[asyncio.Semaphore],
+        user_context: Optional[Dict],
+        on_result: Optional[Callable[[Dict], None]],
+        early_exit: bool
+    ) -> Tuple[Dict, Dict]:
+        """PP2 fan-out (cascaded when routing is enabled) and fusion for one image."""
+        # Optional downscale/re-encode: every agent gets the smaller image
+        image = await ImagePreprocessor.process(image_bytes, filename, content_type, image_hash)
+
+        plan = agent_router.plan(agents, user_context, image_hash)
+        self.logger.info("[OrchestratorService] Starting PP2 fan-out verification", agents=len(plan.first), held_back=len(plan.rest))
+        pp2_results = await self._fan_out(request_id, image, plan.first, limiter, early_exit=early_exit, on_result=on_result)
+        attempted = len(plan.first)
+        escalation = None
+        if plan.cascaded:
+            first_stage = self.fusion.process_results(pp2_results)
+            escalation = self._escalation_reason(first_stage, pp2_results)
+            if escalation is not None or plan.audit:
+                self.logger.info("[OrchestratorService] Escalating PP2 fan-out", reason=escalation or "audit", agents=len(plan.rest))
+                pp2_results = pp2_results + await self._fan_out(request_id, image, plan.rest, limiter, prior=pp2_results, early_exit=early_exit, on_result=on_result)
+                attempted += len(plan.rest)
+            agent_router.record_outcome(plan, escalation, attempted)
+
+        # Check for Multiple Timeouts/Errors
+        self.logger.info("[OrchestratorService] PP2 results received", request_id=request_id, results=len(pp2_results))
+        self.logger.debug_sample("[OrchestratorService] PP2 results payload: %s", pp2_results)
+        skipped = sum(1 for r in pp2_results if r.get("skipped"))
+        if attempted and skipped == len(pp2_results) == attempted:
+            raise HTTPException(
+                status_code=503,
+                detail="All PP2 services are unavailable (circuit open)",
+                headers={"Retry-After": str(int(CB_OPEN_SECONDS))}
+            )
+
+        # Agents skipped by an open breaker are known-dead, not fresh failures
+        error_count = self._count_errors(pp2_results)
+        if error_count > MAX_PP2_ERRORS:
+             # Log the failure before raising exception so we have a record
+             raise HTTPException(
+                 status_code=504, 
+                 detail=f"Multiple PP2 services failed. Errors: {error_count}/{len(pp2_results) - skipped}"
+             )
+
+        self.logger.info("[OrchestratorService] Processing fusion results")
+        fusion_result = self.fusion.process_results(pp2_results)
+        if plan.audit and escalation is None:
+            agent_router.record_audit(first_stage, fusion_result)
+        if fusion_result["decision"] == "identified":
+            agent_router.record(user_context, image_hash, fusion_result["identity"]["name"])
+        pp2_summary = {
+            "queried": len(pp2_results) - skipped,
+            "timeouts": sum(1 for r in pp2_results if r.get("error") == "Timeout"),
+            "queue_timeouts": sum(1 for r in pp2_results if r.get("error") == "QueueTimeout"),
+            "cancelled": attempted - len(pp2_results),
+            "skipped": skipped,
+            "cache_hit": False,
+            "image_original_bytes": image.original_size,
+            "image_sent_bytes": len(image.data),
+        }
+        if plan.cascaded:
+            pp2_summary["routing"] = {
+                "first_stage": len(plan.first),
+                "not_queried": len(agents) - attempted,
+                "escalation": escalation,
+                "audit": plan.audit,
+            }
+
+        # Only complete, error-free fan-outs are worth replaying
+        if cache_key is not None and error_count == 0 and skipped == 0:
+            identify_cache.set(cache_key, fusion_result)
+
+        return fusion_result, pp2_summary
+
+    async def _fan_out(
+        self,
+        request_id: str,
+        image,
+        agents: List,
+        limiter: Optional[asyncio.Semaphore],
+        prior: List[Dict] = (),
+        early_exit: bool = EARLY_EXIT,
+        on_result: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
+        """One PP2 fan-out stage. Early exit also counts the results of earlier stages (`prior`)."""
+        if early_exit:
+            # An unknown outcome is final once nothing outstanding can reach the lowest threshold
+            threshold_floor = min((a.threshold for a in agents), default=self.fusion.threshold)
+            is_settled = lambda results, outstanding: self._is_settled(list(prior) + results, outstanding, threshold_floor)
+            return await self.pp2.verify_until_settled(request_id, image.data, image.filename, image.content_type, is_settled, agents=agents, limiter=limiter, on_result=on_result)
+        return await self.pp2.verify_parallel(request_id, image.data, image.filename, image.content_type, agents=agents, limiter=limiter, on_result=on_result)
+
+    def _is_settled(self, results: List[Dict], outstanding: int, threshold_floor: Optional[float] = None) -> bool:
+        """Early-exit predicate: the request already fails, or fusion can no longer change."""
+        if self._count_errors(results) > MAX_PP2_ERRORS:
+            return True
+        return self.fusion.settled_result(results, outstanding, threshold_floor) is not None
+
+    @staticmethod
+    def _escalation_reason(first_stage: Dict, results: List[Dict]) -> Optional[str]:
+        """Why a cascaded fan-out must query the held-back agents, or None if the first stage decides."""
+        if any(r.get("error") for r in results):
+            return "errors"
+        if first_stage["decision"] != "identified":
+            return first_stage["decision"]
+        return None
+
+    @staticmethod
+    def _count_errors(results: List[Dict]) -> int:
+        return sum(1 for r in results if r.get("error") and not r.get("skipped"))
+
+    def _start_speculation(self, request_id: str, question: Optional[str], user_type: Optional[str]) -> Optional[asyncio.Task]:
+        """Starts PP1 alongside the PP2 fan-out when the policy expects the answer to be used."""
+        if not question or not speculation_policy.should_speculate(user_type):
+            return None
+        self.logger.info("[OrchestratorService] Starting speculative PP1 call")
+        speculation_policy.started += 1
+        return asyncio.create_task(self.pp1.ask_normativa(request_id, question))
+
+    @staticmethod
+    def _build_response(fusion_result: Dict, normativa_answer: Optional[NormativaAnswer], timing_ms: float, request_id: str) -> IdentifyResponse:
+        if fast_json.ENABLED:
+            # Fusion output is built by us and already has the right shape: skip re-validation
+            return IdentifyResponse.model_construct(
+                decision=DecisionEnum(fusion_result["decision"]),
+                identity=Identity.model_construct(**fusion_result["identity"]),
+                candidates=[Identity.model_construct(**c) for c in fusion_result["candidates"]],
+                normativa_answer=normativa_answer,
+                timing_ms=timing_ms,
+                request_id=request_id
+            )
         return IdentifyResponse(
-            decision=DecisionEnum(decision),
-            identity=Identity(**identity_data),
-            candidates=[Identity(**c) for c in candidates],
+            decision=DecisionEnum(fusion_result["decision"]),
+            identity=Identity(**fusion_result["identity"]),
+            candidates=[Identity(**c) for c in fusion_result["candidates"]],
             normativa_answer=normativa_answer,
             timing_ms=timing_ms,
             request_id=request_id
         )
 
-    async def _log_access(self, request_id, user_context, input_meta, decision, identity, pp2_summary, pp1_used, timing_ms, ip):
-        log_entry = {
+    def _discard_speculation(self, pp1_task: Optional[asyncio.Task]):
+        """Cancel a speculative PP1 call whose answer will not be returned."""
+        if pp1_task is None:
+            return
+        speculation_policy.wasted += 1
+        pp1_task.cancel()
+
+    @staticmethod
+    def _access_entry(request_id, route, user_context, input_meta, decision, identity, pp2_summary, pp1_used, timing_ms, ip, pp1_speculative=False) -> Dict:
+        return {
             "request_id": request_id,
             "ts": datetime.utcnow(),
-            "route": "/identify-and-answer",
+            "route": route,
             "user": user_context,
             "input_metadata": input_meta,
             "decision": decision,
             "identity": identity,
             "pp2_summary": pp2_summary,
             "pp1_used": pp1_used,
+            "pp1_speculative": pp1_speculative,
             "timing_ms": timing_ms,
             "status_code": 200,
             "ip": ip
         }
-        db = self.mongo.get_db()
-        await db.access_logs.insert_one(log_entry)
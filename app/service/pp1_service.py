@@ -1,32 +1,149 @@
+import asyncio
 import os
+import re
 import time
+import unicodedata
 from app.utils.logger import Logger
 import httpx
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional
 from dotenv import load_dotenv
 
 from app.db.mongo import MongoDB
+from app.db.log_writer import LogWriter
+from app.utils import fast_json
+from app.utils.cache import TTLCache
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.http_client import HttpClientRegistry
+from app.utils.prometheus import IN_FLIGHT, PP1_LATENCY
+from app.utils.singleflight import SingleFlight
 
 load_dotenv()
 
 PP1_URL = os.getenv("PP1_URL", "http://localhost:8001")
 TIMEOUT = float(os.getenv("PP1_CLIENT_TIMEOUT_SECONDS", "40.0"))
+CACHE_ENABLED = os.getenv("PP1_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = float(os.getenv("PP1_CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("PP1_CACHE_MAX_ENTRIES", "2000"))
+CACHE_MAX_BYTES = int(os.getenv("PP1_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Ask PP1 for an NDJSON stream ({"delta": ...} lines, optional {"citations": [...]}) on streaming routes
+STREAM_ENABLED = os.getenv("PP1_STREAM_ENABLED", "false").lower() == "true"
+
+# Shared by the HTTP orchestrator and the MCP tools in the same process
+answer_cache = TTLCache("pp1_answers", max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL, max_bytes=CACHE_MAX_BYTES)
+answer_inflight = SingleFlight("pp1_answers")
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """Case-, accent-, punctuation- and whitespace-insensitive form of a question."""
+    decomposed = unicodedata.normalize("NFKD", question)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", stripped.casefold())
+    return _SPACES.sub(" ", text).strip()
 
 class PP1Service:
     def __init__(self):
         self.db = MongoDB.get_db()
         self.logger = Logger()
 
-    async def ask_normativa(self, request_id: str, question: str) -> Optional[Dict[str, Any]]:
+    async def ask_normativa(self, request_id: str, question: str, use_rag: bool = True, top_k: int = 5) -> Optional[Dict[str, Any]]:
         """
-        Calls PP1 RAG agent.
-        Logs interaction to 'service_logs'.
+        Answers a regulation question, from cache when an equivalent question
+        (same normalized text and RAG parameters) was answered recently.
+        Concurrent identical questions share one upstream call.
+        """
+        if not CACHE_ENABLED:
+            return await self._ask_upstream(request_id, question, use_rag, top_k)
+
+        key = (normalize_question(question), use_rag, top_k)
+        cached = answer_cache.get(key)
+        if cached is not None:
+            self.logger.info("[PP1Service] Answer cache hit")
+            return cached
+
+        async def fetch():
+            result = await self._ask_upstream(request_id, question, use_rag, top_k)
+            if result:
+                answer_cache.set(key, result)
+            return result
+
+        return await answer_inflight.do(key, fetch)
+
+    async def stream_normativa(self, request_id: str, question: str, use_rag: bool = True, top_k: int = 5) -> AsyncIterator[Dict[str, Any]]:
         """
+        Like `ask_normativa`, but yields {"delta": text} chunks as PP1 produces
+        them and finishes with {"answer": <ask_normativa result>}. Cached
+        answers, and PP1 replies that are not streamed, arrive as one chunk.
+        """
+        key = (normalize_question(question), use_rag, top_k)
+        cached = answer_cache.get(key) if CACHE_ENABLED else None
+        if cached is None and STREAM_ENABLED:
+            async for event in self._stream_upstream(request_id, question, use_rag, top_k):
+                if "answer" in event and event["answer"] and CACHE_ENABLED:
+                    answer_cache.set(key, event["answer"])
+                yield event
+            return
+
+        answer = cached if cached is not None else await self.ask_normativa(request_id, question, use_rag, top_k)
+        if answer:
+            yield {"delta": answer["text"]}
+        yield {"answer": answer}
+
+    async def _stream_upstream(self, request_id: str, question: str, use_rag: bool, top_k: int) -> AsyncIterator[Dict[str, Any]]:
         url = f"{PP1_URL}/ask"
         start_time = time.time()
-        
-        log_entry = {
+        log_entry = self._log_entry(request_id, url, question)
+        log_entry["streamed"] = True
+        client = HttpClientRegistry.get_client(url)
+        payload = {"message": question, "use_rag": use_rag, "top_k": top_k, "stream": True}
+        headers = {"Accept": "application/x-ndjson, application/json"}
+        answer = None
+        IN_FLIGHT.labels("pp1").inc()
+        try:
+            async with client.stream("POST", url, json=payload, headers=headers, timeout=TIMEOUT) as response:
+                log_entry["status_code"] = response.status_code
+                if response.status_code != 200:
+                    log_entry["error"] = f"HTTP {response.status_code}"
+                elif response.headers.get("content-type", "").startswith(("application/x-ndjson", "application/ndjson")):
+                    parts, citations = [], []
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        chunk = fast_json.loads(line)
+                        if chunk.get("delta"):
+                            parts.append(chunk["delta"])
+                            yield {"delta": chunk["delta"]}
+                        citations = chunk.get("citations", citations)
+                    answer = {"text": "".join(parts), "citations": citations}
+                else:
+                    # PP1 answered in one piece: same shape as ask_normativa
+                    data = fast_json.loads(await response.aread())
+                    answer = {"text": data.get("response", ""), "citations": data.get("citations", [])}
+                    yield {"delta": answer["text"]}
+                log_entry["result"] = answer
+        except asyncio.CancelledError:
+            log_entry["cancelled"] = True
+            log_entry["error"] = "Cancelled"
+            raise
+        except httpx.TimeoutException:
+            log_entry["timeout"] = True
+            log_entry["error"] = "Timeout"
+        except Exception as e:
+            log_entry["error"] = str(e)
+        finally:
+            IN_FLIGHT.labels("pp1").dec()
+            log_entry["latency_ms"] = round((time.time() - start_time) * 1000, 3)
+            if not log_entry.get("cancelled"):
+                outcome = "timeout" if log_entry["timeout"] else "error" if log_entry["error"] else "ok"
+                PP1_LATENCY.labels(outcome).observe(log_entry["latency_ms"] / 1000)
+            await LogWriter.write("service_logs", log_entry)
+        yield {"answer": answer if not log_entry["error"] else None}
+
+    @staticmethod
+    def _log_entry(request_id: str, url: str, question: str) -> Dict[str, Any]:
+        return {
             "request_id": request_id,
             "ts": datetime.utcnow(),
             "service_type": "pp1",
@@ -39,43 +156,66 @@ class PP1Service:
             "status_code": 0
         }
 
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            try:
-                payload = {
-                    "message": question,
-                    "use_rag": True,
-                    "top_k": 5
-                }
-
-                response = await client.post(url, json=payload)
-                latency_ms = round((time.time() - start_time) * 1000, 3)
-                
-                log_entry["latency_ms"] = latency_ms
-                log_entry["status_code"] = response.status_code
+    async def _ask_upstream(self, request_id: str, question: str, use_rag: bool, top_k: int) -> Optional[Dict[str, Any]]:
+        """
+        Calls PP1 RAG agent.
+        Logs interaction to 'service_logs'.
+        """
+        url = f"{PP1_URL}/ask"
+        start_time = time.time()
+        
+        log_entry = self._log_entry(request_id, url, question)
 
-                if response.status_code == 200:
-                    data = response.json()
-                    self.logger.info(f"[PP1Service] Received response from PP1: {data}")
-                    log_entry["result"] = data
-                    
-                    return {
-                        "text": data.get("response", ""),
-                        "citations": data.get("citations", [])
-                    }
-                else:
-                    log_entry["error"] = f"HTTP {response.status_code}: {response.text[:100]}"
-                    return None
+        client = HttpClientRegistry.get_client(url)
+        IN_FLIGHT.labels("pp1").inc()
+        try:
+            payload = {
+                "message": question,
+                "use_rag": use_rag,
+                "top_k": top_k
+            }
 
-            except httpx.TimeoutException:
-                log_entry["latency_ms"] = round((time.time() - start_time) * 1000, 3)
-                log_entry["timeout"] = True
-                log_entry["error"] = "Timeout"
-                return None
+            response = await client.post(url, json=payload, timeout=TIMEOUT)
+            latency_ms = round((time.time() - start_time) * 1000, 3)
             
-            except Exception as e:
-                log_entry["latency_ms"] = round((time.time() - start_time) * 1000, 3)
-                log_entry["error"] = str(e)
+            log_entry["latency_ms"] = latency_ms
+            log_entry["status_code"] = response.status_code
+
+            if response.status_code == 200:
+                data = await CpuExecutor.run("json_parse", fast_json.loads, response.content, size=len(response.content))
+                self.logger.info("[PP1Service] Received response from PP1", latency_ms=latency_ms)
+                self.logger.debug_sample("[PP1Service] PP1 response payload: %s", data)
+                log_entry["result"] = data
+                
+                return {
+                    "text": data.get("response", ""),
+                    "citations": data.get("citations", [])
+                }
+            else:
+                log_entry["error"] = f"HTTP {response.status_code}: {response.text[:100]}"
                 return None
-            
-            finally:
-                await self.db.service_logs.insert_one(log_entry)
+
+        except asyncio.CancelledError:
+            # Speculative call discarded by the orchestrator
+            log_entry["latency_ms"] = round((time.time() - start_time) * 1000, 3)
+            log_entry["cancelled"] = True
+            log_entry["error"] = "Cancelled"
+            raise
+
+        except httpx.TimeoutException:
+            log_entry["latency_ms"] = round((time.time() - start_time) * 1000, 3)
+            log_entry["timeout"] = True
+            log_entry["error"] = "Timeout"
+            return None
+        
+        except Exception as e:
+            log_entry["latency_ms"] = round((time.time() - start_time) * 1000, 3)
+            log_entry["error"] = str(e)
+            return None
+        
+        finally:
+            IN_FLIGHT.labels("pp1").dec()
+            if not log_entry.get("cancelled"):
+                outcome = "timeout" if log_entry["timeout"] else "error" if log_entry["error"] else "ok"
+                PP1_LATENCY.labels(outcome).observe(log_entry.get("latency_ms", 0) / 1000)
+            await LogWriter.write("service_logs", log_entry)
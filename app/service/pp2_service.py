@@ -4,56 +4,148 @@ import time
 from app.utils.logger import Logger
 import httpx
 from datetime import datetime
-from typing import Annotated, List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional
 from dotenv import load_dotenv
-from fastapi import UploadFile, File
 
 from app.db.mongo import MongoDB
+from app.db.log_writer import LogWriter
+from app.model.db_models import AgentConfig
+from app.service.agent_registry import AgentRegistry
+from app.service.latency_tracker import LatencyTracker
+from app.service.bulkhead import Bulkhead
+from app.service.circuit_breaker import CircuitBreaker
+from app.utils import fast_json
+from app.utils.cpu_executor import CpuExecutor
+from app.utils.http_client import HttpClientRegistry
+from app.utils.multipart import MultipartBody
+from app.utils.prometheus import IN_FLIGHT, PP2_ERRORS, PP2_LATENCY, PP2_TIMEOUTS
 
 load_dotenv()
 
 TIMEOUT = float(os.getenv("PP2_CLIENT_TIMEOUT_SECONDS", "3.0"))
+ADAPTIVE_TIMEOUTS = os.getenv("PP2_ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+HEDGING_ENABLED = os.getenv("PP2_HEDGING_ENABLED", "false").lower() == "true"
 
 class PP2Service:
     def __init__(self):
         self.db = MongoDB.get_db()
         self.logger = Logger()
 
-    async def get_active_agents(self) -> List[Dict]:
-        """Fetch active agents from the 'config' collection."""
-        cursor = self.db.config.find({"active": True})
-        agents = await cursor.to_list(length=100)
-        return agents
+    async def get_active_agents(self) -> List[AgentConfig]:
+        """Active agents from the in-memory registry of the 'config' collection."""
+        return await AgentRegistry.get_agents()
 
-    async def verify_parallel(self, request_id: str, image: Annotated[UploadFile, File(...)]) -> List[Dict]:
+    async def verify_parallel(
+        self,
+        request_id: str,
+        image_bytes: bytes,
+        filename: str,
+        content_type: str,
+        agents: Optional[List[AgentConfig]] = None,
+        limiter: Optional[asyncio.Semaphore] = None,
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ) -> List[Dict]:
         """
         Fan-out to all active agents in parallel.
         Returns a list of results (one per agent).
         Also writes raw logs to 'service_logs'.
+        `limiter` bounds agent calls shared with other fan-outs (batch requests).
+        `on_result` is called with each result as soon as its agent answers.
         """
-        agents = await self.get_active_agents()
+        if agents is None:
+            agents = await self.get_active_agents()
         if not agents:
             return []
 
         self.logger.info(f"PP2Service: Found {len(agents)} active agents for verification.")
-        
-        # Read file content once to avoid concurrency issues
-        await image.seek(0)
-        file_content = await image.read()
-        await image.seek(0)
-
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            tasks = [
-                self._call_agent(client, agent, request_id, file_content, image.filename, image.content_type)
-                for agent in agents
-            ]
-            results = await asyncio.gather(*tasks)
-            return results
-
-    async def _call_agent(self, client: httpx.AsyncClient, agent: Dict, request_id: str, file_content: bytes, filename: str, content_type: str) -> Dict:
+
+        # Encoded once, streamed to every agent from the same buffer
+        body = MultipartBody("image", filename, image_bytes, content_type)
+        tasks = [
+            self._call_agent_limited(agent, request_id, body, limiter, on_result)
+            for agent in agents
+        ]
+        results = await asyncio.gather(*tasks)
+        return results
+
+    async def verify_until_settled(
+        self,
+        request_id: str,
+        image_bytes: bytes,
+        filename: str,
+        content_type: str,
+        is_settled: Callable[[List[Dict], int], bool],
+        agents: Optional[List[AgentConfig]] = None,
+        limiter: Optional[asyncio.Semaphore] = None,
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ) -> List[Dict]:
+        """
+        Fan-out like `verify_parallel`, but consumes results as they complete.
+        After each one, `is_settled(results_so_far, outstanding)` decides whether
+        the remaining calls still matter; if not they are cancelled (and logged
+        as cancelled). Returns only the completed results.
+        """
+        if agents is None:
+            agents = await self.get_active_agents()
+        if not agents:
+            return []
+
+        self.logger.info(f"PP2Service: Found {len(agents)} active agents for incremental verification.")
+
+        body = MultipartBody("image", filename, image_bytes, content_type)
+        pending = {
+            asyncio.create_task(self._call_agent_limited(agent, request_id, body, limiter, on_result))
+            for agent in agents
+        }
+        results = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                results.extend(task.result() for task in done)
+                if pending and is_settled(results, len(pending)):
+                    self.logger.info(f"PP2Service: Outcome settled, cancelling {len(pending)} outstanding agents.")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return results
+
+    async def _call_agent_limited(
+        self,
+        agent: AgentConfig,
+        request_id: str,
+        body: MultipartBody,
+        limiter: Optional[asyncio.Semaphore],
+        on_result: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        if limiter is None:
+            result = await self._call_agent(agent, request_id, body)
+        else:
+            async with limiter:
+                result = await self._call_agent(agent, request_id, body)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    async def _call_agent(self, agent: AgentConfig, request_id: str, body: MultipartBody) -> Dict:
         start_time = time.time()
-        url = agent.get("endpoint_verify")
-        name = agent.get("name")
+        url = agent.endpoint_verify
+        name = agent.name
+
+        breaker = CircuitBreaker.for_agent(name)
+        if not breaker.allow_request():
+            # Known-dead agent: no network call, no added latency
+            self.logger.info(f"PP2Service: Skipping agent {name}, circuit open")
+            return {"agent_name": name, "score": 0.0, "error": "CircuitOpen", "skipped": True}
+
+        bulkhead = Bulkhead.for_agent(name, agent.max_in_flight)
+        tracker = LatencyTracker.for_agent(name)
+        tracker.requests += 1
+        timeout = tracker.timeout() if ADAPTIVE_TIMEOUTS else TIMEOUT
+        hedge_after = tracker.hedge_delay() if HEDGING_ENABLED else None
         self.logger.info(f"PP2Service: Calling agent {name} at {url}")
         
         log_entry = {
@@ -62,48 +154,158 @@ class PP2Service:
             "service_type": "pp2",
             "service_name": name,
             "endpoint": url,
-            "payload_size_bytes": len(file_content),
+            "payload_size_bytes": len(body.content),
             "timeout": False,
             "error": None,
             "result": None,
-            "status_code": 0
+            "status_code": 0,
+            "timeout_s": timeout,
+            "hedged": False,
+            "hedge_won": False,
+            "queue_wait_ms": 0.0,
+            "queue_timeout": False
         }
 
+        IN_FLIGHT.labels("pp2").inc()
+        acquired = False
         try:
-            files = {"image": (filename, file_content, content_type)}
-            response = await client.post(url, files=files)
+            # Bulkhead: wait for a per-agent slot; the wait is logged apart from latency
+            acquired = await bulkhead.acquire(timeout)
+            log_entry["queue_wait_ms"] = round((time.time() - start_time) * 1000, 3)
+            if not acquired:
+                breaker.release()
+                log_entry["queue_timeout"] = True
+                log_entry["error"] = "QueueTimeout"
+                self.logger.info(f"PP2Service: Agent {name} saturated, no slot within {timeout}s")
+                return {"agent_name": name, "score": 0.0, "error": "QueueTimeout"}
+            # One budget per agent call: the network call gets what the queue wait left
+            call_timeout = max(timeout - log_entry["queue_wait_ms"] / 1000, 0.001)
+            start_time = time.time()
+
+            client = HttpClientRegistry.get_client(url)
+
+            def send(request_timeout: float):
+                return client.post(url, content=body.stream(), headers=body.headers, timeout=request_timeout)
+
+            # httpx applies its timeout to each phase; this is the deadline for the whole call
+            async with asyncio.timeout(call_timeout):
+                response = await self._post_hedged(send, call_timeout, hedge_after, tracker, log_entry, bulkhead)
             latency_ms = round((time.time() - start_time) * 1000, 3)
+            tracker.record(latency_ms)
             
             log_entry["latency_ms"] = latency_ms
             log_entry["status_code"] = response.status_code
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
             
             if response.status_code == 200:
-                data = response.json()
+                data = await CpuExecutor.run("json_parse", fast_json.loads, response.content, size=len(response.content))
                 score = data.get("data", {}).get("score", 0.0)
+                # The agent payload is kept once, in the log row; fusion only needs the score
                 log_entry["result"] = {"score": score, "raw": data}
                 
                 return {
                     "agent_name": name,
                     "score": score,
-                    "raw": data,
+                    "threshold": agent.threshold,
                     "latency_ms": latency_ms
                 }
             else:
                 log_entry["error"] = f"HTTP {response.status_code}: {response.text[:100]}"
                 return {"agent_name": name, "score": 0.0, "error": str(response.status_code)}
 
-        except httpx.TimeoutException:
+        except asyncio.CancelledError:
             latency_ms = round((time.time() - start_time) * 1000, 3)
             log_entry["latency_ms"] = latency_ms
+            log_entry["cancelled"] = True
+            log_entry["error"] = "Cancelled"
+            breaker.release()
+            raise
+
+        except (httpx.TimeoutException, TimeoutError):
+            latency_ms = round((time.time() - start_time) * 1000, 3)
+            # Censored sample: the agent took at least this long
+            tracker.record(latency_ms)
+            breaker.record_failure()
+            log_entry["latency_ms"] = latency_ms
             log_entry["timeout"] = True
             log_entry["error"] = "Timeout"
             return {"agent_name": name, "score": 0.0, "error": "Timeout"}
 
         except Exception as e:
             latency_ms = round((time.time() - start_time) * 1000, 3)
+            if log_entry["status_code"] == 0:
+                # Transport-level failure (no response); a bad 200 body was already judged
+                breaker.record_failure()
             log_entry["latency_ms"] = latency_ms
             log_entry["error"] = str(e)
             return {"agent_name": name, "score": 0.0, "error": str(e)}
 
         finally:
-            await self.db.service_logs.insert_one(log_entry)
+            if acquired:
+                bulkhead.release()
+            IN_FLIGHT.labels("pp2").dec()
+            if not log_entry.get("cancelled") and not log_entry["queue_timeout"]:
+                PP2_LATENCY.labels(name).observe(log_entry.get("latency_ms", 0) / 1000)
+                if log_entry["timeout"]:
+                    PP2_TIMEOUTS.labels(name).inc()
+                elif log_entry["error"]:
+                    PP2_ERRORS.labels(name).inc()
+            await LogWriter.write("service_logs", log_entry)
+
+    async def _post_hedged(
+        self,
+        send: Callable[[float], Awaitable[httpx.Response]],
+        timeout: float,
+        hedge_after: Optional[float],
+        tracker: LatencyTracker,
+        log_entry: Dict,
+        bulkhead: Optional[Bulkhead] = None,
+    ) -> httpx.Response:
+        """
+        Send the request via `send(timeout)`. If `hedge_after` is set and the
+        first attempt has not answered by then, send one duplicate with the
+        remaining budget and take whichever succeeds first; the loser is cancelled.
+        The duplicate takes its own bulkhead slot and is skipped if none is free.
+        """
+        if hedge_after is None or hedge_after >= timeout:
+            return await send(timeout)
+
+        primary = asyncio.create_task(send(timeout))
+        tasks = {primary}
+        hedge_slot = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            if bulkhead is not None:
+                hedge_slot = bulkhead.try_acquire()
+                if not hedge_slot:
+                    return await primary
+
+            tracker.hedges += 1
+            log_entry["hedged"] = True
+            hedge = asyncio.create_task(send(timeout - hedge_after))
+            tasks.add(hedge)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            tracker.hedge_wins += 1
+                            log_entry["hedge_won"] = True
+                        return task.result()
+
+            # Both attempts failed: surface the original one
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if hedge_slot:
+                bulkhead.release()
@@ -0,0 +1,69 @@
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from dotenv import load_dotenv
+
+from app.service.admission_controller import user_type_label
+
+load_dotenv()
+
+# off | always | adaptive
+MODE = os.getenv("PP1_SPECULATIVE_MODE", "off").lower()
+MIN_IDENTIFY_RATE = float(os.getenv("PP1_SPECULATIVE_MIN_RATE", "0.7"))
+MIN_SAMPLES = int(os.getenv("PP1_SPECULATIVE_MIN_SAMPLES", "20"))
+WINDOW_SIZE = int(os.getenv("PP1_SPECULATIVE_WINDOW", "200"))
+
+
+class SpeculationPolicy:
+    """
+    Decides whether the PP1 call should start alongside the PP2 fan-out.
+    In 'adaptive' mode it speculates only for user types whose recent
+    identification rate is at least MIN_IDENTIFY_RATE, since the answer is
+    thrown away for any other decision. Tracks how many speculative calls
+    were used versus wasted.
+    """
+
+    def __init__(self, mode: str = MODE):
+        self.mode = mode
+        self.decisions: Dict[str, Deque[bool]] = {}
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+
+    @staticmethod
+    def _key(user_type: Optional[str]) -> str:
+        return user_type_label(user_type)
+
+    def record_decision(self, user_type: Optional[str], decision: str):
+        if self.mode == "off":
+            return
+        window = self.decisions.setdefault(self._key(user_type), deque(maxlen=WINDOW_SIZE))
+        window.append(decision == "identified")
+
+    def identify_rate(self, user_type: Optional[str]) -> Optional[float]:
+        window = self.decisions.get(self._key(user_type))
+        if not window or len(window) < MIN_SAMPLES:
+            return None
+        return sum(window) / len(window)
+
+    def should_speculate(self, user_type: Optional[str]) -> bool:
+        if self.mode == "always":
+            return True
+        if self.mode == "adaptive":
+            rate = self.identify_rate(user_type)
+            return rate is not None and rate >= MIN_IDENTIFY_RATE
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "waste_ratio": round(self.wasted / self.started, 4) if self.started else 0.0,
+            "identify_rate_by_user_type": {
+                user_type: round(sum(window) / len(window), 4)
+                for user_type, window in self.decisions.items() if window
+            },
+        }
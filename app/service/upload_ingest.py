@@ -0,0 +1,166 @@
+import hashlib
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.service.validation_service import ValidationService
+
+# Text fields (e.g. `question`) are small; anything bigger is rejected
+MAX_FIELD_BYTES = 64 * 1024
+# Multipart framing and text fields on top of the file itself
+MAX_FORM_OVERHEAD_BYTES = MAX_FIELD_BYTES + 16 * 1024
+# Parts per body: the image plus a few text fields
+MAX_PARTS = 8
+
+
+class IngestedImage(NamedTuple):
+    filename: Optional[str]
+    # Sniffed from the magic bytes, not the client's declaration
+    content_type: str
+    declared_content_type: Optional[str]
+    data: bytes
+    sha256: str
+
+
+class StreamingImageIngest:
+    """
+    Single pass over a multipart/form-data body as it arrives. The image part
+    is size-checked, type-sniffed from its first bytes and SHA-256 hashed
+    chunk by chunk, so a bad upload is rejected before the rest is read.
+    """
+
+    def __init__(self, boundary: bytes, file_field: str, validation: ValidationService):
+        self.file_field = file_field
+        self.validation = validation
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        self.fields: Dict[str, str] = {}
+        self.image: Optional[IngestedImage] = None
+        self._buffer = bytearray()
+        self._sha256 = hashlib.sha256()
+        self._sniffed_type: Optional[str] = None
+        self._parts = 0
+
+    def write(self, chunk: bytes):
+        try:
+            self.parser.write(chunk)
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid multipart body: {str(e)}")
+
+    def finalize(self):
+        try:
+            self.parser.finalize()
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid multipart body: {str(e)}")
+
+    def _on_part_begin(self):
+        self._parts += 1
+        if self._parts > MAX_PARTS:
+            raise HTTPException(status_code=413, detail=f"Too many form fields. Max is {MAX_PARTS}.")
+        self._headers: Dict[str, str] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._part_name: Optional[str] = None
+        self._part_filename: Optional[str] = None
+        self._part_type: Optional[str] = None
+        self._is_image = False
+        self._field_value = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.decode("latin-1").lower()] = self._header_value.decode("latin-1")
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get("content-disposition", ""))
+        self._part_name = params.get(b"name", b"").decode("utf-8")
+        filename = params.get(b"filename")
+        self._part_filename = filename.decode("utf-8") if filename is not None else None
+        self._part_type = self._headers.get("content-type")
+        self._is_image = self._part_name == self.file_field and filename is not None
+        if self._is_image:
+            if self.image is not None:
+                raise HTTPException(status_code=400, detail=f"Only one '{self.file_field}' file is accepted")
+            # Rejected on the part headers, before any file byte is buffered
+            self.validation.check_declared_type(self._part_type)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if not self._is_image:
+            self._field_value += chunk
+            if len(self._field_value) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Field '{self._part_name}' is too large")
+            return
+
+        self.validation.check_size(len(self._buffer) + len(chunk))
+        self._buffer += chunk
+        self._sha256.update(chunk)
+        if self._sniffed_type is None and len(self._buffer) >= self.validation.SNIFF_BYTES:
+            self._sniffed_type = self.validation.sniff_image_type(bytes(self._buffer[:self.validation.SNIFF_BYTES]))
+
+    def _on_part_end(self):
+        if not self._is_image:
+            self.fields[self._part_name] = self._field_value.decode("utf-8", errors="replace")
+            return
+        if self._sniffed_type is None:
+            self._sniffed_type = self.validation.sniff_image_type(bytes(self._buffer))
+        self.image = IngestedImage(
+            filename=self._part_filename,
+            content_type=self._sniffed_type,
+            declared_content_type=self._part_type,
+            data=bytes(self._buffer),
+            sha256=self._sha256.hexdigest(),
+        )
+        self._buffer = bytearray()
+
+
+async def ingest_image_upload(request: Request, file_field: str = "image", validation: Optional[ValidationService] = None) -> Tuple[IngestedImage, Dict[str, str]]:
+    """
+    Reads the request body once, validating and hashing the `file_field`
+    image while it streams in. Returns the image and the text fields.
+    """
+    validation = validation or ValidationService()
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+
+    # A declared length that can never fit is refused without reading the body;
+    # an undeclared (chunked) one is cut off as soon as it passes the same limit
+    max_body = validation.MAX_FILE_SIZE_BYTES + MAX_FORM_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body:
+        validation.check_size(int(content_length))
+
+    ingest = StreamingImageIngest(boundary, file_field, validation)
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_body:
+            raise HTTPException(status_code=413, detail=f"Payload too large. Max size is {validation.MAX_FILE_SIZE_MB}MB.")
+        ingest.write(chunk)
+    ingest.finalize()
+
+    if ingest.image is None:
+        raise HTTPException(status_code=422, detail=f"Field '{file_field}' is required")
+    return ingest.image, ingest.fields
@@ -1,9 +1,16 @@
+from typing import Optional
 from fastapi import UploadFile, HTTPException
 
 class ValidationService:
     MAX_FILE_SIZE_MB = 5
     MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
     ALLOWED_MIME_TYPES = ["image/jpeg", "image/png"]
+    # Signatures of the allowed types; the declared content type is not trusted on its own
+    MAGIC_BYTES = {
+        "image/jpeg": b"\xff\xd8\xff",
+        "image/png": b"\x89PNG\r\n\x1a\n",
+    }
+    SNIFF_BYTES = 8
 
     def validate_image(self, image: UploadFile, image_bytes: bytes):
         """
@@ -11,17 +18,36 @@ class ValidationService:
         Raises HTTPException if invalid.
         """
         # 1. MIME Type Check
-        if image.content_type not in self.ALLOWED_MIME_TYPES:
+        self.check_declared_type(image.content_type)
+
+        # 2. Size Check
+        self.check_size(len(image_bytes))
+
+        # 3. Content Check
+        self.sniff_image_type(image_bytes[:self.SNIFF_BYTES])
+
+        return True
+
+    def check_declared_type(self, content_type: Optional[str]):
+        if content_type not in self.ALLOWED_MIME_TYPES:
              raise HTTPException(
-                 status_code=415, 
+                 status_code=415,
                  detail=f"Unsupported Media Type. Allowed: {', '.join(self.ALLOWED_MIME_TYPES)}"
              )
 
-        # 2. Size Check
-        if len(image_bytes) > self.MAX_FILE_SIZE_BYTES:
+    def check_size(self, size: int):
+        if size > self.MAX_FILE_SIZE_BYTES:
             raise HTTPException(
-                status_code=413, 
+                status_code=413,
                 detail=f"Payload too large. Max size is {self.MAX_FILE_SIZE_MB}MB."
             )
-        
-        return True
+
+    def sniff_image_type(self, head: bytes) -> str:
+        """MIME type from the first bytes of the file. Raises 415 if it is not an allowed image."""
+        for mime_type, magic in self.MAGIC_BYTES.items():
+            if head.startswith(magic):
+                return mime_type
+        raise HTTPException(
+            status_code=415,
+            detail=f"File content is not a supported image. Allowed: {', '.join(self.ALLOWED_MIME_TYPES)}"
+        )
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ENABLED = os.getenv("CPU_EXECUTOR_ENABLED", "true").lower() == "true"
+# thread: hashlib, base64, orjson and Pillow release the GIL on large inputs
+# process: for work that holds the GIL (stdlib json); arguments are pickled
+KIND = os.getenv("CPU_EXECUTOR_KIND", "thread").lower()
+WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this input size the hand-off costs more than it saves; run inline
+MIN_OFFLOAD_BYTES = int(os.getenv("CPU_OFFLOAD_MIN_BYTES", str(256 * 1024)))
+
+
+def _timed(fn: Callable, *args) -> Tuple[Any, float]:
+    """Runs `fn` and returns (result, elapsed ms). Module-level so process pools can pickle it."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+class CpuExecutor:
+    """
+    Shared pool for CPU-bound request work (hashing, base64, large JSON,
+    image preprocessing). Inputs of at least MIN_OFFLOAD_BYTES run in the
+    pool; smaller ones inline. Per stage it reports how much CPU time ran off
+    the loop (stall saved) and how much still ran on it.
+    """
+    executor: Optional[Executor] = None
+    stats: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def _get_executor(cls) -> Executor:
+        if cls.executor is None:
+            if KIND == "process":
+                cls.executor = ProcessPoolExecutor(max_workers=WORKERS)
+            else:
+                cls.executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="cpu")
+        return cls.executor
+
+    @classmethod
+    def _stage(cls, stage: str) -> Dict[str, float]:
+        stats = cls.stats.get(stage)
+        if stats is None:
+            stats = cls.stats[stage] = {"inline": 0, "offloaded": 0, "inline_ms": 0.0, "stall_saved_ms": 0.0, "max_offloaded_ms": 0.0}
+        return stats
+
+    @classmethod
+    async def run(cls, stage: str, fn: Callable, *args, size: int = 0, offload: Optional[bool] = None) -> Any:
+        """
+        Runs `fn(*args)`, off the event loop when `size` (input bytes) is at
+        least MIN_OFFLOAD_BYTES, or as forced by `offload`.
+        """
+        stats = cls._stage(stage)
+        if offload is None:
+            offload = size >= MIN_OFFLOAD_BYTES
+        if not ENABLED or not offload:
+            result, elapsed_ms = _timed(fn, *args)
+            stats["inline"] += 1
+            stats["inline_ms"] += elapsed_ms
+            return result
+
+        loop = asyncio.get_running_loop()
+        result, elapsed_ms = await loop.run_in_executor(cls._get_executor(), _timed, fn, *args)
+        stats["offloaded"] += 1
+        stats["stall_saved_ms"] += elapsed_ms
+        stats["max_offloaded_ms"] = max(stats["max_offloaded_ms"], elapsed_ms)
+        return result
+
+    @classmethod
+    def close(cls):
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+            cls.executor = None
+
+
+def cpu_executor_stats() -> Dict[str, Any]:
+    """Per-stage inline/offloaded counts and CPU time, plus the pool configuration."""
+    return {
+        "kind": KIND,
+        "workers": WORKERS,
+        "min_offload_bytes": MIN_OFFLOAD_BYTES,
+        "stages": {stage: {k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()} for stage, stats in CpuExecutor.stats.items()},
+    }
@@ -0,0 +1,40 @@
+import json
+import os
+from typing import Any, Union
+
+from dotenv import load_dotenv
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # optional dependency: stdlib json is used instead
+    ORJSON_AVAILABLE = False
+
+load_dotenv()
+
+# Opt-in: parse upstream bodies with orjson and send pre-serialized responses
+ENABLED = os.getenv("FAST_JSON_ENABLED", "false").lower() == "true"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parses a JSON body straight from bytes (no text decoding step)."""
+    if ENABLED and ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes for plain values (dict/list/str/number)."""
+    if ENABLED and ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """
+    JSON response serialized once by pydantic-core. Returning a Response skips
+    FastAPI's dump -> re-validate -> jsonable_encoder -> json.dumps chain.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json", status_code=status_code)
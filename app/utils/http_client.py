@@ -0,0 +1,72 @@
+import os
+from typing import Dict
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+from app.utils.logger import Logger
+
+load_dotenv()
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30.0"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+logger = Logger()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpClientRegistry:
+    """
+    Process-wide registry of long-lived httpx clients, one per upstream host.
+    Each client keeps its own keep-alive pool so agents never pay TCP/TLS setup
+    on every request. Closed on application shutdown via `close()`.
+    """
+    clients: Dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @classmethod
+    def get_client(cls, url: str) -> httpx.AsyncClient:
+        """Return the pooled client for the host of `url`, creating it on first use."""
+        key = cls._host_key(url)
+        client = cls.clients.get(key)
+        if client is None or client.is_closed:
+            http2 = HTTP2_ENABLED and _http2_available()
+            if HTTP2_ENABLED and not http2:
+                logger.warning("[HttpClientRegistry] HTTP2_ENABLED set but 'h2' is not installed, using HTTP/1.1")
+
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                http2=http2,
+            )
+            cls.clients[key] = client
+            logger.info(f"[HttpClientRegistry] Created pooled client for {key} (http2={http2})")
+
+        return client
+
+    @classmethod
+    async def close(cls):
+        """Close every pooled client. Safe to call more than once."""
+        clients = list(cls.clients.values())
+        cls.clients = {}
+        for client in clients:
+            await client.aclose()
+        if clients:
+            logger.info(f"[HttpClientRegistry] Closed {len(clients)} pooled clients")
@@ -0,0 +1,66 @@
+import math
+from typing import Dict, Iterable, Optional
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+# Anything at or below this (in ms) lands in the zero bin
+MIN_VALUE = 0.01
+ZERO_BIN = "z"
+
+
+def bin_key(value: float) -> str:
+    """Bin of a latency value. Keys are strings so they can be Mongo field names."""
+    if value <= MIN_VALUE:
+        return ZERO_BIN
+    return str(math.ceil(math.log(value) / LOG_GAMMA))
+
+
+def bin_value(key: str) -> float:
+    """Representative value of a bin (within RELATIVE_ACCURACY of every member)."""
+    if key == ZERO_BIN:
+        return 0.0
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+
+class LatencySketch:
+    """
+    Mergeable latency histogram with log-spaced bins (DDSketch-style).
+    Quantiles are accurate to RELATIVE_ACCURACY. Two sketches merge by adding
+    their bin counts, so per-minute/per-hour buckets can be combined (or
+    `$inc`-ed in Mongo) without keeping raw samples.
+    """
+
+    def __init__(self, bins: Optional[Dict[str, int]] = None):
+        self.bins: Dict[str, int] = dict(bins) if bins else {}
+
+    def add(self, value: float, count: int = 1):
+        key = bin_key(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, bins: Dict[str, int]):
+        for key, count in bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    @property
+    def count(self) -> int:
+        return sum(self.bins.values())
+
+    def _ordered(self) -> Iterable:
+        zero = self.bins.get(ZERO_BIN, 0)
+        if zero:
+            yield ZERO_BIN, zero
+        for key in sorted((k for k in self.bins if k != ZERO_BIN), key=int):
+            yield key, self.bins[key]
+
+    def quantile(self, q: float) -> float:
+        total = self.count
+        if total == 0:
+            return 0.0
+        rank = q * (total - 1)
+        seen = 0
+        for key, count in self._ordered():
+            seen += count
+            if seen > rank:
+                return bin_value(key)
+        return bin_value(key)
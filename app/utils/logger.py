@@ -1,60 +1,136 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# text | json
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Fraction of debug payload dumps (debug_sample) that are actually emitted
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+class StructuredFormatter(logging.Formatter):
+   """Appends the record's structured fields as key=value pairs, or renders the record as one JSON object."""
+
+   def __init__(self, as_json: bool = False):
+      super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+      self.as_json = as_json
+
+   def format(self, record):
+      fields = getattr(record, "fields", None)
+      if self.as_json:
+         payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **(fields or {}),
+         }
+         if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+         if record.exc_text:
+            payload["exc_info"] = record.exc_text
+         return json.dumps(payload, default=str)
+
+      line = super().format(record)
+      if fields:
+         line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+      return line
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+   """
+   QueueHandler that interpolates the message and exception on the calling
+   thread, so arguments the event loop mutates later are logged as they were.
+   Layout (text or JSON) and I/O are left to the listener thread.
+   """
+
+   def prepare(self, record):
+      record = copy.copy(record)
+      record.msg = record.getMessage()
+      record.args = None
+      if record.exc_info:
+         record.exc_text = logging.Formatter().formatException(record.exc_info)
+      record.exc_info = None
+      return record
 
 class Logger:
+   """
+   Process-wide logger. Records are handed to a queue on the calling thread
+   (never blocking the event loop on I/O) and written by a QueueListener
+   thread. Messages may use %-style args, which are only interpolated if the
+   record is emitted; keyword fields are kept structured.
+   """
    _instance = None
+   _lock = threading.Lock()
+
+   def __new__(cls):
+      # True singleton: every Logger() shares one instance and one handler setup
+      if cls._instance is None:
+         with cls._lock:
+            if cls._instance is None:
+               instance = super().__new__(cls)
+               instance._setup()
+               cls._instance = instance
+      return cls._instance
 
    @classmethod
    def get_instance(cls):
       """Get or create the Logger singleton instance"""
-      if cls._instance is None:
-         cls._instance = Logger()
-      return cls._instance
+      return cls()
 
-   def __init__(self):
-      """Initialize the logger with file and console handlers"""
+   def _setup(self):
+      """Initialize the logger with a queue handler and a console listener"""
       # Create logs directory if it doesn't exist
       os.makedirs("logs", exist_ok=True)
 
       # Configure logger
       self.logger = logging.getLogger("logger")
-      self.logger.setLevel(logging.INFO)
-
-      # Clear any existing handlers (important for singleton pattern)
+      self.logger.setLevel(LOG_LEVEL)
+      self.logger.propagate = False
       if self.logger.handlers:
          self.logger.handlers.clear()
 
-      # Create and configure console handler
+      # Console output happens on the listener thread
       console_handler = logging.StreamHandler()
-      console_handler.setLevel(logging.INFO)
-
-      # Create formatter
-      formatter = logging.Formatter(
-         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-      )
-      
-      # file_handler.setFormatter(formatter) 
-      console_handler.setFormatter(formatter)
-      
-      # Add handlers to the logger
-      self.logger.addHandler(console_handler)
-
-   def info(self, message, context=None):
-      """Log an info message, optionally with context"""
+      console_handler.setFormatter(StructuredFormatter(as_json=LOG_FORMAT == "json"))
+
+      self.queue = queue.SimpleQueue()
+      self.logger.addHandler(_DeferredQueueHandler(self.queue))
+      self.listener = logging.handlers.QueueListener(self.queue, console_handler, respect_handler_level=True)
+      self.listener.start()
+      atexit.register(self.listener.stop)
+
+   def _log(self, level, message, args, context, fields):
+      if not self.logger.isEnabledFor(level):
+         return
       msg = f"[{context}] {message}" if context else message
-      self.logger.info(msg)
+      self.logger.log(level, msg, *args, extra={"fields": fields} if fields else None)
 
-   def error(self, message, context=None):
+   def info(self, message, *args, context=None, **fields):
+      """Log an info message, optionally with context"""
+      self._log(logging.INFO, message, args, context, fields)
+
+   def error(self, message, *args, context=None, **fields):
       """Log an error message, optionally with context"""
-      msg = f"[{context}] {message}" if context else message
-      self.logger.error(msg)
+      self._log(logging.ERROR, message, args, context, fields)
 
-   def warning(self, message, context=None):
+   def warning(self, message, *args, context=None, **fields):
       """Log a warning message, optionally with context"""
-      msg = f"[{context}] {message}" if context else message
-      self.logger.warning(msg)
+      self._log(logging.WARNING, message, args, context, fields)
 
-   def debug(self, message, context=None):
+   def debug(self, message, *args, context=None, **fields):
       """Log a debug message, optionally with context"""
-      msg = f"[{context}] {message}" if context else message
-      self.logger.debug(msg)
\ No newline at end of file
+      self._log(logging.DEBUG, message, args, context, fields)
+
+   def debug_sample(self, message, *args, rate=None, context=None, **fields):
+      """Debug-level payload dump, emitted for a `rate` fraction of calls (LOG_DEBUG_SAMPLE_RATE)"""
+      if not self.logger.isEnabledFor(logging.DEBUG):
+         return
+      if random.random() >= (DEBUG_SAMPLE_RATE if rate is None else rate):
+         return
+      self._log(logging.DEBUG, message, args, context, fields)
@@ -0,0 +1,57 @@
+import os
+import re
+from typing import AsyncIterator, Dict, Optional
+
+# The HTTP/1.1 writer copies each chunk it is handed; keep those copies small
+CHUNK_SIZE = 64 * 1024
+
+# Same escaping as httpx's form encoder (HTML5 form-data): quotes and control characters
+_PARAM_ESCAPES = {chr(c): f"%{c:02X}" for c in range(0x00, 0x1F + 1) if c != 0x1B}
+_PARAM_ESCAPES.update({'"': "%22", "\\": "\\\\"})
+_PARAM_ESCAPE_RE = re.compile("|".join(re.escape(c) for c in _PARAM_ESCAPES))
+_MEDIA_TYPE_RE = re.compile(r"^[A-Za-z0-9!#$&^_.+-]+/[A-Za-z0-9!#$&^_.+-]+$")
+
+
+def escape_param(value: str) -> str:
+    """Value safe to place inside a quoted header parameter (no quote or CRLF injection)."""
+    return _PARAM_ESCAPE_RE.sub(lambda m: _PARAM_ESCAPES[m.group(0)], value)
+
+
+def safe_media_type(content_type: Optional[str]) -> str:
+    """`content_type` if it is a plain type/subtype, else application/octet-stream."""
+    if content_type and _MEDIA_TYPE_RE.match(content_type):
+        return content_type
+    return "application/octet-stream"
+
+
+class MultipartBody:
+    """
+    multipart/form-data body with a single file field, encoded once per request.
+    Only the small part headers and the closing boundary are materialized; the
+    file itself is sent from a memoryview over the caller's buffer, so every
+    agent request reuses the same bytes without copying them.
+    """
+
+    def __init__(self, field: str, filename: Optional[str], content: bytes, content_type: Optional[str]):
+        boundary = os.urandom(16).hex()
+        # filename and content_type come from the client: never let them shape the headers
+        self.prefix = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{escape_param(field)}"; filename="{escape_param(filename or "upload")}"\r\n'
+            f"Content-Type: {safe_media_type(content_type)}\r\n\r\n"
+        ).encode("utf-8")
+        self.suffix = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self.content = memoryview(content)
+        self.content_length = len(self.prefix) + len(self.content) + len(self.suffix)
+        self.headers: Dict[str, str] = {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            # Explicit length keeps httpx from switching to chunked encoding
+            "Content-Length": str(self.content_length),
+        }
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """Fresh iterator over the body; call once per outgoing request."""
+        yield self.prefix
+        for offset in range(0, len(self.content), CHUNK_SIZE):
+            yield self.content[offset:offset + CHUNK_SIZE]
+        yield self.suffix
@@ -0,0 +1,67 @@
+import os
+from typing import Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # optional dependency: instruments become no-ops
+    PROMETHEUS_AVAILABLE = False
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0, 40.0)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_LATENCY = Histogram(
+        "orchestrator_request_latency_seconds", "End-to-end request latency",
+        ["route", "decision"], buckets=LATENCY_BUCKETS,
+    )
+    PP2_LATENCY = Histogram(
+        "orchestrator_pp2_latency_seconds", "PP2 agent call latency",
+        ["agent"], buckets=LATENCY_BUCKETS,
+    )
+    PP2_TIMEOUTS = Counter("orchestrator_pp2_timeouts_total", "PP2 agent calls that timed out", ["agent"])
+    PP2_ERRORS = Counter("orchestrator_pp2_errors_total", "PP2 agent calls that failed (non-200 or exception)", ["agent"])
+    PP1_LATENCY = Histogram(
+        "orchestrator_pp1_latency_seconds", "PP1 RAG call latency",
+        ["outcome"], buckets=LATENCY_BUCKETS,
+    )
+    CACHE_LOOKUPS = Counter("orchestrator_cache_lookups_total", "In-process cache lookups", ["cache", "result"])
+    IN_FLIGHT = Gauge("orchestrator_in_flight", "Work currently in flight", ["stage"], multiprocess_mode="livesum")
+    ADMISSION_QUEUE_DEPTH = Gauge("orchestrator_admission_queue_depth", "Identify requests waiting for admission", multiprocess_mode="livesum")
+    ADMISSION_SHED = Counter("orchestrator_admission_shed_total", "Identify requests shed with 503", ["reason", "user_type"])
+    PP2_CALLS_SAVED = Counter("orchestrator_pp2_calls_saved_total", "PP2 agent calls avoided", ["reason"])
+else:
+    REQUEST_LATENCY = PP2_LATENCY = PP2_TIMEOUTS = PP2_ERRORS = _NoopMetric()
+    PP1_LATENCY = CACHE_LOOKUPS = IN_FLIGHT = _NoopMetric()
+    ADMISSION_QUEUE_DEPTH = ADMISSION_SHED = PP2_CALLS_SAVED = _NoopMetric()
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Current metrics in Prometheus text format. Under gunicorn with
+    PROMETHEUS_MULTIPROC_DIR set, values are aggregated across all workers.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
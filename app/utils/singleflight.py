@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+    The first caller (leader) runs `fn`; callers arriving while it is in flight
+    await the leader's outcome. If the leader is cancelled, waiting callers
+    retry and one of them takes over.
+    """
+    registry: Dict[str, "SingleFlight"] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+        SingleFlight.registry[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            future = self.calls.get(key)
+            if future is None:
+                break
+
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Our own cancellation propagates; a cancelled leader means retry
+                if asyncio.current_task().cancelling() or not future.cancelled():
+                    raise
+                self.coalesced -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't report the exception as unretrieved
+            future.add_done_callback(lambda f: f.exception())
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self.calls.get(key) is future:
+                del self.calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self.calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every SingleFlight group created in this process."""
+    return {name: group.stats() for name, group in SingleFlight.registry.items()}
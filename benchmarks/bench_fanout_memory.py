@@ -0,0 +1,79 @@
+"""
+Peak memory of one PP2 fan-out: legacy path vs. single buffer + pre-encoded body.
+
+Legacy: the router reads the spooled upload, PP2Service seeks and reads it
+again, and httpx builds a multipart body per agent from the second copy.
+New: the upload is read once and one MultipartBody is streamed to every agent
+from that buffer in 64 KB slices.
+
+Run: python -m benchmarks.bench_fanout_memory --size-mb 5 --agents 20
+"""
+import argparse
+import asyncio
+import tempfile
+import tracemalloc
+
+import httpx
+
+from app.utils.multipart import MultipartBody
+
+
+class SocketLikeTransport(httpx.AsyncBaseTransport):
+    """Consumes the request stream like httpcore + h11: each chunk goes through
+    b"".join (a copy unless it is already bytes) and is held while 'sending'."""
+
+    async def handle_async_request(self, request):
+        async for chunk in request.stream:
+            wire = b"".join([chunk])
+            await asyncio.sleep(0.001)
+            del wire
+        return httpx.Response(200, json={"data": {"score": 0.5}})
+
+
+async def legacy(client, upload, agents: int):
+    router_bytes = upload.read()          # router: await image.read()
+    upload.seek(0)
+    file_content = upload.read()          # PP2Service: seek + read again
+    files = {"image": ("a.jpg", file_content, "image/jpeg")}
+    await asyncio.gather(*(client.post("http://agent/verify", files=files) for _ in range(agents)))
+    return router_bytes
+
+
+async def single_buffer(client, upload, agents: int):
+    image_bytes = upload.read()
+    body = MultipartBody("image", "a.jpg", image_bytes, "image/jpeg")
+    await asyncio.gather(*(
+        client.post("http://agent/verify", content=body.stream(), headers=body.headers)
+        for _ in range(agents)
+    ))
+    return image_bytes
+
+
+async def measure(fn, payload: bytes, agents: int) -> int:
+    # Starlette spools uploads above 1 MB to disk, so every read is a fresh copy
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as upload:
+        upload.write(payload)
+        upload.seek(0)
+        async with httpx.AsyncClient(transport=SocketLikeTransport()) as client:
+            tracemalloc.start()
+            await fn(client, upload, agents)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return peak
+
+
+async def main(size_mb: float, agents: int):
+    payload = b"\xff\xd8\xff" + bytes(int(size_mb * 1024 * 1024))
+    mb = 1024 * 1024
+    print(f"image={size_mb} MB agents={agents}")
+    for name, fn in (("legacy", legacy), ("single_buffer", single_buffer)):
+        peak = await measure(fn, payload, agents)
+        print(f"{name:>14}: peak {peak / mb:8.2f} MB  ({peak / len(payload):5.2f} x image)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=float, default=5.0)
+    parser.add_argument("--agents", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb, args.agents))
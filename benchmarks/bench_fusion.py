@@ -0,0 +1,64 @@
+"""
+Fusion cost per request at growing agent counts.
+
+Full sort: the previous process_results (sort every score, slice the top 5).
+Heap: the current process_results (heapq.nlargest top-k, per-agent thresholds).
+
+Run: python -m benchmarks.bench_fusion --requests 200
+"""
+import argparse
+import random
+import time
+
+from app.service.fusion_service import FusionService
+
+
+def results_for(agents: int, rng: random.Random):
+    return [
+        {"agent_name": f"agent-{i}", "score": rng.random(), "threshold": rng.choice([0.7, 0.75, 0.8]), "latency_ms": 10.0}
+        for i in range(agents)
+    ]
+
+
+def full_sort(service: FusionService, results):
+    valid_results = [r for r in results if r.get("score", 0.0) > 0]
+    sorted_results = sorted(valid_results, key=lambda x: x.get("score", 0.0), reverse=True)
+    candidates = [{"name": r.get("agent_name"), "score": r.get("score")} for r in sorted_results[:5]]
+    if not sorted_results:
+        return {"decision": "unknown", "identity": {"name": None, "score": 0.0}, "candidates": []}
+    top = sorted_results[0]
+    runner_up = sorted_results[1].get("score", 0.0) if len(sorted_results) > 1 else 0.0
+    if top["score"] < service.threshold:
+        decision = "unknown"
+    elif top["score"] - runner_up > service.margin:
+        decision = "identified"
+    else:
+        decision = "ambiguous"
+    return {"decision": decision, "identity": {"name": top.get("agent_name"), "score": top["score"]}, "candidates": candidates}
+
+
+def per_request_us(fn, batch) -> float:
+    start = time.perf_counter()
+    fn(batch)
+    return (time.perf_counter() - start) / len(batch) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 1_000, 10_000])
+    args = parser.parse_args()
+
+    service = FusionService()
+    rng = random.Random(42)
+    print(f"requests={args.requests}")
+    print(f"{'agents':>8} {'full sort':>12} {'heap':>12}")
+    for agents in args.agents:
+        batch = [results_for(agents, rng) for _ in range(args.requests)]
+        legacy = per_request_us(lambda b: [full_sort(service, r) for r in b], batch)
+        heap = per_request_us(lambda b: [service.process_results(r) for r in b], batch)
+        print(f"{agents:>8} {legacy:>9.1f} us {heap:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+JSON cost per /identify-and-answer request: stdlib path vs. fast path.
+
+Parsing: every PP2 agent response (and the PP1 answer) decoded with
+httpx's response.json() (bytes -> str -> json.loads) vs. orjson on the raw bytes.
+Response: IdentifyResponse validated, then dumped, re-validated against the
+response_model, run through jsonable_encoder and json.dumps (what FastAPI does
+for a returned model) vs. model_construct + one pydantic-core model_dump_json.
+
+Run: python -m benchmarks.bench_json_serialization --agents 20 --requests 2000
+"""
+import argparse
+import json
+import time
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.model.api_models import IdentifyResponse, NormativaAnswer
+from app.model.common import DecisionEnum, Identity
+from app.utils import fast_json
+
+
+def agent_body(i: int) -> bytes:
+    payload = {
+        "status": "ok",
+        "data": {"score": 0.5 + i / 100, "model": "facenet-v2", "embedding_distance": 0.4213, "face_box": [12, 40, 180, 220]},
+        "meta": {"agent": f"agent-{i}", "elapsed_ms": 123.4, "version": "1.4.2"},
+    }
+    return json.dumps(payload).encode()
+
+
+def pp1_body() -> bytes:
+    return json.dumps({"response": "Según el reglamento, artículo 12... " * 40, "citations": [{"doc": "reglamento.pdf", "page": str(p)} for p in range(5)]}).encode()
+
+
+FUSION = {
+    "decision": "identified",
+    "identity": {"name": "agent-19", "score": 0.69},
+    "candidates": [{"name": f"agent-{i}", "score": 0.69 - i / 100} for i in range(5)],
+}
+
+
+def legacy_request(responses, pp1_response) -> bytes:
+    scores = [r.json().get("data", {}).get("score", 0.0) for r in responses]
+    answer = pp1_response.json()
+    model = IdentifyResponse(
+        decision=DecisionEnum(FUSION["decision"]),
+        identity=Identity(**FUSION["identity"]),
+        candidates=[Identity(**c) for c in FUSION["candidates"]],
+        normativa_answer=NormativaAnswer(text=answer["response"]),
+        timing_ms=123.4,
+        request_id="00000000-0000-0000-0000-000000000000",
+    )
+    # FastAPI: dump, validate against response_model, encode, json.dumps
+    validated = IdentifyResponse.model_validate(model.model_dump())
+    body = JSONResponse(jsonable_encoder(validated)).body
+    return body if scores else b""
+
+
+def fast_request(responses, pp1_response) -> bytes:
+    scores = [fast_json.loads(r.content).get("data", {}).get("score", 0.0) for r in responses]
+    answer = fast_json.loads(pp1_response.content)
+    model = IdentifyResponse.model_construct(
+        decision=DecisionEnum(FUSION["decision"]),
+        identity=Identity.model_construct(**FUSION["identity"]),
+        candidates=[Identity.model_construct(**c) for c in FUSION["candidates"]],
+        normativa_answer=NormativaAnswer.model_construct(text=answer["response"]),
+        timing_ms=123.4,
+        request_id="00000000-0000-0000-0000-000000000000",
+    )
+    body = fast_json.model_response(model).body
+    return body if scores else b""
+
+
+def per_request_us(fn, agents: int, requests: int) -> float:
+    responses = [httpx.Response(200, content=agent_body(i)) for i in range(agents)]
+    pp1_response = httpx.Response(200, content=pp1_body())
+    for _ in range(50):
+        fn(responses, pp1_response)
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn(responses, pp1_response)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    fast_json.ENABLED = True
+    if not fast_json.ORJSON_AVAILABLE:
+        print("orjson not installed: fast path parses with stdlib json")
+
+    responses = [httpx.Response(200, content=agent_body(i)) for i in range(args.agents)]
+    pp1_response = httpx.Response(200, content=pp1_body())
+    assert json.loads(legacy_request(responses, pp1_response)) == json.loads(fast_request(responses, pp1_response))
+
+    legacy = per_request_us(legacy_request, args.agents, args.requests)
+    fast = per_request_us(fast_request, args.agents, args.requests)
+    print(f"agents={args.agents} requests={args.requests}")
+    print(f"stdlib path: {legacy:8.1f} us/request")
+    print(f"fast path:   {fast:8.1f} us/request  ({legacy / fast:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
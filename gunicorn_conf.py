@@ -1,11 +1,14 @@
 import multiprocessing
 import os
+import shutil
 
 host = os.getenv("HOST", "0.0.0.0")
 port = os.getenv("PORT", "33201")
 bind = f"{host}:{port}"
 
 workers = multiprocessing.cpu_count() * 2 + 1
+# Per-agent max_in_flight limits are split across the workers
+os.environ.setdefault("PP2_BULKHEAD_WORKERS", str(workers))
 worker_class = "uvicorn.workers.UvicornWorker"
 
 tmeout = 120
@@ -14,3 +17,21 @@ keepalive = 5
 loglevel = "info"
 accesslog = "-" 
 errorlog = "-"
+
+# Prometheus: workers write metric files here so /metrics/prom aggregates all of them.
+# Must be set before the app (and prometheus_client) is imported in the workers.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/orchestrator_prometheus")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -13,6 +13,9 @@ def mock_mongo():
     mock_db = MagicMock()
     mock_db.access_logs.insert_one = AsyncMock()
     mock_db.service_logs.insert_one = AsyncMock()
+    mock_db.access_logs.insert_many = AsyncMock()
+    mock_db.service_logs.insert_many = AsyncMock()
+    mock_db.metrics_rollups.bulk_write = AsyncMock()
     mock_db.config.find = MagicMock(return_value=AsyncMock())
     
     # Patch the singleton
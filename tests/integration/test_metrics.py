@@ -2,6 +2,8 @@ import pytest
 import uuid
 from datetime import datetime
 from app.db.mongo import MongoDB
+from app.db.rollups import MetricsRollup
+from app.service.metrics_service import dashboard_cache
 
 @pytest.mark.asyncio
 async def test_metrics_endpoints_real_db(async_client_with_real_db):
@@ -15,7 +17,7 @@ async def test_metrics_endpoints_real_db(async_client_with_real_db):
     test_route = f"/test-metrics-{test_run_id}"
     test_service_name = f"TestService-{test_run_id}"
     
-    # 1. SETUP ACCESS LOGS (for summary, by-user-type, decisions)
+    # 1. SETUP ACCESS LOG ROWS (for summary, by-user-type, decisions)
     access_logs = [
         {
             "ts": datetime.utcnow(),
@@ -42,9 +44,11 @@ async def test_metrics_endpoints_real_db(async_client_with_real_db):
             "user": {"type": "faculty"}
         }
     ]
-    await db.access_logs.insert_many(access_logs)
+    # Metrics are served from rollups, which every logged row feeds
+    for doc in access_logs:
+        MetricsRollup.record("access_logs", doc)
 
-    # 2. SETUP SERVICE LOGS (for services metrics)
+    # 2. SETUP SERVICE LOG ROWS (for services metrics)
     service_logs = [
         {
             "ts": datetime.utcnow(),
@@ -61,7 +65,10 @@ async def test_metrics_endpoints_real_db(async_client_with_real_db):
             "timeout": True
         }
     ]
-    await db.service_logs.insert_many(service_logs)
+    for doc in service_logs:
+        MetricsRollup.record("service_logs", doc)
+    await MetricsRollup.flush()
+    dashboard_cache.clear()
 
     try:
         # --- TEST 1: SUMMARY ---
@@ -110,5 +117,5 @@ async def test_metrics_endpoints_real_db(async_client_with_real_db):
 
     finally:
         # --- CLEANUP ---
-        await db.access_logs.delete_many({"route": test_route})
-        await db.service_logs.delete_many({"service_name": test_service_name})
+        await db.metrics_rollups.delete_many({"route": test_route})
+        await db.metrics_rollups.delete_many({"service_name": test_service_name})
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.service.admission_controller import AdmissionController
+
+
+async def hold(controller, user_type, order, release_event):
+    async with controller.admit(user_type):
+        order.append(user_type)
+        await release_event.wait()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_served_by_priority():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, queue_target_ms=5000, priorities=["staff", "student"])
+    order, gate = [], asyncio.Event()
+
+    first = asyncio.create_task(hold(controller, "student", order, gate))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(hold(controller, t, order, gate)) for t in (None, "student", "staff")]
+    await asyncio.sleep(0)
+    assert controller.stats()["queue_depth"] == 3
+
+    gate.set()
+    await asyncio.gather(first, *waiters)
+    assert order == ["student", "staff", "student", None]
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_lowest_priority_with_retry_after():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_target_ms=5000, priorities=["staff", "student"])
+    order, gate = [], asyncio.Event()
+
+    running = asyncio.create_task(hold(controller, "student", order, gate))
+    await asyncio.sleep(0)
+    anonymous = asyncio.create_task(hold(controller, None, order, gate))
+    await asyncio.sleep(0)
+
+    # Queue full: a staff request displaces the anonymous one, another anonymous is rejected
+    staff = asyncio.create_task(hold(controller, "staff", order, gate))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as rejected:
+        await controller.acquire(None)
+    assert rejected.value.status_code == 503
+    assert int(rejected.value.headers["Retry-After"]) >= 1
+
+    with pytest.raises(HTTPException):
+        await anonymous
+
+    gate.set()
+    await asyncio.gather(running, staff)
+    assert order == ["student", "staff"]
+    assert controller.shed["preempted"] == 1 and controller.shed["queue_full"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sheds_on_queue_wait_target():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, queue_target_ms=20, priorities=[])
+    gate = asyncio.Event()
+    running = asyncio.create_task(hold(controller, None, [], gate))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as shed:
+        await controller.acquire(None)
+    assert shed.value.status_code == 503
+    assert controller.shed["wait_timeout"] == 1
+
+    # With a known service time above the target, the next request is shed without waiting
+    controller._service_ms = 1000.0
+    with pytest.raises(HTTPException):
+        await controller.acquire(None)
+    assert controller.shed["wait_estimate"] == 1
+
+    gate.set()
+    await running
+    assert controller.in_flight == 0
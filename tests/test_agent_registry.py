@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+import app.service.agent_registry as agent_registry
+from app.service.agent_registry import AgentRegistry
+from app.db.mongo import MongoDB
+
+AGENT = {"_id": "x", "name": "Ana", "endpoint_verify": "http://ana/verify", "threshold": 0.8, "active": True}
+
+
+@pytest.fixture
+def config_db():
+    db = MagicMock()
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[AGENT])
+    db.config.find = MagicMock(return_value=cursor)
+    MongoDB.db = db
+    yield db
+    MongoDB.db = None
+
+
+@pytest.mark.asyncio
+async def test_loads_once_and_serves_typed_agents(config_db):
+    await AgentRegistry.close()
+    first, second = await asyncio.gather(AgentRegistry.get_agents(), AgentRegistry.get_agents())
+
+    assert first[0].name == "Ana"
+    assert first[0].threshold == 0.8
+    assert second == first
+    assert config_db.config.find.call_count == 1
+    await AgentRegistry.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_last_snapshot(config_db, monkeypatch):
+    await AgentRegistry.close()
+    snapshot = await AgentRegistry.get_snapshot()
+
+    config_db.config.find.side_effect = Exception("mongo down")
+    monkeypatch.setattr(agent_registry, "REFRESH_TTL", 0.0)
+    stale = await AgentRegistry.get_snapshot()
+    await AgentRegistry.refresh_task
+
+    assert stale.version == snapshot.version
+    assert [a.name for a in await AgentRegistry.get_agents()] == ["Ana"]
+    await AgentRegistry.close()
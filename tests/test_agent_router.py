@@ -0,0 +1,117 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.model.db_models import AgentConfig
+from app.service import orchestrator_service
+from app.service.agent_registry import AgentRegistry, AgentSnapshot
+from app.service.agent_router import AgentRouter
+from app.service.orchestrator_service import OrchestratorService
+from app.service.pp2_service import PP2Service
+
+
+def make_agents(*names):
+    return [AgentConfig(name=n, endpoint_verify=f"http://{n}/verify", threshold=0.75, active=True) for n in names]
+
+
+def test_rank_prefers_image_then_user_then_user_type():
+    router = AgentRouter(enabled=True, top_k=1)
+    router.record({"id": "u1", "type": "student"}, "hash-a", "ana")
+    router.record({"id": "u2", "type": "student"}, None, "luis")
+    router.record({"id": "u3", "type": "staff"}, None, "pedro")
+    agents = make_agents("pedro", "luis", "ana", "maria")
+
+    by_image = [a.name for a, _ in router.rank(agents, {"id": "u2", "type": "staff"}, "hash-a")]
+    by_user = [a.name for a, _ in router.rank(agents, {"id": "u2", "type": "staff"}, None)]
+    by_type = [a.name for a, _ in router.rank(agents, {"id": "new", "type": "staff"}, None)]
+
+    assert by_image[:2] == ["ana", "luis"]
+    assert by_user[:2] == ["luis", "pedro"]
+    assert by_type[0] == "pedro"
+    assert by_type[-1] == "maria"
+
+
+def test_plan_without_history_is_full_fanout():
+    router = AgentRouter(enabled=True, top_k=2)
+    plan = router.plan(make_agents("a", "b", "c"), {"id": "u1"}, None)
+
+    assert [a.name for a in plan.first] == ["a", "b", "c"]
+    assert not plan.cascaded
+    assert router.stats()["full_fanout"] == 1
+
+
+@pytest.mark.asyncio
+async def test_warm_start_replays_access_logs(mock_mongo):
+    cursor = mock_mongo.access_logs.find.return_value.sort.return_value.limit.return_value
+    cursor.to_list = AsyncMock(return_value=[
+        {"user": {"id": "u1", "type": "student"}, "input_metadata": {"image_hash": "h1"}, "identity": {"name": "ana"}},
+    ])
+    router = AgentRouter(enabled=True, top_k=1)
+    await router.warm_start()
+
+    assert router.by_image["h1"] == "ana"
+    assert list(router.by_user["u1"]) == ["ana"]
+
+
+async def run_identify(monkeypatch, scores, router):
+    monkeypatch.setattr(orchestrator_service, "agent_router", router)
+    monkeypatch.setattr(orchestrator_service, "IDENTIFY_CACHE_ENABLED", False)
+    called = []
+
+    async def fake_call(self, agent, request_id, body):
+        called.append(agent.name)
+        return {"agent_name": agent.name, "score": scores.get(agent.name, 0.1), "threshold": agent.threshold}
+
+    snapshot = AgentSnapshot(version="v1", agents=tuple(make_agents("ana", "luis", "pedro", "maria")), loaded_at=0.0)
+    with patch.object(AgentRegistry, "get_snapshot", AsyncMock(return_value=snapshot)), \
+         patch.object(PP2Service, "_call_agent", fake_call):
+        result, summary = await OrchestratorService()._identify("req-1", b"img", "a.png", "image/png", "hash-1", user_context={"id": "u1", "type": "student"})
+    return result, summary, called
+
+
+@pytest.mark.asyncio
+async def test_cascade_stops_after_first_stage_identifies(monkeypatch):
+    router = AgentRouter(enabled=True, top_k=1, audit_rate=0.0)
+    router.record({"id": "u1", "type": "student"}, None, "ana")
+
+    result, summary, called = await run_identify(monkeypatch, {"ana": 0.95}, router)
+
+    assert called == ["ana"]
+    assert result["identity"]["name"] == "ana"
+    assert summary["routing"] == {"first_stage": 1, "not_queried": 3, "escalation": None, "audit": False}
+    assert router.stats()["calls_saved"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_when_first_stage_is_unknown(monkeypatch):
+    router = AgentRouter(enabled=True, top_k=1, audit_rate=0.0)
+    router.record({"id": "u1", "type": "student"}, None, "ana")
+
+    result, summary, called = await run_identify(monkeypatch, {"pedro": 0.95}, router)
+
+    assert sorted(called) == ["ana", "luis", "maria", "pedro"]
+    assert result["identity"]["name"] == "pedro"
+    assert summary["routing"]["escalation"] == "unknown"
+    assert router.stats()["escalated_unknown"] == 1
+    # The new match is remembered for the next request from this user
+    assert router.rank(make_agents("ana", "pedro"), {"id": "u1"}, "hash-1")[0][0].name == "pedro"
+
+
+@pytest.mark.asyncio
+async def test_audit_queries_everyone_and_records_agreement(monkeypatch):
+    router = AgentRouter(enabled=True, top_k=1, audit_rate=1.0)
+    router.record({"id": "u1", "type": "student"}, None, "ana")
+
+    _, summary, called = await run_identify(monkeypatch, {"ana": 0.95}, router)
+
+    assert len(called) == 4
+    assert summary["routing"]["audit"] is True
+    assert router.stats()["audit_agreed"] == 1
+    assert router.stats()["calls_saved"] == 0
+
+
+def test_unknown_user_types_share_one_bucket():
+    router = AgentRouter(enabled=True, top_k=1)
+    for i in range(100):
+        router.record({"type": f"spoofed-{i}"}, None, "ana")
+
+    assert list(router.by_user_type) == ["other"]
+    assert router.rank(make_agents("luis", "ana"), {"type": "another"}, None)[0][0].name == "ana"
@@ -46,3 +46,385 @@ def test_identify_invalid_mime(client_with_mock_db, valid_image_bytes):
     )
     
     assert response.status_code == 415
+
+@patch("app.service.pp2_service.PP2Service.verify_parallel")
+def test_identify_repeat_image_served_from_cache(mock_verify, client_with_mock_db, valid_image_bytes):
+    from app.service.orchestrator_service import identify_cache
+    identify_cache.clear()
+    os.environ["API_TOKEN"] = "test-token"
+    mock_verify.return_value = [{"agent_name": "Ana", "score": 0.95}]
+
+    files = {"image": ("test.png", valid_image_bytes, "image/png")}
+    headers = {"Authorization": "Bearer test-token"}
+
+    first = client_with_mock_db.post("/identify-and-answer", files=files, headers=headers)
+    second = client_with_mock_db.post("/identify-and-answer", files=files, headers=headers)
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert second.json()["identity"]["name"] == "Ana"
+    assert mock_verify.call_count == 1
+
+def test_speculative_pp1_is_discarded_when_not_identified(client_with_mock_db, valid_image_bytes, monkeypatch):
+    import asyncio
+    from app.service.orchestrator_service import identify_cache, speculation_policy
+    identify_cache.clear()
+    monkeypatch.setattr(speculation_policy, "mode", "always")
+    os.environ["API_TOKEN"] = "test-token"
+    answered = []
+
+    async def slow_answer(self, request_id, question):
+        await asyncio.sleep(5)
+        answered.append(request_id)
+        return {"text": "120 créditos"}
+
+    with patch("app.service.pp2_service.PP2Service.verify_parallel", new=AsyncMock(return_value=[{"agent_name": "Ana", "score": 0.2}])), \
+         patch("app.service.pp1_service.PP1Service.ask_normativa", new=slow_answer):
+        wasted_before = speculation_policy.wasted
+        response = client_with_mock_db.post(
+            "/identify-and-answer",
+            files={"image": ("test.png", valid_image_bytes, "image/png")},
+            data={"question": "¿Cuántos créditos necesito?"},
+            headers={"Authorization": "Bearer test-token"},
+        )
+
+    assert response.status_code == 200
+    assert response.json()["decision"] == "unknown"
+    assert speculation_policy.wasted == wasted_before + 1
+    assert answered == []
+
+@patch("app.service.pp2_service.PP2Service.verify_parallel")
+def test_prometheus_endpoint_exposes_request_latency(mock_verify, client_with_mock_db, valid_image_bytes):
+    from app.service.orchestrator_service import identify_cache
+    identify_cache.clear()
+    os.environ["API_TOKEN"] = "test-token"
+    mock_verify.return_value = [{"agent_name": "Ana", "score": 0.95}]
+
+    files = {"image": ("test.png", valid_image_bytes, "image/png")}
+    client_with_mock_db.post("/identify-and-answer", files=files, headers={"Authorization": "Bearer test-token"})
+    client_with_mock_db.post("/identify-and-answer/batch", files=[("images", files["image"])], headers={"Authorization": "Bearer test-token"})
+
+    response = client_with_mock_db.get("/metrics/prom")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'orchestrator_request_latency_seconds_count{decision="identified",route="/identify-and-answer"}' in response.text
+    assert 'orchestrator_request_latency_seconds_count{decision="completed",route="/identify-and-answer/batch"}' in response.text
+    assert 'orchestrator_cache_lookups_total{cache="identify",result="miss"}' in response.text
+
+@patch("app.service.pp2_service.PP2Service.verify_parallel")
+def test_identify_batch_keeps_input_order(mock_verify, client_with_mock_db, valid_image_bytes):
+    from app.service.orchestrator_service import identify_cache
+    identify_cache.clear()
+    os.environ["API_TOKEN"] = "test-token"
+    mock_verify.return_value = [{"agent_name": "Ana", "score": 0.95}]
+
+    files = [
+        ("images", ("a.png", valid_image_bytes, "image/png")),
+        ("images", ("b.txt", valid_image_bytes, "text/plain")),
+        ("images", ("c.png", valid_image_bytes + b"\x00", "image/png")),
+    ]
+    response = client_with_mock_db.post(
+        "/identify-and-answer/batch",
+        files=files,
+        headers={"Authorization": "Bearer test-token"}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["result"]["decision"] == "identified"
+    assert results[1]["error"]["status_code"] == 415
+    assert results[2]["result"]["decision"] == "identified"
+    # Every fan-out of the batch shares one concurrency limiter
+    limiters = {id(call.kwargs["limiter"]) for call in mock_verify.call_args_list}
+    assert mock_verify.call_count == 2 and len(limiters) == 1
+
+@patch("app.service.pp2_service.PP2Service.verify_parallel")
+def test_identify_batch_ndjson(mock_verify, client_with_mock_db, valid_image_bytes):
+    import base64
+    import json
+    os.environ["API_TOKEN"] = "test-token"
+    mock_verify.return_value = [{"agent_name": "Ana", "score": 0.95}]
+
+    lines = [
+        json.dumps({"image_b64": base64.b64encode(valid_image_bytes).decode(), "filename": "a.png", "content_type": "image/png"}),
+        "not json",
+    ]
+    response = client_with_mock_db.post(
+        "/identify-and-answer/batch",
+        content="\n".join(lines),
+        headers={"Authorization": "Bearer test-token", "Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["result"]["identity"]["name"] == "Ana"
+    assert results[1]["error"]["status_code"] == 400
+
+@patch("app.service.pp2_service.PP2Service.verify_parallel")
+def test_fast_json_response_matches_validated_response(mock_verify, client_with_mock_db, valid_image_bytes, monkeypatch):
+    from app.service.orchestrator_service import identify_cache
+    from app.utils import fast_json
+    os.environ["API_TOKEN"] = "test-token"
+    mock_verify.return_value = [{"agent_name": "Ana", "score": 0.95}, {"agent_name": "Beto", "score": 0.4}]
+    files = {"image": ("test.png", valid_image_bytes, "image/png")}
+    headers = {"Authorization": "Bearer test-token"}
+
+    identify_cache.clear()
+    standard = client_with_mock_db.post("/identify-and-answer", files=files, headers=headers).json()
+    monkeypatch.setattr(fast_json, "ENABLED", True)
+    identify_cache.clear()
+    fast = client_with_mock_db.post("/identify-and-answer", files=files, headers=headers)
+
+    assert fast.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    data = fast.json()
+    for key in ("decision", "identity", "candidates", "normativa_answer"):
+        assert data[key] == standard[key]
+
+def test_identify_rejects_content_that_is_not_an_image(client_with_mock_db):
+    os.environ["API_TOKEN"] = "test-token"
+
+    # Declared as PNG, but the bytes are not
+    files = {"image": ("test.png", b"#!/bin/sh\necho not an image\n", "image/png")}
+    response = client_with_mock_db.post("/identify-and-answer", files=files, headers={"Authorization": "Bearer test-token"})
+
+    assert response.status_code == 415
+
+def test_identify_rejects_oversized_upload_while_streaming(client_with_mock_db, valid_image_bytes, monkeypatch):
+    from app.service.validation_service import ValidationService
+    os.environ["API_TOKEN"] = "test-token"
+    monkeypatch.setattr(ValidationService, "MAX_FILE_SIZE_BYTES", 1024)
+
+    files = {"image": ("big.png", valid_image_bytes + b"\x00" * 4096, "image/png")}
+    response = client_with_mock_db.post("/identify-and-answer", files=files, headers={"Authorization": "Bearer test-token"})
+
+    assert response.status_code == 413
+
+def test_identify_malformed_multipart_is_400(client_with_mock_db):
+    os.environ["API_TOKEN"] = "test-token"
+    headers = {"Authorization": "Bearer test-token", "Content-Type": "multipart/form-data; boundary=abc"}
+
+    bad_boundary = client_with_mock_db.post("/identify-and-answer", content=b"--abcX\r\n", headers=headers)
+    huge_header = client_with_mock_db.post("/identify-and-answer", content=b"--abc\r\nX-Pad: " + b"x" * 20000 + b"\r\n", headers=headers)
+
+    assert bad_boundary.status_code == 400
+    assert huge_header.status_code == 400
+
+def test_identify_caps_fields_and_undeclared_body_length(client_with_mock_db, monkeypatch):
+    from app.service.validation_service import ValidationService
+    os.environ["API_TOKEN"] = "test-token"
+    headers = {"Authorization": "Bearer test-token", "Content-Type": "multipart/form-data; boundary=abc"}
+
+    def part(name, value):
+        return b'--abc\r\nContent-Disposition: form-data; name="' + name + b'"\r\n\r\n' + value + b"\r\n"
+
+    many_fields = b"".join(part(b"f%d" % i, b"x") for i in range(20)) + b"--abc--\r\n"
+    response = client_with_mock_db.post("/identify-and-answer", content=many_fields, headers=headers)
+    assert response.status_code == 413
+
+    # Chunked (no Content-Length): cut off once it passes the size limit
+    monkeypatch.setattr(ValidationService, "MAX_FILE_SIZE_BYTES", 1024)
+    chunks = (part(b"f%d" % i, b"x" * 60_000) for i in range(5))
+    response = client_with_mock_db.post("/identify-and-answer", content=chunks, headers=headers)
+    assert response.status_code == 413
+
+def test_identify_sheds_before_reading_the_upload(client_with_mock_db, valid_image_bytes, monkeypatch):
+    from app.router import orchestrator_router
+    from app.service.admission_controller import AdmissionController
+    os.environ["API_TOKEN"] = "test-token"
+    # Saturated, with a known service time far above the queue target
+    controller = AdmissionController(max_in_flight=1, max_queue=10, queue_target_ms=100, enabled=True)
+    controller.in_flight = 1
+    controller._service_ms = 10_000.0
+    monkeypatch.setattr(orchestrator_router, "admission_controller", controller)
+
+    files = {"image": ("test.png", valid_image_bytes, "image/png")}
+    with patch("app.router.orchestrator_router.ingest_image_upload") as ingest:
+        single = client_with_mock_db.post("/identify-and-answer", files=files, headers={"Authorization": "Bearer test-token"})
+        stream = client_with_mock_db.post("/identify-and-answer/stream", files=files, headers={"Authorization": "Bearer test-token"})
+
+    assert single.status_code == 503 and stream.status_code == 503
+    ingest.assert_not_called()
+    assert controller.in_flight == 1
+
+def test_identify_hashes_upload_during_ingest(client_with_mock_db, valid_image_bytes):
+    from app.utils.security import hash_data
+    os.environ["API_TOKEN"] = "test-token"
+
+    from app.model.api_models import IdentifyResponse
+    unknown = IdentifyResponse(decision="unknown", identity={"name": None, "score": 0.0}, candidates=[], timing_ms=1.0, request_id="r1")
+
+    with patch("app.service.orchestrator_service.OrchestratorService.handle_identify_request", return_value=unknown) as handle:
+        response = client_with_mock_db.post(
+            "/identify-and-answer",
+            files={"image": ("test.png", valid_image_bytes, "image/png")},
+            data={"question": "¿Horario?"},
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+    assert response.status_code == 200
+    kwargs = handle.call_args.kwargs
+    assert kwargs["image_hash"] == hash_data(valid_image_bytes)
+    assert kwargs["image_bytes"] == valid_image_bytes
+    assert kwargs["image"].content_type == "image/png"
+    assert kwargs["question"] == "¿Horario?"
+
+def test_identify_stream_emits_agent_decision_answer_result(client_with_mock_db, valid_image_bytes):
+    import json
+    from app.service.orchestrator_service import identify_cache
+    identify_cache.clear()
+    os.environ["API_TOKEN"] = "test-token"
+    results = [{"agent_name": "Ana", "score": 0.95, "latency_ms": 12.0}, {"agent_name": "Luis", "score": 0.1, "latency_ms": 30.0}]
+
+    async def settled(self, request_id, image_bytes, filename, content_type, is_settled, agents=None, limiter=None, on_result=None):
+        for result in results:
+            on_result(result)
+        return results
+
+    async def stream(self, request_id, question, use_rag=True, top_k=5):
+        yield {"delta": "Se requieren "}
+        yield {"delta": "240 créditos"}
+        yield {"answer": {"text": "Se requieren 240 créditos", "citations": []}}
+
+    with patch("app.service.pp2_service.PP2Service.verify_until_settled", new=settled), \
+         patch("app.service.pp1_service.PP1Service.stream_normativa", new=stream):
+        response = client_with_mock_db.post(
+            "/identify-and-answer/stream",
+            files={"image": ("test.png", valid_image_bytes, "image/png")},
+            data={"question": "¿Cuántos créditos necesito?"},
+            headers={"Authorization": "Bearer test-token"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["event"] for e in events] == ["agent", "agent", "decision", "answer", "answer", "result"]
+    assert events[0] == {"event": "agent", "agent_name": "Ana", "score": 0.95, "latency_ms": 12.0}
+    assert events[2]["decision"] == "identified"
+    assert events[-1]["identity"]["name"] == "Ana"
+    assert events[-1]["normativa_answer"]["text"] == "Se requieren 240 créditos"
+    assert set(events[-1]) - {"event"} == {"decision", "identity", "candidates", "normativa_answer", "timing_ms", "request_id"}
+
+def test_identify_stream_sse_reports_errors_in_band(client_with_mock_db, valid_image_bytes):
+    from app.service.orchestrator_service import identify_cache
+    identify_cache.clear()
+    os.environ["API_TOKEN"] = "test-token"
+    failures = [{"agent_name": "Ana", "score": 0.0, "error": "Timeout"}, {"agent_name": "Luis", "score": 0.0, "error": "500"}]
+
+    with patch("app.service.pp2_service.PP2Service.verify_until_settled", new=AsyncMock(return_value=failures)):
+        response = client_with_mock_db.post(
+            "/identify-and-answer/stream",
+            files={"image": ("test.png", valid_image_bytes, "image/png")},
+            headers={"Authorization": "Bearer test-token", "Accept": "text/event-stream"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("event: error\ndata: ")
+    assert '"status_code":504' in response.text
+
+def test_stream_releases_admission_when_body_never_starts():
+    import asyncio
+    from contextlib import AsyncExitStack, asynccontextmanager
+    from app.router.orchestrator_router import AdmittedStreamingResponse
+    released = []
+    started = []
+
+    @asynccontextmanager
+    async def slot():
+        try:
+            yield
+        finally:
+            released.append(True)
+
+    async def body():
+        started.append(True)
+        yield b"{}\n"
+
+    async def send(message):
+        # Client already gone: the response start cannot be sent
+        raise OSError("connection reset")
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def run():
+        admission = AsyncExitStack()
+        await admission.enter_async_context(slot())
+        response = AdmittedStreamingResponse(body(), admission, media_type="application/x-ndjson")
+        try:
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        except BaseException:
+            # OSError, possibly wrapped in an exception group by the task group
+            pass
+
+    asyncio.run(run())
+    assert started == []
+    assert released == [True]
+
+def test_identify_batch_too_many_files_is_413(client_with_mock_db, valid_image_bytes):
+    from app.service.orchestrator_service import BATCH_MAX_IMAGES
+    os.environ["API_TOKEN"] = "test-token"
+    files = [("images", (f"{i}.png", valid_image_bytes, "image/png")) for i in range(BATCH_MAX_IMAGES + 1)]
+
+    response = client_with_mock_db.post("/identify-and-answer/batch", files=files, headers={"Authorization": "Bearer test-token"})
+
+    assert response.status_code == 413
+    assert "Too many files" in response.json()["detail"]
+
+def test_identify_batch_rejects_declared_length_before_reading(client_with_mock_db, valid_image_bytes, monkeypatch):
+    from app.router import orchestrator_router
+    os.environ["API_TOKEN"] = "test-token"
+    monkeypatch.setattr(orchestrator_router, "BATCH_MAX_BODY_BYTES", 100)
+
+    response = client_with_mock_db.post(
+        "/identify-and-answer/batch",
+        files=[("images", ("a.png", valid_image_bytes * 10, "image/png"))],
+        headers={"Authorization": "Bearer test-token"},
+    )
+
+    assert response.status_code == 413
+
+def test_identify_batch_ndjson_refuses_oversized_line(client_with_mock_db, monkeypatch):
+    from app.router import orchestrator_router
+    os.environ["API_TOKEN"] = "test-token"
+    monkeypatch.setattr(orchestrator_router, "NDJSON_MAX_LINE_BYTES", 1024)
+
+    response = client_with_mock_db.post(
+        "/identify-and-answer/batch",
+        content=b'{"image_b64": "' + b"A" * 4096 + b'"}\n',
+        headers={"Authorization": "Bearer test-token", "Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 413
+    assert "too large" in response.json()["detail"]
+
+def test_identify_batch_admits_each_image(client_with_mock_db, valid_image_bytes, monkeypatch):
+    import asyncio
+    from app.router import orchestrator_router
+    from app.service.admission_controller import AdmissionController
+    from app.service.orchestrator_service import identify_cache
+    identify_cache.clear()
+    os.environ["API_TOKEN"] = "test-token"
+    controller = AdmissionController(max_in_flight=1, max_queue=10, queue_target_ms=5000, enabled=True)
+    monkeypatch.setattr(orchestrator_router, "admission_controller", controller)
+    concurrent = []
+
+    async def verify(*args, **kwargs):
+        concurrent.append(controller.in_flight)
+        await asyncio.sleep(0.01)
+        return [{"agent_name": "Ana", "score": 0.95}]
+
+    with patch("app.service.pp2_service.PP2Service.verify_parallel", new=verify):
+        response = client_with_mock_db.post(
+            "/identify-and-answer/batch",
+            files=[("images", (f"{i}.png", valid_image_bytes + bytes([i]), "image/png")) for i in range(3)],
+            headers={"Authorization": "Bearer test-token"},
+        )
+
+    assert response.status_code == 200
+    assert all(r["result"]["decision"] == "identified" for r in response.json()["results"])
+    # One slot per image: with a cap of 1 the images ran one after another
+    assert concurrent == [1, 1, 1]
+    assert controller.admitted == 4  # the upload read, then each image
+    assert controller.in_flight == 0
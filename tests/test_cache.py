@@ -0,0 +1,39 @@
+from unittest.mock import patch
+from app.utils.cache import TTLCache
+
+
+def test_lru_eviction_by_entries():
+    cache = TTLCache("test-lru", max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")          # "b" becomes least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache("test-ttl", ttl_seconds=10)
+    with patch("app.utils.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.utils.cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["misses"] == 1
+
+
+def test_memory_bound():
+    cache = TTLCache("test-bytes", max_bytes=100, sizeof=lambda v: len(v))
+    cache.set("a", "x" * 60)
+    cache.set("b", "y" * 60)    # evicts "a"
+    cache.set("c", "z" * 500)   # larger than the whole cache, never stored
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 60
+    assert cache.get("c") is None
+    assert cache.stats()["bytes"] == 60
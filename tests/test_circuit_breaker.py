@@ -0,0 +1,43 @@
+from unittest.mock import patch
+from app.service.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN, CONSECUTIVE_FAILURES, OPEN_SECONDS
+
+
+def trip(breaker):
+    for _ in range(CONSECUTIVE_FAILURES):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures_and_skips_calls():
+    breaker = CircuitBreaker("dead-agent")
+    trip(breaker)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["skipped"] == 1
+
+
+def test_half_open_probe_recovers():
+    breaker = CircuitBreaker("flaky-agent")
+    with patch("app.service.circuit_breaker.time.monotonic", return_value=100.0):
+        trip(breaker)
+
+    with patch("app.service.circuit_breaker.time.monotonic", return_value=100.0 + OPEN_SECONDS + 1):
+        assert breaker.allow_request()      # single trial
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow_request()  # trial slot taken
+        breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("still-dead")
+    with patch("app.service.circuit_breaker.time.monotonic", return_value=100.0):
+        trip(breaker)
+    with patch("app.service.circuit_breaker.time.monotonic", return_value=100.0 + OPEN_SECONDS + 1):
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow_request()
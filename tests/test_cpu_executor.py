@@ -0,0 +1,35 @@
+import hashlib
+import threading
+import pytest
+import app.utils.cpu_executor as cpu_executor
+from app.utils.cpu_executor import CpuExecutor, cpu_executor_stats
+
+
+def digest_on_thread(data: bytes):
+    return hashlib.sha256(data).hexdigest(), threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_small_inputs_run_inline_and_large_ones_in_the_pool(monkeypatch):
+    monkeypatch.setattr(cpu_executor, "MIN_OFFLOAD_BYTES", 1024)
+    CpuExecutor.stats = {}
+
+    _, small_thread = await CpuExecutor.run("hash", digest_on_thread, b"x" * 10, size=10)
+    big = b"x" * 4096
+    digest, big_thread = await CpuExecutor.run("hash", digest_on_thread, big, size=len(big))
+    CpuExecutor.close()
+
+    assert small_thread == threading.current_thread().name
+    assert big_thread.startswith("cpu")
+    assert digest == hashlib.sha256(big).hexdigest()
+    stage = cpu_executor_stats()["stages"]["hash"]
+    assert stage["inline"] == 1 and stage["offloaded"] == 1
+    assert stage["stall_saved_ms"] >= 0.0
+
+
+@pytest.mark.asyncio
+async def test_offload_can_be_forced():
+    CpuExecutor.stats = {}
+    _, thread = await CpuExecutor.run("image_preprocess", digest_on_thread, b"x", size=1, offload=True)
+    CpuExecutor.close()
+    assert thread.startswith("cpu")
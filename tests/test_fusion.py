@@ -49,3 +49,57 @@ class TestFusionService:
         results = []
         decision = self.service.process_results(results)
         assert decision["decision"] == "unknown"
+
+    def test_settled_identified_when_late_scores_cannot_reach_margin(self):
+        self.service.score_ceiling = 0.5
+        results = [{"agent_name": "Ana", "score": 0.95}]
+        settled = self.service.settled_result(results, outstanding=3)
+
+        assert settled is not None
+        assert settled["decision"] == "identified"
+
+    def test_not_settled_while_late_score_could_change_decision(self):
+        # Default ceiling 1.0: an outstanding agent could still tie the winner
+        results = [{"agent_name": "Ana", "score": 0.95}]
+        assert self.service.settled_result(results, outstanding=1) is None
+        assert self.service.settled_result(results, outstanding=0)["decision"] == "identified"
+
+    def test_settled_unknown_when_ceiling_below_threshold(self):
+        self.service.score_ceiling = 0.7
+        results = [{"agent_name": "Ana", "score": 0.30}]
+        assert self.service.settled_result(results, outstanding=5)["decision"] == "unknown"
+
+    def test_per_agent_threshold_accepts_calibrated_agent(self):
+        # 0.70 is below the global 0.75 but above Luis's own threshold
+        results = [
+            {"agent_name": "Luis", "score": 0.70, "threshold": 0.60},
+            {"agent_name": "Ana", "score": 0.40, "threshold": 0.80}
+        ]
+        decision = self.service.process_results(results)
+
+        assert decision["decision"] == "identified"
+        assert decision["identity"]["name"] == "Luis"
+
+    def test_per_agent_threshold_rejects_strict_agent(self):
+        # Ana has the top score but misses her own threshold; Luis is too close to her
+        results = [
+            {"agent_name": "Ana", "score": 0.85, "threshold": 0.90},
+            {"agent_name": "Luis", "score": 0.80, "threshold": 0.70}
+        ]
+        decision = self.service.process_results(results)
+
+        assert decision["decision"] == "ambiguous"
+        assert decision["identity"]["name"] == "Luis"
+        assert decision["candidates"][0]["name"] == "Ana"
+
+    def test_candidates_are_top_five_in_order(self):
+        results = [{"agent_name": f"agent-{i}", "score": i / 100} for i in range(50)]
+        decision = self.service.process_results(results)
+
+        assert [c["name"] for c in decision["candidates"]] == [f"agent-{i}" for i in range(49, 44, -1)]
+
+    def test_settled_unknown_uses_threshold_floor(self):
+        self.service.score_ceiling = 0.7
+        results = [{"agent_name": "Ana", "score": 0.30}]
+        # An outstanding agent calibrated at 0.65 could still accept a 0.7 score
+        assert self.service.settled_result(results, outstanding=5, threshold_floor=0.65) is None
@@ -0,0 +1,16 @@
+import pytest
+from app.utils.http_client import HttpClientRegistry
+
+
+@pytest.mark.asyncio
+async def test_client_is_shared_per_host():
+    a = HttpClientRegistry.get_client("http://agent-a:33210/verify")
+    b = HttpClientRegistry.get_client("http://agent-a:33210/other")
+    c = HttpClientRegistry.get_client("http://agent-b:33211/verify")
+
+    assert a is b
+    assert a is not c
+
+    await HttpClientRegistry.close()
+    assert a.is_closed and c.is_closed
+    assert HttpClientRegistry.clients == {}
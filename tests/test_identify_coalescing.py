@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.model.db_models import AgentConfig
+from app.service import orchestrator_service
+from app.service.agent_registry import AgentRegistry, AgentSnapshot
+from app.service.orchestrator_service import OrchestratorService, coalesce_stats, identify_cache
+from app.service.pp2_service import PP2Service
+
+
+def snapshot(version="v1"):
+    agents = tuple(AgentConfig(name=n, endpoint_verify=f"http://{n}/verify", threshold=0.75, active=True) for n in ("ana", "luis", "pedro"))
+    return AgentSnapshot(version=version, agents=agents, loaded_at=0.0)
+
+
+async def identify_concurrently(images, version="v1"):
+    calls = []
+
+    async def fake_call(self, agent, request_id, body):
+        calls.append((request_id, agent.name))
+        await asyncio.sleep(0.05)
+        return {"agent_name": agent.name, "score": 0.95 if agent.name == "ana" else 0.1}
+
+    service = OrchestratorService()
+    with patch.object(AgentRegistry, "get_snapshot", AsyncMock(return_value=snapshot(version))), \
+         patch.object(PP2Service, "_call_agent", fake_call):
+        outcomes = await asyncio.gather(*(
+            service._process_identify(f"req-{i}", data, "a.png", "image/png", None, {"id": "u1", "type": "student"}, "127.0.0.1")
+            for i, data in enumerate(images)
+        ))
+    return outcomes, calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_fanout(monkeypatch):
+    identify_cache.clear()
+    monkeypatch.setattr(orchestrator_service, "IDENTIFY_CACHE_ENABLED", False)
+    before = dict(coalesce_stats)
+
+    outcomes, calls = await identify_concurrently([b"same-image"] * 3)
+
+    assert len(calls) == 3  # one fan-out over 3 agents, not three
+    assert [response.request_id for response, _ in outcomes] == ["req-0", "req-1", "req-2"]
+    assert all(response.identity.name == "ana" for response, _ in outcomes)
+    rows = [entry for _, entry in outcomes]
+    assert [row["request_id"] for row in rows] == ["req-0", "req-1", "req-2"]
+    assert [bool(row["pp2_summary"].get("coalesced")) for row in rows] == [False, True, True]
+    assert coalesce_stats["requests"] - before["requests"] == 2
+    assert coalesce_stats["calls_saved"] - before["calls_saved"] == 6
+
+
+@pytest.mark.asyncio
+async def test_different_images_are_not_coalesced(monkeypatch):
+    identify_cache.clear()
+    monkeypatch.setattr(orchestrator_service, "IDENTIFY_CACHE_ENABLED", False)
+
+    outcomes, calls = await identify_concurrently([b"image-a", b"image-b"])
+
+    assert len(calls) == 6
+    assert not any(entry["pp2_summary"].get("coalesced") for _, entry in outcomes)
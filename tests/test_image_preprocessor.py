@@ -0,0 +1,50 @@
+import io
+import os
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import app.service.image_preprocessor as image_preprocessor
+from app.service.image_preprocessor import ImagePreprocessor, processed_cache
+from app.utils.cpu_executor import CpuExecutor
+
+
+def camera_jpeg(width=2400, height=1800) -> bytes:
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    exif = Image.Exif()
+    exif[0x010F] = "TestCamera"  # Make
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_downscales_strips_metadata_and_caches(monkeypatch):
+    monkeypatch.setattr(image_preprocessor, "ENABLED", True)
+    processed_cache.clear()
+    original = camera_jpeg()
+
+    first = await ImagePreprocessor.process(original, "frame.png", "image/png", "hash-1")
+    second = await ImagePreprocessor.process(original, "frame.png", "image/png", "hash-1")
+    CpuExecutor.close()
+
+    assert first.processed and first.content_type == "image/jpeg" and first.filename == "frame.jpg"
+    assert first.original_size == len(original)
+    assert len(first.data) * 10 < len(original)
+    with Image.open(io.BytesIO(first.data)) as result:
+        assert max(result.size) == image_preprocessor.MAX_DIMENSION
+        assert not result.getexif()
+    assert second.data is first.data
+    assert processed_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_disabled_or_undecodable_images_pass_through(monkeypatch):
+    monkeypatch.setattr(image_preprocessor, "ENABLED", False)
+    passthrough = await ImagePreprocessor.process(b"raw", "a.png", "image/png")
+    assert passthrough.data == b"raw" and not passthrough.processed
+
+    monkeypatch.setattr(image_preprocessor, "ENABLED", True)
+    broken = await ImagePreprocessor.process(b"not an image", "a.png", "image/png")
+    CpuExecutor.close()
+    assert broken.data == b"not an image" and broken.content_type == "image/png"
@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+import app.db.log_writer as log_writer
+from app.db.log_writer import LogWriter
+from app.db.mongo import MongoDB
+
+
+@pytest.fixture
+def mock_db():
+    db = MagicMock()
+    db.service_logs.insert_many = AsyncMock()
+    db.access_logs.insert_many = AsyncMock()
+    db.metrics_rollups.bulk_write = AsyncMock()
+    MongoDB.db = db
+    yield db
+    MongoDB.db = None
+
+
+@pytest.mark.asyncio
+async def test_rows_are_batched_per_collection(mock_db):
+    for i in range(3):
+        await LogWriter.write("service_logs", {"i": i})
+    await LogWriter.write("access_logs", {"request_id": "r1"})
+
+    # Nothing is persisted synchronously
+    mock_db.service_logs.insert_many.assert_not_called()
+
+    await LogWriter.close()
+
+    docs = mock_db.service_logs.insert_many.call_args.args[0]
+    assert [d["i"] for d in docs] == [0, 1, 2]
+    mock_db.access_logs.insert_many.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_oldest(mock_db, monkeypatch):
+    async def idle():
+        await asyncio.Event().wait()
+
+    # Keep the background task from draining the queue
+    monkeypatch.setattr(LogWriter, "_run", classmethod(lambda cls: idle()))
+    monkeypatch.setattr(log_writer, "QUEUE_MAX_SIZE", 2)
+    dropped_before = LogWriter.stats["dropped"]
+
+    for i in range(3):
+        await LogWriter.write("service_logs", {"i": i})
+
+    assert LogWriter.stats["dropped"] == dropped_before + 1
+
+    await LogWriter.close()
+    docs = mock_db.service_logs.insert_many.call_args.args[0]
+    assert [d["i"] for d in docs] == [1, 2]
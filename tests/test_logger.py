@@ -0,0 +1,63 @@
+import json
+import logging
+import logging.handlers
+from app.utils.logger import Logger, StructuredFormatter
+
+
+class Exploding:
+    def __str__(self):
+        raise AssertionError("formatted although the record was filtered out")
+
+
+def test_logger_is_a_true_singleton():
+    first, second = Logger(), Logger.get_instance()
+    assert first is second
+    queue_handlers = [h for h in first.logger.handlers if isinstance(h, logging.handlers.QueueHandler)]
+    assert len(queue_handlers) == 1
+
+
+def test_formatting_is_lazy_for_disabled_levels():
+    logger = Logger()
+    # INFO by default: neither call may touch the payload
+    logger.debug("payload %s", Exploding())
+    logger.debug_sample("payload %s", Exploding(), rate=1.0)
+
+
+def test_debug_sample_respects_rate(monkeypatch):
+    logger = Logger()
+    emitted = []
+    monkeypatch.setattr(logger, "_log", lambda *args: emitted.append(args))
+    monkeypatch.setattr(logger.logger, "isEnabledFor", lambda level: True)
+
+    for _ in range(50):
+        logger.debug_sample("payload %s", {"big": "dict"}, rate=0.0)
+    assert emitted == []
+    logger.debug_sample("payload %s", {"big": "dict"}, rate=1.0)
+    assert len(emitted) == 1
+
+
+def test_structured_fields_are_rendered():
+    record = logging.LogRecord("logger", logging.INFO, __file__, 1, "PP2 results %s", ("received",), None)
+    record.fields = {"request_id": "r1", "results": 3}
+
+    assert StructuredFormatter().format(record).endswith("PP2 results received request_id=r1 results=3")
+    payload = json.loads(StructuredFormatter(as_json=True).format(record))
+    assert payload["message"] == "PP2 results received" and payload["results"] == 3
+
+
+def test_queued_record_is_interpolated_before_the_payload_changes():
+    import sys
+    from app.utils.logger import _DeferredQueueHandler
+
+    results = ["ana"]
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = logging.LogRecord("logger", logging.ERROR, __file__, 1, "PP2 results %s", (results,), exc_info)
+    queued = _DeferredQueueHandler(None).prepare(record)
+    results.append("luis")
+
+    assert queued.msg == "PP2 results ['ana']" and queued.args is None and queued.exc_info is None
+    assert "ValueError: boom" in StructuredFormatter().format(queued)
+    assert "ValueError: boom" in json.loads(StructuredFormatter(as_json=True).format(queued))["exc_info"]
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.service import metrics_service
+from app.service.metrics_service import MetricsService, dashboard_cache, window_start
+
+BUCKETS = [
+    {"kind": "access", "route": "/identify-and-answer", "user_type": "student", "decision": "identified",
+     "count": 2, "latency_count": 2, "sum_ms": 150.0, "timeouts": 0, "errors": 0, "hist": {}},
+    {"kind": "service", "service_type": "pp2", "service_name": "Ana",
+     "count": 3, "latency_count": 3, "sum_ms": 90.0, "timeouts": 1, "errors": 0, "hist": {}},
+    {"kind": "service", "service_type": "pp1", "service_name": "UFRO-RAG",
+     "count": 1, "latency_count": 1, "sum_ms": 500.0, "timeouts": 0, "errors": 0, "hist": {}},
+]
+
+
+def test_window_start_is_bucketed():
+    from datetime import datetime
+    assert window_start(1, datetime(2026, 1, 2, 10, 30, 45)) == datetime(2026, 1, 1, 10, 30)
+
+
+@pytest.mark.asyncio
+async def test_dashboard_single_query_and_coalesced_miss():
+    dashboard_cache.clear()
+    service = MetricsService()
+
+    async def slow_load(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return BUCKETS
+
+    with patch("app.service.metrics_service.MetricsRollup.load", side_effect=slow_load) as load:
+        results = await asyncio.gather(*(service.get_dashboard(1) for _ in range(5)))
+
+    assert load.call_count == 1
+    assert load.call_args.args[0] is None  # access and service buckets in one query
+    dashboard, _, state = results[0]
+    assert state == "miss"
+    assert dashboard["summary"]["total_requests"] == 2
+    assert dashboard["decisions"] == [{"_id": "identified", "count": 2}]
+    assert [s["_id"] for s in dashboard["services"]] == ["Ana"]
+
+
+@pytest.mark.asyncio
+async def test_dashboard_serves_stale_and_refreshes_in_background(monkeypatch):
+    dashboard_cache.clear()
+    service = MetricsService()
+    load = AsyncMock(return_value=BUCKETS)
+
+    with patch("app.service.metrics_service.MetricsRollup.load", load):
+        await service.get_dashboard(1)
+        _, _, state = await service.get_dashboard(1)
+        assert state == "hit"
+
+        monkeypatch.setattr(metrics_service, "CACHE_TTL", 0.0)
+        _, _, state = await service.get_dashboard(1)
+        assert state == "stale"
+        await asyncio.gather(*service._refreshes)
+
+    assert load.await_count == 2
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.service.pp1_service import PP1Service, answer_cache, normalize_question
+from app.utils.singleflight import SingleFlight
+
+
+def test_normalize_question():
+    assert normalize_question("¿Cuántos  CRÉDITOS necesito?") == normalize_question("cuantos creditos necesito")
+
+
+@pytest.mark.asyncio
+async def test_identical_questions_share_one_upstream_call():
+    answer_cache.clear()
+    calls = []
+
+    async def upstream(self, request_id, question, use_rag, top_k):
+        calls.append(question)
+        await asyncio.sleep(0.01)
+        return {"text": "Se requieren 240 créditos", "citations": []}
+
+    with patch.object(PP1Service, "_ask_upstream", upstream):
+        service = PP1Service()
+        answers = await asyncio.gather(
+            service.ask_normativa("r1", "¿Cuántos créditos?"),
+            service.ask_normativa("r2", "cuantos creditos"),
+        )
+        cached = await service.ask_normativa("r3", "CUÁNTOS CRÉDITOS")
+        other_params = await service.ask_normativa("r4", "cuantos creditos", top_k=10)
+
+    assert answers[0] == answers[1] == cached == other_params
+    assert len(calls) == 2  # one shared call + one for different top_k
+
+
+@pytest.mark.asyncio
+async def test_singleflight_follower_retries_when_leader_cancelled():
+    group = SingleFlight("test-cancel")
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "ok"
+
+    leader = asyncio.create_task(group.do("k", slow))
+    await started.wait()
+    follower = asyncio.create_task(group.do("k", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.wait_for(follower, timeout=1.0) == "ok"
+    assert group.executions == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_normativa_passes_ndjson_chunks_through(monkeypatch, mock_mongo):
+    import httpx
+    from app.service import pp1_service
+    from app.utils.http_client import HttpClientRegistry
+
+    answer_cache.clear()
+    monkeypatch.setattr(pp1_service, "STREAM_ENABLED", True)
+    body = b'{"delta": "Se requieren "}\n{"delta": "240"}\n{"citations": [{"doc": "reglamento.pdf"}]}\n'
+
+    def handler(request):
+        assert b'"stream": true' in request.content or b'"stream":true' in request.content
+        return httpx.Response(200, content=body, headers={"content-type": "application/x-ndjson"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(HttpClientRegistry, "get_client", classmethod(lambda cls, url: client))
+    service = PP1Service()
+    events = [event async for event in service.stream_normativa("r1", "¿Cuántos créditos?")]
+    await client.aclose()
+
+    assert events == [
+        {"delta": "Se requieren "},
+        {"delta": "240"},
+        {"answer": {"text": "Se requieren 240", "citations": [{"doc": "reglamento.pdf"}]}},
+    ]
+    # The assembled answer is cached for non-streaming callers too
+    assert await service.ask_normativa("r2", "cuantos creditos") == events[-1]["answer"]
+
+
+def test_speculation_policy_buckets_user_types_and_skips_when_off():
+    from app.service.speculation_policy import SpeculationPolicy
+
+    off = SpeculationPolicy(mode="off")
+    off.record_decision("student", "identified")
+    assert off.decisions == {}
+
+    policy = SpeculationPolicy(mode="adaptive")
+    for i in range(100):
+        policy.record_decision(f"spoofed-{i}", "identified")
+    policy.record_decision("STUDENT", "unknown")
+    policy.record_decision(None, "unknown")
+
+    assert set(policy.decisions) == {"other", "student", "anonymous"}
+    assert len(policy.decisions["other"]) == 100
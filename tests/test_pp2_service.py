@@ -0,0 +1,261 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.model.db_models import AgentConfig
+from app.service.pp2_service import PP2Service
+from app.utils.multipart import MultipartBody
+
+
+def make_agents(*names):
+    return [AgentConfig(name=n, endpoint_verify=f"http://{n}/verify", threshold=0.75, active=True) for n in names]
+
+
+@pytest.mark.asyncio
+async def test_verify_until_settled_cancels_outstanding_agents():
+    cancelled = []
+
+    async def fake_call(self, agent, request_id, body):
+        if agent.name == "slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(agent.name)
+                raise
+        return {"agent_name": agent.name, "score": 0.9}
+
+    with patch.object(PP2Service, "_call_agent", fake_call):
+        service = PP2Service()
+        results = await asyncio.wait_for(
+            service.verify_until_settled(
+                "req-1",
+                b"img",
+                "a.png",
+                "image/png",
+                is_settled=lambda results, outstanding: len(results) >= 1,
+                agents=make_agents("fast", "slow"),
+            ),
+            timeout=1.0,
+        )
+
+    assert [r["agent_name"] for r in results] == ["fast"]
+    assert cancelled == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_slow_agent_gets_hedged_request(monkeypatch):
+    import httpx
+    import app.service.pp2_service as pp2_service
+    from app.service.latency_tracker import LatencyTracker
+    from app.utils.http_client import HttpClientRegistry
+
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+        return httpx.Response(200, json={"data": {"score": 0.9}})
+
+    HttpClientRegistry.clients["http://hedge"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(pp2_service, "HEDGING_ENABLED", True)
+    tracker = LatencyTracker.for_agent("hedge")
+    for _ in range(50):
+        tracker.record(20.0)
+
+    with patch("app.service.pp2_service.LogWriter.write") as write:
+        body = MultipartBody("image", "a.png", b"img", "image/png")
+        result = await PP2Service()._call_agent(make_agents("hedge")[0], "req-1", body)
+
+    assert result["score"] == 0.9
+    assert len(calls) == 2
+    assert tracker.hedges == 1 and tracker.hedge_wins == 1
+    log_entry = write.call_args.args[1]
+    assert log_entry["hedged"] and log_entry["hedge_won"]
+    await HttpClientRegistry.close()
+
+
+@pytest.mark.asyncio
+async def test_fan_out_reuses_one_encoded_multipart_body():
+    import httpx
+    from app.utils.http_client import HttpClientRegistry
+
+    received = []
+
+    async def handler(request):
+        received.append(request)
+        return httpx.Response(200, json={"data": {"score": 0.5}})
+
+    image = b"\x89PNG\r\n\x1a\n" + b"x" * 200_000
+    HttpClientRegistry.clients["http://a"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    HttpClientRegistry.clients["http://b"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with patch("app.service.pp2_service.LogWriter.write"):
+        results = await PP2Service().verify_parallel("req-1", image, "a.png", "image/png", agents=make_agents("a", "b"))
+
+    assert [r["score"] for r in results] == [0.5, 0.5]
+    bodies = []
+    for request in received:
+        assert "transfer-encoding" not in request.headers
+        body = await request.aread()
+        assert int(request.headers["content-length"]) == len(body)
+        assert b'name="image"; filename="a.png"' in body
+        assert image in body
+        bodies.append(body)
+    assert bodies[0] == bodies[1]
+    await HttpClientRegistry.close()
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_queues_calls_and_logs_wait_separately():
+    import httpx
+    from app.utils.http_client import HttpClientRegistry
+
+    active, peak = 0, 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return httpx.Response(200, json={"data": {"score": 0.9}})
+
+    HttpClientRegistry.clients["http://bulk"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    agent = AgentConfig(name="bulk", endpoint_verify="http://bulk/verify", threshold=0.75, active=True, max_in_flight=1)
+    body = MultipartBody("image", "a.png", b"img", "image/png")
+
+    with patch("app.service.pp2_service.LogWriter.write") as write:
+        service = PP2Service()
+        results = await asyncio.gather(*(service._call_agent(agent, f"req-{i}", body) for i in range(3)))
+
+    assert all(r["score"] == 0.9 for r in results)
+    assert peak == 1
+    entries = sorted((call.args[1] for call in write.call_args_list), key=lambda e: e["queue_wait_ms"])
+    assert entries[0]["queue_wait_ms"] < 20 <= entries[2]["queue_wait_ms"]
+    # Network latency excludes the time spent queued
+    assert entries[2]["latency_ms"] < entries[2]["queue_wait_ms"]
+    await HttpClientRegistry.close()
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_wait_times_out_without_tripping_breaker():
+    from app.service.bulkhead import Bulkhead
+    from app.service.circuit_breaker import CircuitBreaker
+
+    bulkhead = Bulkhead.for_agent("full", 1)
+    await bulkhead.acquire(1.0)
+    agent = AgentConfig(name="full", endpoint_verify="http://full/verify", threshold=0.75, active=True, max_in_flight=1)
+
+    with patch("app.service.pp2_service.TIMEOUT", 0.05), \
+         patch("app.service.pp2_service.ADAPTIVE_TIMEOUTS", False), \
+         patch("app.service.pp2_service.LogWriter.write") as write:
+        result = await PP2Service()._call_agent(agent, "req-1", MultipartBody("image", "a.png", b"img", "image/png"))
+
+    assert result["error"] == "QueueTimeout"
+    assert write.call_args.args[1]["queue_timeout"] is True
+    assert CircuitBreaker.for_agent("full").consecutive_failures == 0
+    bulkhead.release()
+    assert bulkhead.stats()["in_flight"] == 0
+
+
+def test_multipart_body_escapes_client_filename_and_type():
+    body = MultipartBody("image", 'x"\r\nX-Evil: 1', b"img", "image/png\r\nX-Evil: 1")
+    headers = body.prefix.split(b"\r\n\r\n")[0].split(b"\r\n")
+
+    assert len(headers) == 3  # boundary, Content-Disposition, Content-Type
+    assert b'filename="x%22%0D%0AX-Evil: 1"' in headers[1]
+    assert headers[2] == b"Content-Type: application/octet-stream"
+    assert not any(line.startswith(b"X-Evil") for line in headers)
+
+
+@pytest.mark.asyncio
+async def test_hedge_is_skipped_when_bulkhead_has_no_free_slot(monkeypatch):
+    import httpx
+    import app.service.pp2_service as pp2_service
+    from app.service.bulkhead import Bulkhead
+    from app.service.latency_tracker import LatencyTracker
+    from app.utils.http_client import HttpClientRegistry
+
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"data": {"score": 0.9}})
+
+    HttpClientRegistry.clients["http://nohedge"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(pp2_service, "HEDGING_ENABLED", True)
+    tracker = LatencyTracker.for_agent("nohedge")
+    for _ in range(50):
+        tracker.record(20.0)
+    agent = AgentConfig(name="nohedge", endpoint_verify="http://nohedge/verify", threshold=0.75, active=True, max_in_flight=1)
+
+    with patch("app.service.pp2_service.LogWriter.write"):
+        result = await PP2Service()._call_agent(agent, "req-1", MultipartBody("image", "a.png", b"img", "image/png"))
+
+    assert result["score"] == 0.9
+    assert len(calls) == 1
+    assert tracker.hedges == 0
+    assert Bulkhead.for_agent("nohedge", 1).stats()["in_flight"] == 0
+    await HttpClientRegistry.close()
+
+
+@pytest.mark.asyncio
+async def test_call_timeout_is_what_the_queue_wait_left():
+    import httpx
+    from app.service.bulkhead import Bulkhead
+
+    bulkhead = Bulkhead.for_agent("budget", 1)
+    await bulkhead.acquire(1.0)
+    asyncio.get_running_loop().call_later(0.1, bulkhead.release)
+    agent = AgentConfig(name="budget", endpoint_verify="http://budget/verify", threshold=0.75, active=True, max_in_flight=1)
+    timeouts = []
+
+    async def fake_post(self, send, timeout, *args):
+        timeouts.append(timeout)
+        raise httpx.ReadTimeout("slow")
+
+    with patch("app.service.pp2_service.TIMEOUT", 0.3), \
+         patch("app.service.pp2_service.ADAPTIVE_TIMEOUTS", False), \
+         patch.object(PP2Service, "_post_hedged", fake_post), \
+         patch("app.service.pp2_service.LogWriter.write"):
+        result = await PP2Service()._call_agent(agent, "req-1", MultipartBody("image", "a.png", b"img", "image/png"))
+
+    assert result["error"] == "Timeout"
+    assert 0 < timeouts[0] <= 0.25
+
+
+def test_bulkhead_limit_is_split_across_workers(monkeypatch):
+    import app.service.bulkhead as bulkhead_module
+    from app.service.bulkhead import Bulkhead
+
+    monkeypatch.setattr(bulkhead_module, "WORKERS", 17)
+
+    assert Bulkhead.for_agent("share-default", 16).limit == 1
+    assert Bulkhead.for_agent("share-large", 1000).limit == 59
+
+
+@pytest.mark.asyncio
+async def test_call_is_cut_off_at_one_deadline():
+    import httpx
+    from app.utils.http_client import HttpClientRegistry
+
+    async def handler(request):
+        # Each phase is within httpx's per-phase timeout; the whole call is not
+        await asyncio.sleep(0.5)
+        return httpx.Response(200, json={"data": {"score": 0.9}})
+
+    HttpClientRegistry.clients["http://deadline"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    agent = AgentConfig(name="deadline", endpoint_verify="http://deadline/verify", threshold=0.75, active=True)
+
+    with patch("app.service.pp2_service.TIMEOUT", 0.1), \
+         patch("app.service.pp2_service.ADAPTIVE_TIMEOUTS", False), \
+         patch("app.service.pp2_service.LogWriter.write") as write:
+        result = await asyncio.wait_for(
+            PP2Service()._call_agent(agent, "req-1", MultipartBody("image", "a.png", b"img", "image/png")),
+            timeout=0.4,
+        )
+
+    assert result["error"] == "Timeout"
+    assert write.call_args.args[1]["timeout"] is True
+    await HttpClientRegistry.close()
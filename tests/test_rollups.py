@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, AsyncMock
+from app.db.rollups import MetricsRollup
+from app.utils.latency_sketch import LatencySketch, RELATIVE_ACCURACY
+
+
+def test_sketch_quantiles_are_relatively_accurate_and_mergeable():
+    a, b = LatencySketch(), LatencySketch()
+    for v in range(1, 501):
+        a.add(float(v))
+    for v in range(501, 1001):
+        b.add(float(v))
+    a.merge(b.bins)
+
+    assert a.count == 1000
+    for q, expected in ((0.5, 500.0), (0.95, 950.0)):
+        assert abs(a.quantile(q) - expected) <= expected * RELATIVE_ACCURACY + 1
+
+
+def apply_ops(ops):
+    """Tiny stand-in for Mongo's $inc upserts."""
+    docs = {}
+    for op in ops:
+        key = tuple(sorted((k, str(v)) for k, v in op._filter.items()))
+        doc = docs.setdefault(key, dict(op._filter))
+        for field, n in op._doc["$inc"].items():
+            if field.startswith("hist."):
+                hist = doc.setdefault("hist", {})
+                b = field[len("hist."):]
+                hist[b] = hist.get(b, 0) + n
+            else:
+                doc[field] = doc.get(field, 0) + n
+    return list(docs.values())
+
+
+@pytest.mark.asyncio
+async def test_flush_upserts_minute_and_hour_buckets(mock_mongo):
+    MetricsRollup.pending = {}
+    ts = datetime(2026, 1, 1, 10, 30, 15)
+    for timing in (100.0, 50.0):
+        MetricsRollup.record("access_logs", {"ts": ts, "route": "/identify-and-answer", "user": {"type": "student"}, "decision": "identified", "timing_ms": timing})
+    await MetricsRollup.flush()
+
+    ops = mock_mongo.metrics_rollups.bulk_write.call_args.args[0]
+    docs = apply_ops(ops)
+    assert {d["granularity"] for d in docs} == {"minute", "hour"}
+    hour = next(d for d in docs if d["granularity"] == "hour")
+    assert hour["bucket_start"] == datetime(2026, 1, 1, 10)
+    assert hour["count"] == 2 and hour["sum_ms"] == 150.0
+    assert MetricsRollup.pending == {}
+
+
+def test_summary_served_from_buckets(client_with_mock_db, mock_mongo):
+    import asyncio
+    MetricsRollup.pending = {}
+    now = datetime.utcnow()
+    for timing in (100.0, 50.0, 150.0):
+        MetricsRollup.record("access_logs", {"ts": now, "route": "/r", "user": {"type": "student"}, "decision": "identified", "timing_ms": timing})
+    asyncio.run(MetricsRollup.flush())
+    docs = [d for d in apply_ops(mock_mongo.metrics_rollups.bulk_write.call_args.args[0]) if d["granularity"] == "minute"]
+
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=docs)
+    mock_mongo.metrics_rollups.find = MagicMock(return_value=cursor)
+
+    from app.service.metrics_service import dashboard_cache
+    dashboard_cache.clear()
+    data = client_with_mock_db.get("/metrics/summary?days=1").json()
+    assert data["total_requests"] == 3
+    assert data["avg_latency"] == 100.0
+    route = data["routes"][0]
+    assert route["route"] == "/r" and route["count"] == 3
+    assert 95 <= route["p50"] <= 105